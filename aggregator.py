@@ -0,0 +1,138 @@
+"""
+Aggregator for multi-site deployments.
+
+Edge installations (AGGREGATOR_HOST set in their config) forward their violation
+changes here over TCP (see edge_link.py for the wire format). The aggregator
+stores every site's violations in one central database, keyed by site and the
+row's id at that site so resent batches are deduplicated, keeps each site's last
+heartbeat and status, and runs the outbound Firestore sync for all of them.
+
+    python aggregator.py [--host 0.0.0.0] [--port 7700] [--db central_violations.db] [--no-firebase]
+"""
+import argparse
+import asyncio
+import json
+import signal
+import sqlite3
+import threading
+import time
+from violation_store import ViolationStore
+from edge_link import LENGTH, PROTOCOL_VERSION, decode_length, encode_message
+from background import get_background_loop
+from metrics import metrics
+from config import AGGREGATOR_PORT, AGGREGATOR_DB_PATH, AGGREGATOR_TIMEOUT
+
+
+class Aggregator:
+    """
+    TCP server, run as a service on the background loop, that applies edge batches
+    to the central database. Each batch is committed in one transaction before it
+    is acked; database work runs on the background executor behind one lock, as
+    there is a single SQLite connection.
+    """
+
+    def __init__(self, db_path=AGGREGATOR_DB_PATH, host="0.0.0.0", port=AGGREGATOR_PORT, background=None):
+        self.db_path = db_path
+        self.host = host
+        self.port = port
+        self.background = background or get_background_loop()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.store = ViolationStore(self.conn)
+        self.store.create_table()
+        self.store.migrate()
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS sites
+                             (site TEXT PRIMARY KEY,
+                              last_seen REAL NOT NULL,
+                              status TEXT)''')
+        self.conn.commit()
+        self.lock = threading.Lock()
+        self.listening = threading.Event()
+
+    def start(self, timeout=AGGREGATOR_TIMEOUT):
+        """Start listening; returns the bound port (useful with port 0)"""
+        self.background.start_service("aggregator", self._serve())
+        if not self.listening.wait(timeout):
+            raise RuntimeError(f"Aggregator did not start listening on {self.host}:{self.port}")
+        return self.port
+
+    async def _serve(self):
+        server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = server.sockets[0].getsockname()[1]
+        print(f"Aggregator listening on {self.host}:{self.port}, database {self.db_path}")
+        self.listening.set()
+        async with server:
+            await server.serve_forever()
+
+    async def _handle(self, reader, writer):
+        peer = writer.get_extra_info("peername")
+        try:
+            while True:
+                try:
+                    header = await reader.readexactly(LENGTH.size)
+                except asyncio.IncompleteReadError:
+                    break  # Edge disconnected between messages
+                message = json.loads(await reader.readexactly(decode_length(header)))
+                reply = await self.background.call(self.apply_batch, message)
+                writer.write(encode_message(reply))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError) as e:
+            print(f"Dropping edge connection {peer}: {e!r}")
+        finally:
+            writer.close()
+
+    def apply_batch(self, message):
+        """Store one edge batch and return the reply to send"""
+        seq = message.get("seq")
+        try:
+            if message.get("type") != "batch" or message.get("version") != PROTOCOL_VERSION:
+                raise ValueError(f"unsupported message {message.get('type')!r} v{message.get('version')}")
+            site = message["site"]
+            upserts, deletes = message.get("upserts", []), message.get("deletes", [])
+            with self.lock, metrics.timer("aggregator_apply"):
+                self.store.apply_site_changes(site, message["fields"], upserts, deletes)
+                self.conn.execute('''INSERT INTO sites (site, last_seen, status) VALUES (?, ?, ?)
+                                     ON CONFLICT(site) DO UPDATE SET last_seen = excluded.last_seen,
+                                                                     status = COALESCE(excluded.status, status)''',
+                                  (site, time.time(), json.dumps(message["status"]) if "status" in message else None))
+                self.conn.commit()
+        except Exception as e:
+            print(f"Rejected batch {seq} from {message.get('site')}: {e}")
+            return {"type": "error", "seq": seq, "message": str(e)}
+        metrics.increment("aggregator_changes_received", len(upserts) + len(deletes))
+        return {"type": "ack", "seq": seq}
+
+    def sites(self):
+        """(site, last_seen, status) for every site that has reported"""
+        with self.lock:
+            rows = self.conn.execute("SELECT site, last_seen, status FROM sites ORDER BY site").fetchall()
+        return [(site, last_seen, json.loads(status) if status else None) for site, last_seen, status in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=AGGREGATOR_PORT)
+    parser.add_argument("--db", default=AGGREGATOR_DB_PATH, help="Central violations database")
+    parser.add_argument("--no-firebase", action="store_true", help="Don't sync the central database to Firestore")
+    parser.add_argument("--sync-interval", type=int, default=300, help="Seconds between Firestore syncs")
+    args = parser.parse_args()
+
+    background = get_background_loop()
+    Aggregator(args.db, args.host, args.port, background).start()
+    if not args.no_firebase:
+        from firebase_sync import FirebaseSync, init_firebase
+        init_firebase()
+        FirebaseSync(local_db_path=args.db).start_periodic_sync(args.sync_interval)
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    try:
+        while not stop.wait(1):
+            pass
+    except KeyboardInterrupt:
+        pass
+    background.shutdown()
+
+
+if __name__ == "__main__":
+    main()
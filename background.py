@@ -0,0 +1,129 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from config import BACKGROUND_WORKERS, SHUTDOWN_TIMEOUT
+
+
+class BackgroundLoop:
+    """
+    One asyncio event loop, on its own thread, for the process's background I/O:
+    long-running services (the delivery engine), periodic jobs (sync, retention,
+    notification checks, stats and checkpoints) and one-off work (image writes,
+    clip encoding, database flushes, deliveries).
+
+    Blocking calls (SQLite, the Firebase SDK, OpenCV encoders) run on one small
+    shared executor instead of each job having a thread that mostly sleeps.
+    shutdown() cancels services and periodic jobs, waits for one-off work still
+    queued, runs the shutdown hooks in order and stops the loop.
+    """
+
+    def __init__(self, workers=BACKGROUND_WORKERS):
+        self.loop = asyncio.new_event_loop()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="BackgroundIO")
+        self.loop.set_default_executor(self.executor)
+        self.tasks = {}  # Name -> service or periodic task
+        self.pending = set()  # Futures of one-off work
+        self.shutdown_hooks = []
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.loop.run_forever, daemon=True, name="BackgroundLoop")
+            self.thread.start()
+
+    def submit(self, coroutine):
+        """Schedule one-off work from any thread; returns a concurrent Future. Shutdown waits for it."""
+        future = asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+        with self.lock:
+            self.pending.add(future)
+        future.add_done_callback(self._finished)
+        return future
+
+    def run(self, function, *args):
+        """Run a blocking call on the executor as one-off work"""
+        return self.submit(self.call(function, *args))
+
+    async def call(self, function, *args):
+        """Await a blocking call from a coroutine on the loop"""
+        return await self.loop.run_in_executor(None, function, *args)
+
+    def _finished(self, future):
+        with self.lock:
+            self.pending.discard(future)
+        if not future.cancelled() and future.exception() is not None:
+            print(f"Background job failed: {future.exception()}")
+
+    def start_service(self, name, coroutine):
+        """Run a long-lived coroutine until shutdown, which cancels it"""
+        def create():
+            self.tasks[name] = self.loop.create_task(coroutine, name=name)
+        self.loop.call_soon_threadsafe(create)
+
+    def every(self, interval, function, name=None, run_first=False):
+        """Call a blocking function every interval seconds until shutdown"""
+        name = name or function.__name__
+        self.start_service(name, self._every(interval, function, name, run_first))
+
+    async def _every(self, interval, function, name, run_first):
+        if not run_first:
+            await asyncio.sleep(interval)
+        while True:
+            try:
+                await self.call(function)
+            except Exception as e:
+                print(f"Error in periodic {name}: {e}")
+            await asyncio.sleep(interval)
+
+    def on_shutdown(self, function):
+        """Call function during shutdown, after queued work has finished; hooks run in registration order"""
+        self.shutdown_hooks.append(function)
+
+    def shutdown(self, timeout=SHUTDOWN_TIMEOUT):
+        if self.thread is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop).result(timeout)
+        except Exception as e:
+            print(f"Background shutdown did not finish cleanly: {e!r}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout)
+        self.executor.shutdown(wait=True)
+        self.thread = None
+
+    async def _shutdown(self):
+        tasks = list(self.tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.tasks.clear()
+
+        await self._drain()
+        for hook in self.shutdown_hooks:
+            try:
+                await self.call(hook)
+            except Exception as e:
+                print(f"Error in shutdown hook {getattr(hook, '__name__', hook)}: {e}")
+            await self._drain()  # A hook may queue more work
+
+    async def _drain(self):
+        while True:
+            with self.lock:
+                pending = list(self.pending)
+            if not pending:
+                return
+            await asyncio.gather(*(asyncio.wrap_future(f) for f in pending), return_exceptions=True)
+
+
+_background = None
+_background_lock = threading.Lock()
+
+
+def get_background_loop():
+    """Shared loop used for all background I/O, started on first use"""
+    global _background
+    with _background_lock:
+        if _background is None:
+            _background = BackgroundLoop()
+            _background.start()
+        return _background
@@ -0,0 +1,105 @@
+"""
+Regression check: bound the memory process_frame allocates per frame.
+
+Each synthetic frame is rendered and run through the stub car detector before the
+measurement starts and the detections are replayed, so only the pipeline's own
+allocations are measured (NumPy and OpenCV buffers are visible to
+tracemalloc). Exits non-zero if any measured frame's allocation peak exceeds
+--max-frame-fraction of one frame's size, e.g. because a full-frame copy or
+resize crept back into the per-car loop.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path[:0] = [REPO_DIR, BENCH_DIR]
+
+
+class ReplayCarDetector:
+    """Returns the track() result recorded for the current frame"""
+
+    def __init__(self):
+        self.result = None
+
+    def __call__(self, frame, **kwargs):
+        return self.result
+
+    def track(self, frame, persist=True, **kwargs):
+        return self.result
+
+
+class ReplayPlateDetector:
+    def __init__(self, result):
+        self.result = result
+
+    def __call__(self, car_img, **kwargs):
+        return self.result
+
+
+def run(args):
+    import synthetic_video
+    from stubs import StubCarDetector
+    from trackers import TrackedBoxes, TrackResult
+
+    width, height = args.width, args.height
+    cars = synthetic_video.build_scene(width, height, args.frames, args.parked, args.moving)
+    recorder = StubCarDetector()
+    replay = ReplayCarDetector()
+    plate = [TrackResult(TrackedBoxes([[10, 10, 60, 30]] if args.with_plates else [], [0] if args.with_plates else []))]
+
+    os.chdir(args.work_dir or tempfile.mkdtemp(prefix="parking_alloc_"))
+    import main as pipeline
+    from zones import Zone
+
+    zones = [Zone("Check", [[0, 0], [width - 1, 0], [width - 1, height - 1], [0, height - 1]])]
+    pipeline.ILLEGAL_PARKING_FRAMES = 10 ** 9  # Keep evidence writes out of the measurement
+    pipeline.setup_pipeline(None, zones, width, height, replay, ReplayPlateDetector(plate))
+
+    frame_bytes = width * height * 3
+    peaks = []
+    tracemalloc.start()
+    for i in range(args.frames):
+        frame = synthetic_video.render_frame(cars, i, width, height)
+        replay.result = recorder.track(frame)
+
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        pipeline.process_frame(frame, i + 1, time.time())
+        if i >= args.warmup:
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+
+    worst = max(peaks)
+    limit = args.max_frame_fraction * frame_bytes
+    print(f"Frame size {frame_bytes / 1024:.0f} KiB; per-frame allocation peak: "
+          f"median {sorted(peaks)[len(peaks) // 2] / 1024:.1f} KiB, worst {worst / 1024:.1f} KiB "
+          f"(limit {limit / 1024:.0f} KiB)")
+    if worst > limit:
+        print("FAIL: process_frame allocates too much per frame")
+        return 1
+    print("OK")
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--frames", type=int, default=120)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--parked", type=int, default=6)
+    parser.add_argument("--moving", type=int, default=6)
+    parser.add_argument("--with-plates", action="store_true", help="Replay a plate box for every car")
+    parser.add_argument("--max-frame-fraction", type=float, default=0.25,
+                        help="Allowed per-frame allocation peak as a fraction of one frame")
+    parser.add_argument("--work-dir", help="Scratch directory (default: a new temporary directory)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(run(parse_args()))
@@ -0,0 +1,197 @@
+"""
+Simulate a multi-site deployment on one machine: one aggregator process and
+several edge processes, each with its own violations database and delivery queue.
+
+Each edge logs violations, updates their durations and deletes one, while an
+EdgeLink forwards the changes. Partway through, the aggregator is killed and
+restarted to exercise retries and resends. Edges run in different time zones.
+The run fails unless the central database ends up with exactly each edge's final
+rows (duration and time), once each, and every site has reported a heartbeat.
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path[:0] = [REPO_DIR, BENCH_DIR]
+
+
+TIME_ZONES = ["UTC", "Asia/Manila", "America/New_York"]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+
+def start_aggregator(args, port, database):
+    process = subprocess.Popen([sys.executable, os.path.join(REPO_DIR, "aggregator.py"), "--host", "127.0.0.1",
+                                "--port", str(port), "--db", database, "--no-firebase"], cwd=args.work_dir)
+    if not wait_for_port(port, 30):
+        process.kill()
+        raise SystemExit("Aggregator did not start")
+    return process
+
+
+def run_edge(args):
+    """One edge site: write violations locally and forward them"""
+    os.makedirs(args.work_dir, exist_ok=True)
+    os.chdir(args.work_dir)
+    from violation_store import ViolationStore
+    from delivery import DeliveryEngine, CircuitBreaker
+    from background import get_background_loop
+    from edge_link import EdgeLink, SYNC_NAME
+
+    database = os.path.join(args.work_dir, "parking_violations.db")
+    store = ViolationStore(sqlite3.connect(database))
+    store.create_table()
+    store.migrate()
+
+    background = get_background_loop()
+    engine = DeliveryEngine(os.path.join(args.work_dir, "delivery_queue.db"), background=background)
+    engine.start()
+    link = EdgeLink(database, site=args.site, address=("127.0.0.1", args.port), engine=engine,
+                    status=lambda: {"violations": store_count()})
+    engine.breakers['aggregator_sync'] = CircuitBreaker(reset_timeout=2)  # Recover quickly after the outage
+    link.start_periodic_sync(args.sync_interval, background)
+
+    status_conn = sqlite3.connect(database, check_same_thread=False)
+
+    def store_count():
+        return status_conn.execute("SELECT COUNT(*) FROM violations").fetchone()[0]
+
+    rng = random.Random(args.site)
+    ids = []
+    for i in range(args.violations):
+        store.insert(None, time.time(), f"{args.site[-1]}XY{i:04d}".upper(), f"Zone {i % 3}", 0,
+                     f"images/car_{i}.jpg", rng.choice(["red", "white", "black"]))
+        ids.append(store.conn.execute("SELECT last_insert_rowid()").fetchone()[0])
+        if i % 3 == 2:
+            store.set_parking_duration(ids[rng.randrange(len(ids))], rng.randint(60, 900))
+        link.sync_to_aggregator()
+        time.sleep(args.seconds / args.violations)
+    store.conn.execute("DELETE FROM violations WHERE id = ?", (ids[0],))
+    store.conn.commit()
+    link.sync_to_aggregator()
+
+    # Converged once the aggregator has acked everything in the outbox
+    deadline = time.time() + args.timeout
+    while time.time() < deadline:
+        watermark = store.get_sync_watermark(SYNC_NAME, None)
+        if watermark is not None and not store.outbox_since(watermark, 1):
+            break
+        time.sleep(0.2)
+    else:
+        print(f"{args.site}: did not converge")
+
+    expected = {row[0]: list(row[1:]) for row in
+                store.conn.execute("SELECT id, parking_duration, ts_epoch FROM violations")}
+    with open(os.path.join(args.work_dir, "expected.json"), "w") as f:
+        json.dump(expected, f)
+    engine.stop()
+    link.close()
+    background.shutdown()
+
+
+def run(args):
+    args.work_dir = args.work_dir or tempfile.mkdtemp(prefix="multi_edge_")
+    os.makedirs(args.work_dir, exist_ok=True)
+    port = free_port()
+    central = os.path.join(args.work_dir, "central_violations.db")
+    aggregator = start_aggregator(args, port, central)
+
+    started = time.time()
+    edges = []
+    for i in range(args.edges):
+        site = f"site-{i + 1}"
+        # Sites in different time zones must still agree on when a violation happened
+        env = dict(os.environ, TZ=TIME_ZONES[i % len(TIME_ZONES)])
+        edges.append((site, subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--role", "edge", "--site", site, "--port", str(port),
+             "--work-dir", os.path.join(args.work_dir, site), "--violations", str(args.violations),
+             "--seconds", str(args.seconds), "--sync-interval", str(args.sync_interval),
+             "--timeout", str(args.timeout)], env=env)))
+
+    # Take the aggregator down partway through; edges must retry and resend
+    time.sleep(args.outage_at)
+    aggregator.kill()
+    aggregator.wait()
+    time.sleep(args.outage)
+    aggregator = start_aggregator(args, port, central)
+
+    for site, process in edges:
+        process.wait(args.seconds + args.timeout + 30)
+    elapsed = time.time() - started
+    aggregator.terminate()
+    aggregator.wait(30)
+
+    conn = sqlite3.connect(central)
+    failures = []
+    total = 0
+    for site, process in edges:
+        with open(os.path.join(args.work_dir, site, "expected.json")) as f:
+            expected = {int(k): v for k, v in json.load(f).items()}
+        stored = {row[0]: list(row[1:]) for row in conn.execute(
+            "SELECT site_violation_id, parking_duration, ts_epoch FROM violations WHERE site = ?", (site,))}
+        total += len(stored)
+        if stored != expected:
+            missing = set(expected) - set(stored)
+            extra = set(stored) - set(expected)
+            stale = [k for k in set(expected) & set(stored) if expected[k] != stored[k]]
+            failures.append(f"{site}: {len(missing)} missing, {len(extra)} extra, {len(stale)} stale rows")
+    sites = {row[0] for row in conn.execute("SELECT site FROM sites WHERE status IS NOT NULL")}
+    if sites != {site for site, _ in edges}:
+        failures.append(f"heartbeats from {sorted(sites)} only")
+    conn.close()
+
+    results = {"edges": args.edges, "central_rows": total, "seconds": elapsed, "work_dir": args.work_dir}
+    print(json.dumps(results, indent=2))
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("OK")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--edges", type=int, default=3)
+    parser.add_argument("--violations", type=int, default=40, help="Violations logged per edge")
+    parser.add_argument("--seconds", type=float, default=6, help="Time each edge spends logging")
+    parser.add_argument("--sync-interval", type=float, default=0.5, help="Edge forwarding interval")
+    parser.add_argument("--outage-at", type=float, default=2, help="Seconds in when the aggregator is killed")
+    parser.add_argument("--outage", type=float, default=2, help="Seconds the aggregator stays down")
+    parser.add_argument("--timeout", type=float, default=60, help="Seconds edges wait to converge")
+    parser.add_argument("--work-dir", help="Scratch directory (default: a new temporary directory)")
+    parser.add_argument("--role", choices=("run", "edge"), default="run", help=argparse.SUPPRESS)
+    parser.add_argument("--site", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.role == "edge":
+        run_edge(args)
+    else:
+        run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+Run the detection pipeline headless over a video and write a JSON baseline.
+
+By default a synthetic parking-lot video is generated and the YOLO/PaddleOCR models
+are replaced by the stubs in stubs.py, so the numbers reflect the pipeline's own
+cost. Pass --real-models to load the models from models/ instead. Everything the
+pipeline writes (database, evidence images, queues) goes to a scratch directory.
+
+Reported: processed FPS, per-stage latency percentiles, violations per minute of
+video and peak resident memory.
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path[:0] = [REPO_DIR, BENCH_DIR]
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MiB"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS bytes
+        return peak / (1024 ** 2) if sys.platform == "darwin" else peak / 1024
+    except ImportError:  # Windows
+        import psutil
+        return psutil.Process().memory_info().peak_wset / (1024 ** 2)
+
+
+def wait_for_ocr(ocr_queue, timeout):
+    """Let queued OCR jobs finish so their violations are counted"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if ocr_queue.empty():
+            time.sleep(0.5)  # A job may be in flight and about to requeue itself
+            if ocr_queue.empty():
+                return True
+        time.sleep(0.1)
+    return False
+
+
+def run(args):
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="parking_bench_")
+    os.makedirs(work_dir, exist_ok=True)
+    output = os.path.abspath(args.output)
+    video = os.path.abspath(args.video) if args.video else None
+
+    import cv2
+    import synthetic_video
+    from stubs import StubCarDetector, StubPlateDetector, StubOCR
+
+    if video is None:
+        video = os.path.join(work_dir, "synthetic.mp4")
+        print(f"Generating synthetic video at {video}")
+        synthetic_video.generate(video, args.width, args.height, args.fps, args.seconds, args.parked, args.moving)
+    truth_path = video + ".json"
+    truth = json.load(open(truth_path)) if os.path.exists(truth_path) else None
+
+    # The pipeline opens its databases and evidence folder relative to the working directory
+    os.chdir(work_dir)
+    import main as pipeline
+    import parking_monitor
+    from metrics import metrics
+    from parking_monitor import start_ocr_thread, image_writer
+    from background import get_background_loop
+    from delivery import get_delivery_engine
+    from zones import Zone, load_zones
+    from ffmpeg_capture import open_video_capture
+
+    if args.real_models:
+        car_model, plate_model = pipeline.load_models(os.path.join(REPO_DIR, 'models'))
+    else:
+        latency = args.detect_ms / 1000
+        car_model, plate_model = StubCarDetector(latency=latency), StubPlateDetector(latency=latency)
+        parking_monitor.ocr = StubOCR(latency=args.ocr_ms / 1000)
+
+    cap = open_video_capture(video, args.decoder, args.decode_width, args.decode_fps, keyframes_only=args.keyframes_only)
+    if not cap.isOpened():
+        raise SystemExit(f"Could not open {video}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or args.fps
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    if args.region:
+        zones = load_zones(args.region)
+    else:
+        zones = [Zone("Benchmark", [[0, 0], [width - 1, 0], [width - 1, height - 1], [0, height - 1]])]
+
+    pipeline.ILLEGAL_PARKING_FRAMES = int(args.parking_seconds * fps)
+    pipeline.setup_pipeline(cap, zones, width, height, car_model, plate_model, fps)
+    threading.Thread(target=start_ocr_thread, args=(pipeline.ocr_queue, pipeline.stationary_cars),
+                     daemon=True, name="OCR").start()
+
+    frame_count = 0
+    video_start = time.time()
+    start = time.perf_counter()
+    while args.max_frames is None or frame_count < args.max_frames:
+        with metrics.timer("decode"):
+            ret, frame = cap.read()
+        if not ret:
+            break
+        frame_count += 1
+        # Video time keeps dwell timing independent of how fast the benchmark runs
+        pipeline.process_frame(frame, frame_count, video_start + frame_count / fps)
+    elapsed = time.perf_counter() - start
+
+    drained = wait_for_ocr(pipeline.ocr_queue, args.drain_timeout)
+    pipeline.finalize_all()
+    pipeline.ocr_queue.put(None)
+    image_writer.stop()
+    get_delivery_engine().stop()
+    get_background_loop().shutdown()  # Final duration updates and clips
+    cap.release()
+
+    conn = sqlite3.connect(parking_monitor.DATABASE_PATH)
+    violations = conn.execute("SELECT COUNT(*) FROM violations").fetchone()[0]
+    conn.close()
+
+    snapshot = metrics.snapshot()
+    video_minutes = frame_count / fps / 60
+    result = {
+        "video": video,
+        "models": "real" if args.real_models else "stub",
+        "decoder": type(cap).__name__,
+        "frames": frame_count,
+        "resolution": [width, height],
+        "wall_seconds": elapsed,
+        "fps": frame_count / elapsed if elapsed else 0.0,
+        "stages": snapshot["stages"],
+        "counters": snapshot["counters"],
+        "violations": violations,
+        "violations_per_minute": violations / video_minutes if video_minutes else 0.0,
+        "expected_violations": sum(car["parked"] for car in truth["cars"]) if truth else None,
+        "ocr_drained": drained,
+        "peak_rss_mb": peak_rss_mb(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "work_dir": work_dir,
+    }
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+
+    print(f"{frame_count} frames in {elapsed:.1f}s ({result['fps']:.1f} FPS), "
+          f"{violations} violations, peak RSS {result['peak_rss_mb']:.0f} MiB")
+    print(f"Baseline written to {output}")
+    return result
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", help="Existing video to run (default: generate a synthetic one)")
+    parser.add_argument("--region", help="Zones file in region.json format; default is the whole frame")
+    parser.add_argument("--output", default="baseline.json", help="Where to write the JSON results")
+    parser.add_argument("--work-dir", help="Scratch directory (default: a new temporary directory)")
+    parser.add_argument("--real-models", action="store_true", help="Use the YOLO and PaddleOCR models")
+    parser.add_argument("--max-frames", type=int)
+    parser.add_argument("--parking-seconds", type=float, default=10,
+                        help="Dwell time before a stationary car is a violation")
+    parser.add_argument("--detect-ms", type=float, default=0, help="Emulated latency of each stub model call")
+    parser.add_argument("--ocr-ms", type=float, default=0, help="Emulated latency of each stub OCR call")
+    parser.add_argument("--drain-timeout", type=float, default=60, help="Seconds to wait for queued OCR jobs")
+    parser.add_argument("--decoder", choices=("opencv", "ffmpeg"), default="opencv",
+                        help="ffmpeg falls back to OpenCV when it isn't installed")
+    parser.add_argument("--decode-width", type=int, help="ffmpeg: scale to this width while decoding")
+    parser.add_argument("--decode-fps", type=float, help="ffmpeg: drop frames while decoding to this rate")
+    parser.add_argument("--keyframes-only", action="store_true", help="ffmpeg: decode keyframes only")
+    synthetic = parser.add_argument_group("synthetic video")
+    synthetic.add_argument("--width", type=int, default=960)
+    synthetic.add_argument("--height", type=int, default=540)
+    synthetic.add_argument("--fps", type=int, default=30)
+    synthetic.add_argument("--seconds", type=int, default=60)
+    synthetic.add_argument("--parked", type=int, default=4)
+    synthetic.add_argument("--moving", type=int, default=6)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    run(parse_args())
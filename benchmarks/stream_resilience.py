@@ -0,0 +1,127 @@
+"""
+Check that StreamReader survives a camera outage and never hands out stale frames.
+
+A fake camera produces synthetic frames in real time and goes dark for a while
+(grab fails and reopening fails) partway through. A deliberately slow consumer
+reads from a StreamReader over it, like a pipeline that cannot keep up. The run
+fails if the reader does not reconnect, if frames do not resume soon after the
+outage ends, or if a frame handed out is older than a couple of frame intervals.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path[:0] = [REPO_DIR, BENCH_DIR]
+
+import cv2
+import numpy as np
+import synthetic_video
+from stream_reader import StreamReader
+
+
+class FakeCamera:
+    """Enough of cv2.VideoCapture to stand in for a live stream with an outage"""
+
+    def __init__(self, cars, args, started):
+        self.cars = cars
+        self.args = args
+        self.started = started
+        self.index = None
+        self.opened = not self._in_outage()
+
+    def _in_outage(self):
+        elapsed = time.time() - self.started
+        return self.args.outage_at <= elapsed < self.args.outage_at + self.args.outage
+
+    def isOpened(self):
+        return self.opened
+
+    def get(self, prop):
+        return {cv2.CAP_PROP_FRAME_WIDTH: self.args.width, cv2.CAP_PROP_FRAME_HEIGHT: self.args.height,
+                cv2.CAP_PROP_FPS: self.args.fps}.get(prop, 0.0)
+
+    def grab(self):
+        # The camera runs on wall-clock time: wait for its next frame
+        now = time.time() - self.started
+        index = int(now * self.args.fps) + 1
+        time.sleep(max(0.0, index / self.args.fps - now))
+        if not self.opened or self._in_outage():
+            return False
+        self.index = index
+        return True
+
+    def retrieve(self):
+        frame = synthetic_video.render_frame(self.cars, self.index, self.args.width, self.args.height)
+        return True, frame
+
+    def release(self):
+        self.opened = False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=8, help="Length of the run")
+    parser.add_argument("--fps", type=float, default=25, help="Camera frame rate")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=360)
+    parser.add_argument("--outage-at", type=float, default=3, help="Seconds into the run the camera goes dark")
+    parser.add_argument("--outage", type=float, default=2, help="How long the camera stays dark")
+    parser.add_argument("--process-time", type=float, default=0.1, help="Simulated pipeline time per frame")
+    parser.add_argument("--max-resume", type=float, default=2, help="Allowed seconds from outage end to next frame")
+    parser.add_argument("--output", help="Write the results as JSON")
+    args = parser.parse_args()
+
+    cars = synthetic_video.build_scene(args.width, args.height, int(args.seconds * args.fps) + 1, 4, 6)
+    started = time.time()
+    reader = StreamReader(lambda: FakeCamera(cars, args, started), base_delay=0.2, max_delay=1).start()
+    if not reader.wait_connected(5):
+        print("FAIL: never connected")
+        sys.exit(1)
+
+    ages = []
+    outage_end = started + args.outage_at + args.outage
+    first_after_outage = None
+    while time.time() - started < args.seconds:
+        ret, frame = reader.read()
+        if not ret:
+            break
+        now = time.time()
+        ages.append(now - reader.captured_at)
+        if first_after_outage is None and reader.captured_at >= outage_end:
+            first_after_outage = reader.captured_at
+        time.sleep(args.process_time)
+    reader.release()
+
+    frame_interval = 1 / args.fps
+    results = {
+        "frames_read": len(ages),
+        "reconnects": reader.reconnects,
+        "resume_seconds": None if first_after_outage is None else first_after_outage - outage_end,
+        "frame_age_ms_mean": 1000 * float(np.mean(ages)) if ages else None,
+        "frame_age_ms_max": 1000 * float(np.max(ages)) if ages else None,
+    }
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    failures = []
+    if reader.reconnects < 1:
+        failures.append("reader never reconnected")
+    if results["resume_seconds"] is None or results["resume_seconds"] > args.max_resume:
+        failures.append(f"frames did not resume within {args.max_resume}s of the outage ending")
+    if ages and max(ages) > 2 * frame_interval:
+        failures.append(f"a frame was {max(ages) * 1000:.0f} ms old; the reader is handing out stale frames")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
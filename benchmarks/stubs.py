@@ -0,0 +1,98 @@
+"""
+Lightweight stand-ins for the YOLO models and PaddleOCR.
+
+They expose just the parts of the Ultralytics and PaddleOCR APIs the pipeline uses,
+so the benchmark measures the pipeline itself. Detection works on the synthetic
+video: anything that differs from the grey tarmac is a car, the white rectangle
+inside it is the plate. An optional latency emulates model inference time.
+"""
+import time
+import zlib
+import cv2
+import numpy as np
+from synthetic_video import BACKGROUND
+from trackers import CAR_CLASS, IoUTracker, TrackedBoxes, TrackResult
+
+
+class StubCarDetector:
+    """Blob detector; called like a YOLO model, and .track() stands in for Ultralytics' trackers"""
+
+    def __init__(self, min_area=2000, latency=0.0):
+        self.min_area = min_area
+        self.latency = latency
+        self.tracker = IoUTracker()
+        self.ultralytics_tracker = None  # Created on first use when .track() is given a tracker YAML
+        self.kernel = np.ones((5, 5), np.uint8)
+
+    def detect(self, frame):
+        if self.latency:
+            time.sleep(self.latency)
+        diff = cv2.absdiff(frame, np.full_like(frame, BACKGROUND)).max(axis=2)
+        # Pixels blacked out by the region mask are not cars
+        foreground = ((diff > 30) & (frame.max(axis=2) > 0)).astype(np.uint8)
+        foreground = cv2.morphologyEx(foreground, cv2.MORPH_OPEN, self.kernel)
+        count, _, stats, _ = cv2.connectedComponentsWithStats(foreground)
+        boxes = [(x, y, x + w, y + h) for x, y, w, h, area in stats[1:count] if area >= self.min_area]
+        return np.array(boxes, dtype=np.float32).reshape(-1, 4)
+
+    def __call__(self, frame, **kwargs):
+        boxes = self.detect(frame)
+        return [TrackResult(TrackedBoxes(boxes, np.full(len(boxes), CAR_CLASS)))]
+
+    def track(self, frame, persist=True, tracker=None, **kwargs):
+        boxes = self.detect(frame)
+        if tracker is None:
+            ids = self.tracker.update(boxes)
+            return [TrackResult(TrackedBoxes(boxes, np.full(len(boxes), CAR_CLASS), ids))]
+        return [self._ultralytics_track(frame, boxes, tracker)]
+
+    def _ultralytics_track(self, frame, boxes, tracker):
+        """Run Ultralytics' ByteTrack or BoT-SORT (given by its YAML) on the blob detections"""
+        from ultralytics.engine.results import Boxes
+        from ultralytics.trackers.track import TRACKER_MAP
+        from ultralytics.utils import IterableSimpleNamespace, YAML
+        from ultralytics.utils.checks import check_yaml
+        if self.ultralytics_tracker is None:
+            config = IterableSimpleNamespace(**YAML.load(check_yaml(tracker)))
+            self.ultralytics_tracker = TRACKER_MAP[config.tracker_type](config)
+        data = np.hstack([boxes, np.ones((len(boxes), 1)), np.full((len(boxes), 1), CAR_CLASS)]).astype(np.float32)
+        tracks = self.ultralytics_tracker.update(Boxes(data, frame.shape[:2]), frame)
+        if not len(tracks):
+            return TrackResult(TrackedBoxes(np.empty((0, 4)), np.empty(0), np.empty(0)))
+        return TrackResult(TrackedBoxes(tracks[:, :4], tracks[:, 6], tracks[:, 4]))
+
+
+class StubPlateDetector:
+    """Finds the white plate rectangle in a car crop, called like a YOLO model"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+
+    def __call__(self, car_img, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        white = (car_img.min(axis=2) > 230).astype(np.uint8)
+        count, _, stats, _ = cv2.connectedComponentsWithStats(white)
+        if count < 2:
+            return [TrackResult(TrackedBoxes(np.empty((0, 4)), []))]
+        x, y, w, h, _ = max(stats[1:count], key=lambda s: s[4])
+        return [TrackResult(TrackedBoxes([[x, y, x + w, y + h]], [0]))]
+
+
+class StubOCR:
+    """
+    Returns a valid plate in PaddleOCR's result layout: text if given, otherwise one
+    derived from the image so that each car's evidence reads as its own plate.
+    """
+
+    def __init__(self, text=None, confidence=0.95, latency=0.0):
+        self.text = text
+        self.confidence = confidence
+        self.latency = latency
+
+    def ocr(self, img, cls=True):
+        if self.latency:
+            time.sleep(self.latency)
+        h, w = img.shape[:2]
+        text = self.text or f"ABC{zlib.crc32(img.tobytes()) % 10000:04d}"
+        return [[[[[0, 0], [w, 0], [w, h], [0, h]], (text, self.confidence)]]]
@@ -0,0 +1,119 @@
+"""
+Render a synthetic parking-lot video for benchmarking.
+
+Cars are coloured rectangles with a white plate carrying black text. Parked cars
+sit still for the whole clip; moving cars drive across the lot. A ground-truth
+JSON file next to the video lists every car, its plate and when it is parked.
+"""
+import argparse
+import json
+import cv2
+import numpy as np
+
+BACKGROUND = (90, 90, 90)
+CAR_SIZE = (120, 70)  # Width, height
+PLATE_SIZE = (70, 22)
+CAR_COLORS = [(0, 0, 200), (200, 0, 0), (0, 160, 0), (0, 200, 200), (40, 40, 40), (200, 200, 200)]
+
+
+def _plate(index):
+    letters = "".join(chr(ord('A') + (index * 7 + k) % 26) for k in range(3))
+    return f"{letters}{1000 + index * 37 % 9000}"
+
+
+def build_scene(width, height, frames, parked, moving, seed=0):
+    """Describe each car as a dict; x/y are functions of the frame number"""
+    rng = np.random.default_rng(seed)
+    cars = []
+    car_w, car_h = CAR_SIZE
+
+    # Parked cars fill a row of slots along the top of the lot
+    slot_w = car_w + 40
+    for i in range(parked):
+        column, row = i % max(1, (width - 40) // slot_w), i // max(1, (width - 40) // slot_w)
+        x, y = 20 + column * slot_w, 20 + row * (car_h + 40)
+        cars.append({"plate": _plate(i), "color": CAR_COLORS[i % len(CAR_COLORS)], "parked": True,
+                     "path": (x, y, x, y), "start": 0, "end": frames})
+
+    # Moving cars drive left to right through the lower half, staggered in time
+    lane_y = height - car_h - 30
+    for i in range(moving):
+        start = int(rng.integers(0, max(1, frames // 2)))
+        duration = int(rng.integers(frames // 6 + 1, frames // 3 + 2))
+        y = lane_y - (i % 3) * (car_h + 20)
+        cars.append({"plate": _plate(parked + i), "color": CAR_COLORS[(parked + i) % len(CAR_COLORS)],
+                     "parked": False, "path": (-car_w, y, width, y), "start": start, "end": start + duration})
+    return cars
+
+
+def car_position(car, frame_index):
+    if not car["start"] <= frame_index < car["end"]:
+        return None
+    x0, y0, x1, y1 = car["path"]
+    t = (frame_index - car["start"]) / max(1, car["end"] - car["start"] - 1)
+    return int(x0 + (x1 - x0) * t), int(y0 + (y1 - y0) * t)
+
+
+def render_frame(cars, frame_index, width, height, rng=None):
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    frame[:] = BACKGROUND
+    car_w, car_h = CAR_SIZE
+    plate_w, plate_h = PLATE_SIZE
+    for car in cars:
+        position = car_position(car, frame_index)
+        if position is None:
+            continue
+        x, y = position
+        cv2.rectangle(frame, (x, y), (x + car_w, y + car_h), car["color"], -1)
+        px, py = x + (car_w - plate_w) // 2, y + car_h - plate_h - 6
+        cv2.rectangle(frame, (px, py), (px + plate_w, py + plate_h), (255, 255, 255), -1)
+        cv2.putText(frame, car["plate"], (px + 3, py + plate_h - 6), cv2.FONT_HERSHEY_SIMPLEX, 0.45,
+                    (0, 0, 0), 1)
+    if rng is not None:
+        # A little sensor noise so frame differencing isn't trivially zero
+        noise = rng.integers(-3, 4, size=frame.shape, dtype=np.int16)
+        frame = np.clip(frame.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+    return frame
+
+
+def generate(path, width=960, height=540, fps=30, seconds=60, parked=4, moving=6, seed=0, noise=True):
+    """Write the video to path and the ground truth to path + '.json'; returns the ground truth"""
+    frames = int(fps * seconds)
+    cars = build_scene(width, height, frames, parked, moving, seed)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"Could not open video writer for {path}")
+    rng = np.random.default_rng(seed) if noise else None
+    try:
+        for i in range(frames):
+            writer.write(render_frame(cars, i, width, height, rng))
+    finally:
+        writer.release()
+
+    truth = {
+        "width": width,
+        "height": height,
+        "fps": fps,
+        "frames": frames,
+        "cars": [{"plate": car["plate"], "parked": car["parked"], "start_frame": car["start"],
+                  "end_frame": car["end"]} for car in cars],
+    }
+    with open(path + ".json", "w") as f:
+        json.dump(truth, f, indent=2)
+    return truth
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("output", help="Path of the .mp4 to write")
+    parser.add_argument("--width", type=int, default=960)
+    parser.add_argument("--height", type=int, default=540)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--seconds", type=int, default=60)
+    parser.add_argument("--parked", type=int, default=4)
+    parser.add_argument("--moving", type=int, default=6)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    truth = generate(args.output, args.width, args.height, args.fps, args.seconds, args.parked, args.moving,
+                     args.seed)
+    print(f"Wrote {truth['frames']} frames to {args.output}")
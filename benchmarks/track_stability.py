@@ -0,0 +1,159 @@
+"""
+Compare tracker options: speed and ID stability.
+
+Each combination of tracker (config.TRACKER choices) and detection interval is run
+over the same sequence. On the synthetic scene, boxes are matched to ground truth
+(IoU >= 0.5) and ID switches are counted; on a recorded video (--video) there is no
+ground truth, so the number of track ids and their mean length stand in.
+
+With the stub detector, ByteTrack and BoT-SORT run on the stub's detections when
+Ultralytics is installed (otherwise only 'iou' runs); --real-models detects with
+YOLO instead, which only finds cars in recorded footage.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path[:0] = [REPO_DIR, BENCH_DIR]
+
+import numpy as np
+import synthetic_video
+from stubs import StubCarDetector
+from trackers import CarTracker, TRACKER_CHOICES, iou_matrix
+
+
+def synthetic_frames(args):
+    cars = synthetic_video.build_scene(args.width, args.height, args.frames, args.parked, args.moving)
+    car_w, car_h = synthetic_video.CAR_SIZE
+    for i in range(args.frames):
+        truth = {}
+        for index, car in enumerate(cars):
+            position = synthetic_video.car_position(car, i)
+            if position is None:
+                continue
+            x, y = position
+            visible = (min(x + car_w, args.width) - max(x, 0)) * (min(y + car_h, args.height) - max(y, 0))
+            if visible >= 0.5 * car_w * car_h:  # Ignore cars mostly outside the frame
+                truth[index] = (max(x, 0), max(y, 0), min(x + car_w, args.width), min(y + car_h, args.height))
+        yield synthetic_video.render_frame(cars, i, args.width, args.height), truth
+
+
+def video_frames(path, limit):
+    import cv2
+    cap = cv2.VideoCapture(path)
+    count = 0
+    while limit is None or count < limit:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        count += 1
+        yield frame, None
+    cap.release()
+
+
+def evaluate(tracker, frames):
+    seconds = 0.0
+    processed = 0
+    track_lengths = defaultdict(int)
+    assigned = {}  # Ground-truth car -> last track id matched to it
+    switches = matched = truth_boxes = 0
+
+    for frame_count, (frame, truth) in enumerate(frames, start=1):
+        start = time.perf_counter()
+        boxes = tracker.update(frame, frame_count).boxes
+        seconds += time.perf_counter() - start
+        processed += 1
+
+        ids = boxes.id if boxes.id is not None else np.full(len(boxes), -1)
+        for track_id in ids:
+            if track_id >= 0:
+                track_lengths[int(track_id)] += 1
+        if truth is None:
+            continue
+
+        truth_boxes += len(truth)
+        if not truth or not len(boxes):
+            continue
+        keys = list(truth)
+        iou = iou_matrix(np.array([truth[k] for k in keys], dtype=np.float32), boxes.xyxy)
+        for row, key in enumerate(keys):
+            col = int(np.argmax(iou[row]))
+            if iou[row, col] < 0.5 or ids[col] < 0:
+                continue
+            matched += 1
+            if key in assigned and assigned[key] != ids[col]:
+                switches += 1
+            assigned[key] = int(ids[col])
+
+    result = {
+        "frames": processed,
+        "ms_per_frame": 1000 * seconds / processed if processed else 0.0,
+        "fps": processed / seconds if seconds else 0.0,
+        "track_ids": len(track_lengths),
+        "mean_track_length": sum(track_lengths.values()) / len(track_lengths) if track_lengths else 0.0,
+    }
+    if truth_boxes:
+        result.update({"id_switches": switches, "recall": matched / truth_boxes,
+                       "ground_truth_cars": len(assigned)})
+    return result
+
+
+def ultralytics_available():
+    try:
+        import ultralytics.trackers  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def run(args):
+    if args.real_models:
+        from ultralytics import YOLO
+        make_model = lambda: YOLO(os.path.join(REPO_DIR, 'models', 'yolov8n.pt'))
+        trackers = args.trackers or TRACKER_CHOICES
+    else:
+        make_model = StubCarDetector
+        trackers = args.trackers or (TRACKER_CHOICES if ultralytics_available() else ['iou'])
+
+    results = []
+    for name in trackers:
+        for interval in args.intervals:
+            frames = video_frames(args.video, args.max_frames) if args.video else synthetic_frames(args)
+            result = evaluate(CarTracker(make_model(), tracker=name, detect_interval=interval), frames)
+            result.update({"tracker": name, "detect_interval": interval})
+            results.append(result)
+            print(f"{name:10s} k={interval}: {result['fps']:7.1f} FPS, {result['track_ids']} ids"
+                  + (f", {result['id_switches']} switches, recall {result['recall']:.2f}"
+                     if "id_switches" in result else ""))
+
+    with open(args.output, "w") as f:
+        json.dump({"video": args.video or "synthetic", "models": "real" if args.real_models else "stub",
+                   "results": results}, f, indent=2)
+    print(f"Results written to {args.output}")
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", help="Recorded sequence to run (default: synthetic scene with ground truth)")
+    parser.add_argument("--real-models", action="store_true", help="Detect with models/yolov8n.pt")
+    parser.add_argument("--trackers", nargs="+", choices=TRACKER_CHOICES)
+    parser.add_argument("--intervals", nargs="+", type=int, default=[1, 2, 3, 5], help="Detection intervals k")
+    parser.add_argument("--max-frames", type=int)
+    parser.add_argument("--output", default="tracker_stability.json")
+    synthetic = parser.add_argument_group("synthetic scene")
+    synthetic.add_argument("--width", type=int, default=960)
+    synthetic.add_argument("--height", type=int, default=540)
+    synthetic.add_argument("--frames", type=int, default=900)
+    synthetic.add_argument("--parked", type=int, default=4)
+    synthetic.add_argument("--moving", type=int, default=8)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    run(parse_args())
@@ -46,6 +46,7 @@ PyInstaller.__main__.run([
     
     # Additional data files
     '--add-data=config.py;.',
+    '--add-data=botsort_static.yaml;.',
     
     # Hidden imports
     '--hidden-import=paddleocr',
@@ -0,0 +1,112 @@
+import os
+import struct
+import time
+import zlib
+
+# File layout, little-endian:
+#   header: magic, version, saved_at, violation count, parked count
+#   violations: violation id (0 while OCR is pending), start time, center (x, y, has_center),
+#               then location, plate and image path as length-prefixed UTF-8
+#   parked: center (x, y), frames stationary so far, then location
+#   trailer: CRC-32 of everything before it
+MAGIC = b"PKCP"
+VERSION = 1
+_HEADER = struct.Struct("<4sHdII")
+_VIOLATION = struct.Struct("<qdiiB")
+_PARKED = struct.Struct("<iii")
+_STRING = struct.Struct("<H")
+_CRC = struct.Struct("<I")
+
+
+class CheckpointViolation:
+    def __init__(self, violation_id, start_time, location, center, plate, image_path):
+        self.violation_id = violation_id  # None while OCR is pending
+        self.start_time = start_time
+        self.location = location
+        self.center = center
+        self.plate = plate
+        self.image_path = image_path
+
+
+class CheckpointParked:
+    """A stationary car that has not reached its zone's dwell limit yet"""
+
+    def __init__(self, location, center, stationary_frames):
+        self.location = location
+        self.center = center
+        self.stationary_frames = stationary_frames
+
+
+class Checkpoint:
+    def __init__(self, saved_at, violations, parked):
+        self.saved_at = saved_at
+        self.violations = violations
+        self.parked = parked
+
+
+def _pack_string(text):
+    data = (text or "").encode("utf-8")[:0xFFFF]
+    return _STRING.pack(len(data)) + data
+
+
+def _unpack_string(data, offset):
+    (length,), offset = _STRING.unpack_from(data, offset), offset + _STRING.size
+    return data[offset:offset + length].decode("utf-8"), offset + length
+
+
+def save_checkpoint(path, violations, parked):
+    """Write the checkpoint atomically: a crash leaves either the old file or the new one"""
+    parts = [_HEADER.pack(MAGIC, VERSION, time.time(), len(violations), len(parked))]
+    for v in violations:
+        x, y = v.center if v.center is not None else (0, 0)
+        parts.append(_VIOLATION.pack(v.violation_id or 0, v.start_time, int(x), int(y), v.center is not None))
+        parts.extend((_pack_string(v.location), _pack_string(v.plate), _pack_string(v.image_path)))
+    for p in parked:
+        parts.append(_PARKED.pack(int(p.center[0]), int(p.center[1]), int(p.stationary_frames)))
+        parts.append(_pack_string(p.location))
+    body = b"".join(parts)
+
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(body + _CRC.pack(zlib.crc32(body)))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+def load_checkpoint(path):
+    """The saved Checkpoint, or None if there is none or it is unreadable"""
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+
+    try:
+        body, (crc,) = data[:-_CRC.size], _CRC.unpack(data[-_CRC.size:])
+        if zlib.crc32(body) != crc:
+            raise ValueError("checksum mismatch")
+        magic, version, saved_at, violation_count, parked_count = _HEADER.unpack_from(body)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"unsupported format {magic!r} v{version}")
+
+        offset = _HEADER.size
+        violations = []
+        for _ in range(violation_count):
+            violation_id, start_time, x, y, has_center = _VIOLATION.unpack_from(body, offset)
+            offset += _VIOLATION.size
+            location, offset = _unpack_string(body, offset)
+            plate, offset = _unpack_string(body, offset)
+            image_path, offset = _unpack_string(body, offset)
+            violations.append(CheckpointViolation(violation_id or None, start_time, location,
+                                                  (x, y) if has_center else None, plate, image_path))
+        parked = []
+        for _ in range(parked_count):
+            x, y, frames = _PARKED.unpack_from(body, offset)
+            offset += _PARKED.size
+            location, offset = _unpack_string(body, offset)
+            parked.append(CheckpointParked(location, (x, y), frames))
+    except (struct.error, ValueError, UnicodeDecodeError) as e:
+        print(f"Ignoring unreadable checkpoint {path}: {e}")
+        return None
+    return Checkpoint(saved_at, violations, parked)
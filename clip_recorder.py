@@ -0,0 +1,141 @@
+import asyncio
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+import cv2
+import numpy as np
+from background import get_background_loop
+from metrics import metrics
+from config import CLIP_SECONDS, CLIP_FPS, CLIP_WIDTH, CLIP_JPEG_QUALITY, CLIP_RING_MAX_BYTES, CLIP_MAX_PENDING
+
+CLIP_SUFFIX = "_clip.mp4"
+
+
+def clip_path_for(image_path, name):
+    """
+    Clips are stored next to their still image but named after the violation: still
+    images are content-addressed and can be shared between rows, clips never are
+    """
+    return os.path.join(os.path.dirname(image_path), name + CLIP_SUFFIX)
+
+
+class ClipRecorder:
+    """
+    Keeps the last few minutes of video as a ring of downscaled JPEG frames and
+    turns it into an MP4 when a car is first found stationary.
+
+    The detection thread only samples and downscales frames; JPEG compression runs
+    on its own thread and MP4 encoding on the background loop. The ring is capped
+    both by age (seconds) and by total bytes, evicting the oldest frames first. Pending clips
+    hold references to ring frames, so at most max_pending clips are queued and
+    memory stays under (max_pending + 1) * max_bytes.
+    """
+
+    def __init__(self, seconds=CLIP_SECONDS, fps=CLIP_FPS, width=CLIP_WIDTH, quality=CLIP_JPEG_QUALITY,
+                 max_bytes=CLIP_RING_MAX_BYTES, max_pending=CLIP_MAX_PENDING, background=None):
+        self.seconds = seconds
+        self.interval = 1 / fps
+        self.fps = fps
+        self.width = width
+        self.encode_params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+        self.max_bytes = max_bytes
+
+        self.ring = deque()  # (frame_time, jpeg bytes), oldest first
+        self.ring_bytes = 0
+        self.lock = threading.Lock()
+        self.last_sample = None
+
+        self.background = background or get_background_loop()
+        self.max_pending = max_pending
+        self.pending = 0  # Clips queued or being encoded
+
+        self.compress_queue = queue.Queue(maxsize=8)
+        threading.Thread(target=self._compress_loop, daemon=True, name="ClipCompressor").start()
+
+    def add_frame(self, frame, frame_time):
+        """Sample a frame into the ring; cheap enough for the detection thread"""
+        if not self.seconds or (self.last_sample is not None and frame_time - self.last_sample < self.interval):
+            return
+        self.last_sample = frame_time
+        height, width = frame.shape[:2]
+        if width > self.width:
+            # The resize also gives the compressor its own copy of the frame
+            small = cv2.resize(frame, (self.width, int(height * self.width / width)), interpolation=cv2.INTER_AREA)
+        else:
+            small = frame.copy()
+        try:
+            self.compress_queue.put_nowait((frame_time, small))
+        except queue.Full:
+            metrics.increment("clip_frames_dropped")
+
+    def _compress_loop(self):
+        while True:
+            frame_time, small = self.compress_queue.get()
+            ok, encoded = cv2.imencode(".jpg", small, self.encode_params)
+            if not ok:
+                continue
+            data = encoded.tobytes()
+            with self.lock:
+                self.ring.append((frame_time, data))
+                self.ring_bytes += len(data)
+                while self.ring and (self.ring_bytes > self.max_bytes or
+                                     frame_time - self.ring[0][0] > self.seconds):
+                    _, old = self.ring.popleft()
+                    self.ring_bytes -= len(old)
+
+    def request_clip(self, image_path, name, on_done=None):
+        """
+        Queue an MP4 of the frames currently in the ring, saved as name + CLIP_SUFFIX
+        beside the still image. image_path is the still image's path, or a Future
+        resolving to it; name must be unique to the violation. Returns a Future with
+        the clip's path (None if the ring is empty, the encoder is backed up or writing
+        failed); on_done(path) is called on the background executor once it is written.
+        """
+        with self.lock:
+            frames = list(self.ring)
+            busy = self.pending >= self.max_pending
+            if frames and not busy:
+                self.pending += 1
+        if frames and not busy:
+            return self.background.submit(self._encode(frames, image_path, name, on_done))
+
+        if busy:
+            print("Clip encoder is busy; skipping pre-event clip")
+            metrics.increment("clips_dropped")
+        future = Future()
+        future.set_result(None)
+        return future
+
+    async def _encode(self, frames, image_path, name, on_done):
+        try:
+            if isinstance(image_path, Future):
+                # Wait for the still image without holding an executor thread
+                image_path = await asyncio.wrap_future(image_path)
+            start = time.perf_counter()
+            path = clip_path_for(image_path, name)
+            await self.background.call(self._write_mp4, frames, path)
+            metrics.observe("clip_encode", time.perf_counter() - start)
+            if on_done:
+                await self.background.call(on_done, path)
+            return path
+        except Exception as e:
+            print(f"Error writing evidence clip: {e}")
+            return None
+        finally:
+            with self.lock:
+                self.pending -= 1
+
+    def _write_mp4(self, frames, path):
+        first = cv2.imdecode(np.frombuffer(frames[0][1], np.uint8), cv2.IMREAD_COLOR)
+        height, width = first.shape[:2]
+        temp_path = path[:-len(".mp4")] + ".tmp.mp4"
+        writer = cv2.VideoWriter(temp_path, cv2.VideoWriter_fourcc(*'mp4v'), self.fps, (width, height))
+        try:
+            for _, data in frames:
+                writer.write(cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR))
+        finally:
+            writer.release()
+        os.replace(temp_path, path)
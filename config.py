@@ -7,4 +7,82 @@ MOVEMENT_THRESHOLD = 10  # Increased threshold for movement detection
 STATIONARY_FRAMES = 60  # Number of frames to consider a car stationary (now easily adjustable)
 MAX_TRACKING_AGE = 5  # Maximum number of seconds to keep tracking data
 ILLEGAL_PARKING_FRAMES = 900 # Number of frames before logging violation (5 seconds at 60 FPS)
+LOG_WINDOW_SIZE = 200  # Rows the log window keeps loaded around the visible area
+LOG_REFRESH_INTERVAL = 5  # Seconds between checks for new or changed violations
+EXPORT_PAGE_SIZE = 2000  # Rows fetched per query when exporting
+IMAGE_FORMAT = 'jpg'  # Evidence image format: 'jpg' or 'webp'
+JPEG_QUALITY = 90
+WEBP_QUALITY = 85
+IMAGE_WRITE_QUEUE_SIZE = 32  # Pending evidence images before writes fall back to the caller's thread
+THUMBNAIL_SIZE = (320, 180)  # Maximum thumbnail width and height
+EVIDENCE_MAX_AGE_DAYS = 90  # Delete evidence images older than this (None to keep forever)
+EVIDENCE_MAX_BYTES = 20 * 1024 ** 3  # Delete the oldest evidence once the store exceeds this size
+RETENTION_INTERVAL = 3600  # Seconds between retention runs
+SYNC_BATCH_SIZE = 500  # Writes per Firestore batch (Firestore's limit is 500)
+SYNC_READ_LIMIT = 5000  # Outbox entries read per sync round
+SYNC_WORKERS = 4  # Firestore batches committed in parallel on the background executor
+DELIVERY_QUEUE_PATH = 'delivery_queue.db'  # Durable retry queue for Firestore sync and notifications
+DELIVERY_MAX_CONCURRENCY = 4  # Outbound deliveries running at once
+DELIVERY_BASE_DELAY = 2  # Seconds; retry delays grow exponentially from here with full jitter
+DELIVERY_MAX_DELAY = 300  # Upper bound on a single retry delay
+BREAKER_FAILURE_THRESHOLD = 5  # Consecutive failures before an endpoint's circuit opens
+BREAKER_RESET_TIMEOUT = 60  # Seconds before a probe is let through an open circuit
+NOTIFICATION_BUFFER_PATH = 'notification_buffer.db'  # Pending notifications waiting for a send threshold
+FCM_MULTICAST_LIMIT = 500  # Device tokens per send_each_for_multicast call (FCM's limit is 500)
+NOTIFICATION_MAX_BODY_CHARS = 1000  # Longer plate lists are summarised as "...and N more"
+METRICS_WINDOW = 1000  # Recent samples kept per stage for p50/p95/p99
+METRICS_PORT = 9108  # Local Prometheus endpoint: http://127.0.0.1:9108/metrics
+METRICS_STATS_FILE = 'pipeline_stats.json'  # Periodic JSON snapshot of the same metrics
+METRICS_STATS_INTERVAL = 10  # Seconds between stats file writes
+TRACING_ENABLED = False  # Record per-frame and per-OCR-job spans for Chrome/Perfetto traces
+TRACE_BUFFER_EVENTS = 200000  # Ring buffer size; the oldest spans are dropped first
+TRACE_FILE = 'pipeline_trace.json'  # Written on exit, on "Dump Trace" and on SIGUSR2
+PROFILE_SAMPLE_INTERVAL = 0.005  # Seconds between stack samples while profiling
+LOAD_SHED_MAX_STRIDE = 3  # Under overload, process at most every Nth frame before shedding plate detection
+LOAD_SHED_HIGH = 0.9  # Load (processing time / frame budget, or frame queue fill) that raises the degradation level
+LOAD_SHED_LOW = 0.6  # Load the next lower level must stay under before stepping back down
+LOAD_SHED_HOLD_FRAMES = 30  # Processed frames a load condition must last before the level changes
+TRACKER = 'bytetrack'  # 'bytetrack', 'botsort' (camera-motion compensation off) or 'iou' (built-in, NumPy only)
+DETECT_INTERVAL = 1  # Run the car detector every Nth processed frame; boxes are predicted in between
+TRACKER_IOU_THRESHOLD = 0.3  # Minimum overlap for the 'iou' tracker to continue a track
+TRACKER_MAX_AGE = 30  # Detection rounds the 'iou' tracker keeps a track it can't see
+TRACKER_MAX_CENTROID_DISTANCE = 80  # Pixels; the 'iou' tracker's fallback match distance
+PARKED_VERIFY_ENABLED = True  # Skip car detection while every tracked car is verified parked and nothing else changed
+PARKED_PATCH_SIZE = 32  # Parked cars' reference patches are compared at this size (pixels, square)
+PARKED_PATCH_THRESHOLD = 0.06  # Mean-normalized patch difference (0..1) that counts as a parked car changing
+SCENE_THUMBNAIL_SIZE = (160, 90)  # Whole-frame thumbnail used to notice anything new entering
+SCENE_CHANGE_THRESHOLD = 0.002  # Fraction of thumbnail pixels that may change before detection runs again
+PARKED_FORCE_DETECT_FRAMES = 150  # Run full detection at least this often regardless
+CLIP_SECONDS = 120  # Pre-event video kept in memory and saved as an MP4 with each violation (0 disables clips)
+CLIP_FPS = 5  # Frames per second sampled into the clip ring
+CLIP_WIDTH = 640  # Clip frames are downscaled to this width
+CLIP_JPEG_QUALITY = 70
+CLIP_RING_MAX_BYTES = 64 * 1024 ** 2  # Hard cap on the compressed frame ring; the oldest frames go first
+CLIP_MAX_PENDING = 4  # Clips waiting for or being encoded; further requests are skipped
+DUPLICATE_VIOLATION_RADIUS = 60  # Pixels; a newly parked track this close to a recent violation in its zone continues it
+DUPLICATE_VIOLATION_TTL = 120  # Seconds a violation can still be continued after its car was last seen parked
+CHECKPOINT_FILE = 'pipeline_checkpoint.bin'  # Parked cars and recent violations, for resuming after a restart
+CHECKPOINT_INTERVAL = 10  # Seconds between checkpoint writes
+CHECKPOINT_MAX_AGE = 600  # Seconds; an older checkpoint is ignored on startup
+BACKGROUND_WORKERS = 8  # Threads for blocking background I/O: image writes, database flushes, sync and deliveries
+SHUTDOWN_TIMEOUT = 30  # Seconds to wait for background work to finish on exit
+NOTIFICATION_CHECK_INTERVAL = 30  # Seconds between checks of the notification buffer's thresholds
+STREAM_RECONNECT_BASE_DELAY = 0.5  # Seconds before the first reconnect attempt; doubles per failed attempt
+STREAM_RECONNECT_MAX_DELAY = 30  # Upper bound on the reconnect delay
+STREAM_READ_TIMEOUT = 5  # Seconds without data before a stream read fails and the reader reconnects
+STREAM_CONNECT_TIMEOUT = 30  # Seconds setup waits for a stream's first frame
+VIDEO_DECODER = "opencv"  # "opencv" or "ffmpeg" (an ffmpeg subprocess that scales, crops and drops frames while decoding)
+FFMPEG_BINARY = "ffmpeg"  # ffmpeg and ffprobe executables; without them the OpenCV decoder is used
+FFPROBE_BINARY = "ffprobe"
+FFMPEG_DECODE_WIDTH = None  # Width the ffmpeg decoder scales video files to (aspect kept); None for the source width
+FFMPEG_DECODE_FPS = None  # Frame rate the ffmpeg decoder outputs; None for the source rate
+FFMPEG_CROP = None  # (x, y, width, height) in source pixels the ffmpeg decoder crops to before scaling; None for the full frame
+FFMPEG_KEYFRAMES_ONLY = False  # Decode only keyframes of video files (fast offline scans); output is resampled to FFMPEG_DECODE_FPS, default 1
+AGGREGATOR_HOST = None  # Aggregator to forward violations to (edge mode); None keeps this installation standalone
+AGGREGATOR_PORT = 7700  # Port the aggregator listens on
+AGGREGATOR_DB_PATH = 'central_violations.db'  # The aggregator's central database
+SITE_NAME = None  # This installation's name at the aggregator; defaults to the host name
+AGGREGATOR_SYNC_INTERVAL = 5  # Seconds between forwarding rounds; an idle round is a heartbeat
+AGGREGATOR_BATCH_SIZE = 200  # Outbox entries per message to the aggregator
+AGGREGATOR_TIMEOUT = 10  # Seconds to connect to the aggregator or wait for an ack
 # Add other configuration parameters here
@@ -0,0 +1,214 @@
+import asyncio
+import json
+import random
+import sqlite3
+import threading
+import time
+from background import get_background_loop
+from config import (DELIVERY_QUEUE_PATH, DELIVERY_MAX_CONCURRENCY, DELIVERY_BASE_DELAY, DELIVERY_MAX_DELAY,
+                    BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT)
+
+
+class PermanentDeliveryError(Exception):
+    """Raised by a handler when retrying can never succeed; the job is dropped"""
+
+
+class PartialDeliveryError(Exception):
+    """Raised by a handler when part of a job went through; the job is retried with payload, the rest of it"""
+
+    def __init__(self, message, payload):
+        super().__init__(message)
+        self.payload = payload
+
+
+class CircuitBreaker:
+    """Stops calling a failing endpoint, then lets a single probe through after a cool-down"""
+
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0
+
+    def allow(self):
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.time() - self.opened_at >= self.reset_timeout:
+            self.state = "half_open"  # Let exactly one probe through
+            return True
+        return False
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                print(f"Circuit breaker opened after {self.failures} failures")
+            self.state = "open"
+            self.opened_at = time.time()
+
+
+class DeliveryEngine:
+    """
+    Durable outbound delivery shared by Firestore sync and notifications.
+
+    Jobs are (kind, JSON payload) rows in a SQLite queue, so they survive restarts.
+    Each kind has a handler that raises on failure; failed jobs are retried with
+    exponential backoff and full jitter, each kind has its own circuit breaker, and
+    at most max_concurrency handlers run at once. Dispatching is a service on the
+    background loop and handlers run on its executor.
+    """
+
+    def __init__(self, queue_path=DELIVERY_QUEUE_PATH, max_concurrency=DELIVERY_MAX_CONCURRENCY, background=None):
+        self.conn = sqlite3.connect(queue_path, check_same_thread=False)
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS deliveries
+                             (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                              kind TEXT NOT NULL,
+                              payload TEXT NOT NULL,
+                              dedupe_key TEXT UNIQUE,
+                              attempts INTEGER NOT NULL DEFAULT 0,
+                              next_attempt REAL NOT NULL,
+                              created_at REAL NOT NULL,
+                              last_error TEXT)''')
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_deliveries_due ON deliveries (next_attempt)")
+        self.conn.commit()
+
+        self.max_concurrency = max_concurrency
+        self.background = background or get_background_loop()
+        self.handlers = {}
+        self.breakers = {}
+        self.in_flight = set()
+        self.lock = threading.Lock()
+        self.wake = None  # asyncio.Event, created on the loop once started
+        self.running = False
+
+    def register(self, kind, handler):
+        """Register handler(payload) for a kind of job"""
+        with self.lock:
+            self.handlers[kind] = handler
+            self.breakers.setdefault(kind, CircuitBreaker())
+        self._notify()
+
+    def submit(self, kind, payload, dedupe_key=None):
+        """
+        Durably queue a job. If dedupe_key is given and a job with that key is
+        still pending, the new job is dropped.
+        """
+        now = time.time()
+        with self.lock:
+            self.conn.execute('''INSERT OR IGNORE INTO deliveries (kind, payload, dedupe_key, next_attempt, created_at)
+                                 VALUES (?, ?, ?, ?, ?)''', (kind, json.dumps(payload), dedupe_key, now, now))
+            self.conn.commit()
+        self._notify()
+
+    def pending_count(self, kind=None):
+        with self.lock:
+            if kind is None:
+                return self.conn.execute("SELECT COUNT(*) FROM deliveries").fetchone()[0]
+            return self.conn.execute("SELECT COUNT(*) FROM deliveries WHERE kind = ?", (kind,)).fetchone()[0]
+
+    def _notify(self):
+        if self.wake is not None:
+            self.background.loop.call_soon_threadsafe(self.wake.set)
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.background.start_service("delivery", self._run())
+
+    def stop(self):
+        """Stop dispatching; deliveries in flight finish, jobs still queued are delivered on the next start"""
+        self.running = False
+        self._notify()
+
+    async def _run(self):
+        self.wake = asyncio.Event()
+        while self.running:
+            self.wake.clear()
+            # The queue is SQLite, so even the bookkeeping runs on the executor
+            await self.background.call(self._dispatch_due)
+            delay = await self.background.call(self._seconds_until_next)
+            try:
+                await asyncio.wait_for(self.wake.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def _dispatch_due(self):
+        with self.lock:
+            slots = self.max_concurrency - len(self.in_flight)
+            if slots <= 0:
+                return
+            due = self.conn.execute('''SELECT id, kind, payload, attempts FROM deliveries
+                                       WHERE next_attempt <= ? ORDER BY next_attempt LIMIT ?''',
+                                    (time.time(), slots + len(self.in_flight))).fetchall()
+            for job_id, kind, payload, attempts in due:
+                if slots <= 0:
+                    break
+                if job_id in self.in_flight or kind not in self.handlers:
+                    continue
+                if not self.breakers[kind].allow():
+                    continue
+                self.in_flight.add(job_id)
+                slots -= 1
+                self.background.run(self._deliver, job_id, kind, json.loads(payload), attempts)
+
+    def _seconds_until_next(self):
+        with self.lock:
+            row = self.conn.execute("SELECT MIN(next_attempt) FROM deliveries").fetchone()
+        if row[0] is None:
+            return 60
+        return min(60, max(0.05, row[0] - time.time()))
+
+    def _deliver(self, job_id, kind, payload, attempts):
+        try:
+            self.handlers[kind](payload)
+        except PermanentDeliveryError as e:
+            print(f"Dropping {kind} delivery {job_id}: {e}")
+            self._finish(job_id, kind, success=True)
+        except PartialDeliveryError as e:
+            self._finish(job_id, kind, success=False, attempts=attempts + 1, error=str(e), payload=e.payload)
+        except Exception as e:
+            self._finish(job_id, kind, success=False, attempts=attempts + 1, error=str(e))
+        else:
+            self._finish(job_id, kind, success=True)
+        finally:
+            self._notify()
+
+    def _finish(self, job_id, kind, success, attempts=0, error=None, payload=None):
+        with self.lock:
+            self.in_flight.discard(job_id)
+            breaker = self.breakers[kind]
+            if success:
+                breaker.record_success()
+                self.conn.execute("DELETE FROM deliveries WHERE id = ?", (job_id,))
+                # The endpoint is reachable again; don't let backed-off jobs sit out their full delay
+                self.conn.execute("UPDATE deliveries SET next_attempt = ? WHERE kind = ? AND next_attempt > ?",
+                                  (time.time(), kind, time.time()))
+            else:
+                breaker.record_failure()
+                delay = random.uniform(0, min(DELIVERY_MAX_DELAY, DELIVERY_BASE_DELAY * 2 ** attempts))
+                self.conn.execute('''UPDATE deliveries SET attempts = ?, next_attempt = ?, last_error = ?
+                                     WHERE id = ?''', (attempts, time.time() + delay, error, job_id))
+                if payload is not None:
+                    self.conn.execute("UPDATE deliveries SET payload = ? WHERE id = ?", (json.dumps(payload), job_id))
+                print(f"{kind} delivery failed (attempt {attempts}), retrying in {delay:.1f}s: {error}")
+            self.conn.commit()
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_delivery_engine():
+    """Shared engine used by every outbound channel, started on first use"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = DeliveryEngine()
+            _engine.start()
+        return _engine
@@ -0,0 +1,178 @@
+import json
+import socket
+import sqlite3
+import struct
+import threading
+from violation_store import ViolationStore, VIOLATION_COLUMNS
+from delivery import get_delivery_engine
+from background import get_background_loop
+from metrics import metrics
+from config import (AGGREGATOR_HOST, AGGREGATOR_PORT, SITE_NAME, AGGREGATOR_SYNC_INTERVAL, AGGREGATOR_BATCH_SIZE,
+                    AGGREGATOR_TIMEOUT)
+
+# Wire format between edges and the aggregator: each message is a 4-byte big-endian
+# length followed by that many bytes of UTF-8 JSON. The edge sends
+#   {"type": "batch", "site", "seq", "fields", "upserts": [[...], ...], "deletes": [id, ...], "status": {...}}
+# and the aggregator answers {"type": "ack", "seq"} once the batch is committed, or
+# {"type": "error", "seq", "message"}. upserts are rows in "fields" order, so field
+# names are sent once per batch rather than once per row.
+PROTOCOL_VERSION = 1
+MAX_MESSAGE_BYTES = 16 * 1024 * 1024
+LENGTH = struct.Struct(">I")
+# ts_epoch is sent because the timestamp text is in the edge's local time zone
+EDGE_COLUMNS = VIOLATION_COLUMNS + ", ts_epoch"
+FIELDS = [name.strip() for name in EDGE_COLUMNS.split(",")]
+
+SYNC_NAME = 'aggregator'  # Watermark name in the sync_state table
+
+
+def encode_message(message):
+    data = json.dumps(message, separators=(",", ":")).encode("utf-8")
+    if len(data) > MAX_MESSAGE_BYTES:
+        raise ValueError(f"Message of {len(data)} bytes is over the {MAX_MESSAGE_BYTES} byte limit")
+    return LENGTH.pack(len(data)) + data
+
+
+def decode_length(header):
+    (length,) = LENGTH.unpack(header)
+    if length > MAX_MESSAGE_BYTES:
+        raise ValueError(f"Message of {length} bytes is over the {MAX_MESSAGE_BYTES} byte limit")
+    return length
+
+
+def _recv_exactly(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("Aggregator closed the connection")
+        data += chunk
+    return bytes(data)
+
+
+def recv_message(sock):
+    length = decode_length(_recv_exactly(sock, LENGTH.size))
+    return json.loads(_recv_exactly(sock, length))
+
+
+class EdgeLink:
+    """
+    Edge side of aggregator mode: forwards this site's violation changes to the
+    aggregator instead of syncing them to Firebase itself.
+
+    Changes come from the local outbox, like the Firestore sync, and go out in
+    batches over one persistent TCP connection; the watermark only advances once
+    the aggregator has acked a batch, so nothing is lost if either side goes down
+    and resent batches are harmless. Rounds run through the delivery engine for
+    retry, backoff and circuit breaking. A round with no changes still sends an
+    empty batch carrying the site's status, as a heartbeat.
+    """
+
+    def __init__(self, local_db_path='parking_violations.db', site=None, address=None, engine=None, status=None):
+        self.local_db_path = local_db_path
+        self.site = site or SITE_NAME or socket.gethostname()
+        self.address = address or (AGGREGATOR_HOST, AGGREGATOR_PORT)
+        self.status = status  # Optional callable returning a JSON-serialisable summary of the site
+        self.sock = None
+        self.seq = 0
+        self.lock = threading.Lock()
+
+        self.engine = engine or get_delivery_engine()
+        self.engine.register('aggregator_sync', lambda payload: self.sync_once())
+
+    def sync_to_aggregator(self):
+        """Queue a forwarding round; a round that is already pending or being retried absorbs this one"""
+        self.engine.submit('aggregator_sync', {}, dedupe_key='aggregator_sync')
+
+    def start_periodic_sync(self, interval_seconds=AGGREGATOR_SYNC_INTERVAL, background=None):
+        """Queue a round now and every interval_seconds on the background loop"""
+        (background or get_background_loop()).every(interval_seconds, self.sync_to_aggregator,
+                                                     name="aggregator_sync", run_first=True)
+
+    def sync_once(self):
+        """Forward changes since the last acked batch. Raises on failure."""
+        with self.lock, metrics.timer("aggregator_sync"):
+            try:
+                self._sync_changes()
+            except Exception:
+                self.close()  # The connection's state is unknown; start the next round on a fresh one
+                raise
+
+    def _sync_changes(self):
+        conn = sqlite3.connect(self.local_db_path)
+        try:
+            store = ViolationStore(conn)
+            # Firestore is the aggregator's job now; a stale watermark would keep the outbox from shrinking
+            if store.get_sync_watermark('firestore', None) is not None:
+                store.remove_sync_consumer('firestore')
+
+            watermark = store.get_sync_watermark(SYNC_NAME, None)
+            sent = 0
+            if watermark is None:
+                # First contact: the outbox only holds recent changes, so send every row once
+                watermark = store.outbox_head()
+                sent += self._backfill(store)
+                store.commit_sync_watermark(SYNC_NAME, watermark)
+            while True:
+                changes = store.outbox_since(watermark, AGGREGATOR_BATCH_SIZE)
+                if not changes:
+                    break
+                sent += self._send_changes(store, changes)
+                watermark = changes[-1][0]
+                store.commit_sync_watermark(SYNC_NAME, watermark)
+        finally:
+            conn.close()
+
+        if sent:
+            metrics.increment("aggregator_changes_sent", sent)
+        else:
+            self._send_batch([], [])  # Heartbeat
+
+    def _backfill(self, store):
+        sent = 0
+        last_id = 0
+        while True:
+            rows = store.fetch_after_id(last_id, AGGREGATOR_BATCH_SIZE, EDGE_COLUMNS)
+            if not rows:
+                return sent
+            sent += self._send_batch([list(row) for row in rows], [])
+            last_id = rows[-1][0]
+
+    def _send_changes(self, store, changes):
+        # Only the latest change per violation matters
+        latest = {}
+        for _, violation_id, op in changes:
+            latest[violation_id] = op
+        rows = store.fetch_by_ids((vid for vid, op in latest.items() if op == 'upsert'), EDGE_COLUMNS)
+        upserts = [list(rows[vid]) for vid in latest if vid in rows]
+        deletes = [vid for vid in latest if vid not in rows]  # Deleted, or deleted since the upsert
+        return self._send_batch(upserts, deletes)
+
+    def _send_batch(self, upserts, deletes):
+        self.seq += 1
+        message = {"type": "batch", "version": PROTOCOL_VERSION, "site": self.site, "seq": self.seq,
+                   "fields": FIELDS, "upserts": upserts, "deletes": deletes}
+        if self.status:
+            message["status"] = self.status()
+        sock = self._connection()
+        sock.sendall(encode_message(message))
+        reply = recv_message(sock)
+        if reply.get("seq") != self.seq:
+            raise ConnectionError(f"Aggregator acked batch {reply.get('seq')}, expected {self.seq}")
+        if reply.get("type") != "ack":
+            raise RuntimeError(f"Aggregator rejected batch: {reply.get('message')}")
+        return len(upserts) + len(deletes)
+
+    def _connection(self):
+        if self.sock is None:
+            self.sock = socket.create_connection(self.address, timeout=AGGREGATOR_TIMEOUT)
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return self.sock
+
+    def close(self):
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+            self.sock = None
@@ -0,0 +1,138 @@
+import cv2
+import hashlib
+import os
+import sqlite3
+import time
+from datetime import datetime
+from background import get_background_loop
+from config import THUMBNAIL_SIZE, EVIDENCE_MAX_AGE_DAYS, EVIDENCE_MAX_BYTES
+
+THUMBNAIL_SUFFIX = "_thumb.jpg"
+
+
+def thumbnail_path(image_path):
+    """Path of the thumbnail stored next to an evidence image"""
+    return os.path.splitext(image_path)[0] + THUMBNAIL_SUFFIX
+
+
+class EvidenceStore:
+    """Content-addressed evidence images with thumbnails and retention"""
+
+    def __init__(self, base_dir="violations", local_db_path="parking_violations.db"):
+        self.base_dir = base_dir
+        self.local_db_path = local_db_path
+        self._known_dirs = set()  # Avoid a makedirs call for every image
+
+    def _target_dir(self, when):
+        directory = os.path.join(self.base_dir, when.strftime("%Y"), when.strftime("%m"), when.strftime("%d"))
+        if directory not in self._known_dirs:
+            os.makedirs(directory, exist_ok=True)
+            self._known_dirs.add(directory)
+        return directory
+
+    def put(self, image, encoded, extension, when=None):
+        """
+        Store an encoded image under its content hash and write its thumbnail.
+        Storing the same bytes again (e.g. a retried write) returns the existing path.
+        """
+        when = when or datetime.now()
+        digest = hashlib.sha256(encoded).hexdigest()[:32]
+        path = os.path.join(self._target_dir(when), f"{digest}.{extension}")
+        if os.path.exists(path):
+            return path
+
+        # Write to a temporary name first so a crash never leaves a truncated image
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(encoded)
+        os.replace(temp_path, path)
+
+        self._write_thumbnail(image, thumbnail_path(path))
+        return path
+
+    def _write_thumbnail(self, image, path):
+        height, width = image.shape[:2]
+        scale = min(THUMBNAIL_SIZE[0] / width, THUMBNAIL_SIZE[1] / height, 1.0)
+        thumb = cv2.resize(image, (max(1, int(width * scale)), max(1, int(height * scale))),
+                           interpolation=cv2.INTER_AREA)
+        ok, encoded = cv2.imencode(".jpg", thumb, [cv2.IMWRITE_JPEG_QUALITY, 80])
+        if ok:
+            encoded.tofile(path)
+
+    def _scan(self):
+        """Return (mtime, size, path) for every evidence image, oldest first"""
+        files = []
+        for root, _, names in os.walk(self.base_dir):
+            for name in names:
+                if name.endswith(THUMBNAIL_SUFFIX) or name.endswith(".tmp"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                size = stat.st_size
+                thumb = thumbnail_path(path)
+                if os.path.exists(thumb):
+                    size += os.path.getsize(thumb)
+                files.append((stat.st_mtime, size, path))
+        files.sort()
+        return files
+
+    def enforce_retention(self, max_age_days=EVIDENCE_MAX_AGE_DAYS, max_bytes=EVIDENCE_MAX_BYTES):
+        """Delete images older than max_age_days, then the oldest until under max_bytes"""
+        files = self._scan()
+        total = sum(size for _, size, _ in files)
+        cutoff = time.time() - max_age_days * 86400 if max_age_days else None
+
+        deleted = []
+        for mtime, size, path in files:
+            too_old = cutoff is not None and mtime < cutoff
+            too_big = max_bytes is not None and total > max_bytes
+            if not (too_old or too_big):
+                break
+            self.delete(path)
+            deleted.append(path)
+            total -= size
+
+        if deleted:
+            self.compact(deleted)
+            self._remove_empty_dirs()
+            print(f"Retention removed {len(deleted)} evidence images")
+        return deleted
+
+    def delete(self, path):
+        """Delete an image and its thumbnail"""
+        for target in (path, thumbnail_path(path)):
+            try:
+                os.remove(target)
+            except FileNotFoundError:
+                pass
+
+    def compact(self, deleted_paths):
+        """Clear image_path and clip_path on violations whose evidence has been deleted"""
+        conn = sqlite3.connect(self.local_db_path)
+        try:
+            paths = [os.path.abspath(p) for p in deleted_paths]
+            for i in range(0, len(paths), 500):  # Stay below SQLite's parameter limit
+                chunk = paths[i:i + 500]
+                placeholders = ','.join('?' * len(chunk))
+                conn.execute(f"UPDATE violations SET image_path = NULL WHERE image_path IN ({placeholders})", chunk)
+                conn.execute(f"UPDATE violations SET clip_path = NULL WHERE clip_path IN ({placeholders})", chunk)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _remove_empty_dirs(self):
+        for root, dirs, files in os.walk(self.base_dir, topdown=False):
+            # Directories the writer has cached stay, so it never writes into a removed one
+            if root != self.base_dir and root not in self._known_dirs and not dirs and not files:
+                try:
+                    os.rmdir(root)
+                except OSError:
+                    pass
+
+    def start_periodic_retention(self, interval_seconds=3600):
+        """Enforce retention now and every interval_seconds on the background loop"""
+        get_background_loop().every(interval_seconds, self.enforce_retention, name="evidence_retention",
+                                    run_first=True)
@@ -0,0 +1,148 @@
+import csv
+import os
+import sqlite3
+import openpyxl
+from violation_store import ViolationStore
+from config import EXPORT_PAGE_SIZE
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet/Arrow export is optional
+    pa = None
+    pq = None
+
+HEADERS = ['ID', 'Timestamp', 'License Plate', 'Color', 'Location', 'Duration', 'Image', 'Clip']
+
+# file_type: (extension, file dialog description)
+EXPORT_FORMATS = {
+    "csv": (".csv", "CSV files"),
+    "excel": (".xlsx", "Excel files"),
+    "parquet": (".parquet", "Parquet files"),
+    "arrow": (".arrow", "Arrow IPC files"),
+}
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+def columnar_available():
+    return pa is not None
+
+
+class _CsvWriter:
+    def __init__(self, file_path):
+        self.file = open(file_path, mode='w', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(HEADERS)
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class _ExcelWriter:
+    """Write-only workbook: rows are streamed to disk instead of kept as cell objects"""
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.workbook = openpyxl.Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet("Violation Logs")
+        self.sheet.append(HEADERS)
+
+    def write(self, rows):
+        for row in rows:
+            self.sheet.append(row)
+
+    def close(self):
+        self.workbook.save(self.file_path)
+
+
+class _ColumnarWriter:
+    """Parquet or Arrow IPC output, one record batch per chunk"""
+
+    def __init__(self, file_path, file_type):
+        self.schema = pa.schema([
+            ('id', pa.int64()),
+            ('timestamp', pa.string()),
+            ('license_plate', pa.string()),
+            ('car_color', pa.string()),
+            ('location', pa.string()),
+            ('parking_duration', pa.int64()),
+            ('image_path', pa.string()),
+            ('clip_path', pa.string()),
+        ])
+        if file_type == "parquet":
+            self.writer = pq.ParquetWriter(file_path, self.schema)
+        else:
+            self.sink = pa.OSFile(file_path, 'wb')
+            self.writer = pa.ipc.new_file(self.sink, self.schema)
+
+    def write(self, rows):
+        columns = list(zip(*rows))
+        batch = pa.record_batch([pa.array(column, type=field.type)
+                                 for column, field in zip(columns, self.schema)], schema=self.schema)
+        self.writer.write_batch(batch)
+
+    def close(self):
+        self.writer.close()
+        if hasattr(self, 'sink'):
+            self.sink.close()
+
+
+def _open_writer(file_path, file_type):
+    if file_type == "csv":
+        return _CsvWriter(file_path)
+    if file_type == "excel":
+        return _ExcelWriter(file_path)
+    if file_type in ("parquet", "arrow"):
+        if pa is None:
+            raise RuntimeError("Parquet/Arrow export requires the pyarrow package")
+        return _ColumnarWriter(file_path, file_type)
+    raise ValueError(f"Unknown export format: {file_type}")
+
+
+def export_violations(db_path, file_path, file_type, start=None, end=None,
+                      progress_callback=None, cancel_event=None, chunk_size=EXPORT_PAGE_SIZE):
+    """
+    Stream violations (newest first, optionally limited to [start, end)) into file_path.
+    progress_callback(done, total) is called after every chunk. Setting cancel_event stops
+    the export and removes the partial file. Returns the number of rows written.
+    """
+    conn = sqlite3.connect(db_path)
+    store = ViolationStore(conn)
+    total = store.count(start=start, end=end)
+
+    # Write to a temporary file so a cancelled or failed export never leaves a partial file behind
+    temp_path = file_path + ".part"
+    writer = _open_writer(temp_path, file_type)
+    done = 0
+    try:
+        cursor = None
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                raise ExportCancelled()
+            rows, cursor = store.query(limit=chunk_size, after=cursor, start=start, end=end)
+            if rows:
+                writer.write(rows)
+                done += len(rows)
+            if progress_callback:
+                progress_callback(done, total)
+            if cursor is None:
+                break
+        writer.close()
+        os.replace(temp_path, file_path)
+        return done
+    except BaseException:
+        try:
+            writer.close()
+        except Exception:
+            pass
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    finally:
+        conn.close()
@@ -0,0 +1,159 @@
+import json
+import shutil
+import subprocess
+import cv2
+import numpy as np
+from config import FFMPEG_BINARY, FFPROBE_BINARY, QUEUE_SIZE, STREAM_CONNECT_TIMEOUT, STREAM_READ_TIMEOUT
+
+# Frame rate used for keyframe-only decoding when none is given
+KEYFRAME_FPS = 1
+
+
+def ffmpeg_available():
+    return shutil.which(FFMPEG_BINARY) is not None and shutil.which(FFPROBE_BINARY) is not None
+
+
+def _network_options(source):
+    """Input options for live sources: TCP for RTSP and a read timeout, so a dead stream ends the process"""
+    timeout_us = str(int(STREAM_READ_TIMEOUT * 1_000_000))
+    if source.lower().startswith("rtsp"):
+        return ["-rtsp_transport", "tcp", "-timeout", timeout_us]
+    if "://" in source:
+        return ["-rw_timeout", timeout_us]
+    return []
+
+
+def probe_video(source):
+    """(width, height, fps) of the source's first video stream; fps is None if unknown"""
+    command = [FFPROBE_BINARY, "-v", "error", *_network_options(source), "-select_streams", "v:0",
+               "-show_entries", "stream=width,height,avg_frame_rate,r_frame_rate", "-of", "json", source]
+    result = subprocess.run(command, capture_output=True, text=True, timeout=STREAM_CONNECT_TIMEOUT, check=True)
+    stream = json.loads(result.stdout)["streams"][0]
+    fps = None
+    for key in ("avg_frame_rate", "r_frame_rate"):  # "30000/1001"; "0/0" when unknown
+        numerator, _, denominator = stream.get(key, "0/0").partition("/")
+        if float(numerator or 0) > 0 and float(denominator or 1) > 0:
+            fps = float(numerator) / float(denominator or 1)
+            break
+    return int(stream["width"]), int(stream["height"]), fps
+
+
+class FFmpegCapture:
+    """
+    Decodes video in an ffmpeg subprocess and reads raw BGR frames from its pipe
+    straight into preallocated arrays, instead of decoding with cv2.VideoCapture
+    and resizing in Python.
+
+    Cropping, scaling and frame-rate decimation run as ffmpeg filters inside the
+    decoder, so the pipeline only ever sees frames at the size and rate it uses.
+    keyframes_only skips decoding everything but keyframes (for fast offline
+    scans); the output is resampled to a constant fps so frame counts still map
+    to time. Has the parts of the cv2.VideoCapture interface the pipeline uses.
+
+    Frames are read into a ring of `buffers` arrays: a frame returned by read()
+    stays valid for the next buffers - 1 reads, which covers a full frame queue.
+    """
+
+    def __init__(self, source, width=None, fps=None, crop=None, keyframes_only=False, buffers=QUEUE_SIZE + 3):
+        self.source = source
+        self.process = None
+        self.ring = []
+        self.index = 0
+        self.grabbed = False
+        try:
+            source_width, source_height, source_fps = probe_video(source)
+        except (OSError, subprocess.SubprocessError, ValueError, KeyError, IndexError) as e:
+            print(f"ffmpeg could not open {source}: {e}")
+            return
+
+        filters = []
+        out_width, out_height = source_width, source_height
+        if crop:
+            x, y, out_width, out_height = (int(v) for v in crop)
+            filters.append(f"crop={out_width}:{out_height}:{x}:{y}")
+        if width and width < out_width:
+            # Even dimensions keep every pixel format and encoder happy
+            out_width, out_height = int(width) // 2 * 2, max(2, round(out_height * width / out_width / 2) * 2)
+            filters.append(f"scale={out_width}:{out_height}:flags=bilinear")
+        if keyframes_only and not fps:
+            fps = KEYFRAME_FPS
+        if fps:
+            filters.append(f"fps={fps}")
+        self.width, self.height = out_width, out_height
+        self.fps = float(fps) if fps else source_fps
+
+        command = [FFMPEG_BINARY, "-hide_banner", "-loglevel", "error", "-nostdin", *_network_options(source)]
+        if keyframes_only:
+            command += ["-skip_frame", "nokey"]
+        command += ["-i", source, "-an", "-sn", "-dn"]
+        if filters:
+            command += ["-vf", ",".join(filters)]
+        command += ["-pix_fmt", "bgr24", "-f", "rawvideo", "pipe:1"]
+        try:
+            self.process = subprocess.Popen(command, stdout=subprocess.PIPE, bufsize=0)
+        except OSError as e:
+            print(f"Could not start ffmpeg: {e}")
+            return
+        self.ring = [np.empty((out_height, out_width, 3), dtype=np.uint8) for _ in range(max(2, buffers))]
+
+    def isOpened(self):
+        return self.process is not None
+
+    def get(self, prop):
+        if self.process is None:
+            return 0.0
+        return float({cv2.CAP_PROP_FRAME_WIDTH: self.width, cv2.CAP_PROP_FRAME_HEIGHT: self.height,
+                      cv2.CAP_PROP_FPS: self.fps}.get(prop) or 0.0)
+
+    def grab(self):
+        """Read the next frame from the pipe into the ring slot the next retrieve() hands out"""
+        if self.process is None:
+            return False
+        view = memoryview(self.ring[self.index]).cast("B")
+        filled = 0
+        while filled < len(view):
+            count = self.process.stdout.readinto(view[filled:])
+            if not count:  # ffmpeg exited: end of file, or the stream failed
+                self.grabbed = False
+                return False
+            filled += count
+        self.grabbed = True
+        return True
+
+    def retrieve(self):
+        if not self.grabbed:
+            return False, None
+        frame = self.ring[self.index]
+        self.index = (self.index + 1) % len(self.ring)
+        self.grabbed = False
+        return True, frame
+
+    def read(self):
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def release(self):
+        if self.process is None:
+            return
+        process, self.process = self.process, None
+        process.terminate()
+        try:
+            process.wait(timeout=2)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+
+
+def open_video_capture(source, decoder="opencv", width=None, fps=None, crop=None, keyframes_only=False):
+    """A capture for a video file: FFmpegCapture when decoder is "ffmpeg" and it works, else cv2.VideoCapture"""
+    if decoder == "ffmpeg":
+        if not ffmpeg_available():
+            print(f"{FFMPEG_BINARY}/{FFPROBE_BINARY} not found; decoding with OpenCV")
+        else:
+            cap = FFmpegCapture(source, width, fps, crop, keyframes_only)
+            if cap.isOpened():
+                return cap
+            print("Falling back to OpenCV decoding")
+    return cv2.VideoCapture(source)
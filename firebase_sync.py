@@ -1,72 +1,115 @@
 import firebase_admin
-from firebase_admin import firestore
+from firebase_admin import credentials, firestore
 from datetime import datetime
 import sqlite3
-import time
+from violation_store import ViolationStore, VIOLATION_COLUMNS
+from delivery import get_delivery_engine
+from background import get_background_loop
+from metrics import metrics
+from config import SYNC_BATCH_SIZE, SYNC_READ_LIMIT, SYNC_WORKERS
+
+SYNC_NAME = 'firestore'  # Watermark name in the sync_state table
+SYNC_COLUMNS = VIOLATION_COLUMNS + ", site"  # site is set on an aggregator's rows from edge sites
+
+
+def init_firebase(credentials_path="firebase-adminsdk.json"):
+    """Initialize the Firebase Admin SDK once"""
+    try:
+        firebase_admin.get_app()
+    except ValueError:
+        firebase_admin.initialize_app(credentials.Certificate(credentials_path))
+
 
 class FirebaseSync:
-    def __init__(self, local_db_path='parking_violations.db'):
+    def __init__(self, local_db_path='parking_violations.db', client=None, engine=None):
         self.local_db_path = local_db_path
-        # Initialize Firestore
-        self.db = firestore.client()
+        # Initialize Firestore; any object with the same collection/batch API can stand in for tests
+        self.db = client or firestore.client()
         self.violations_ref = self.db.collection('violations')
 
+        # Sync runs go through the shared delivery engine for retry, backoff and circuit breaking
+        self.engine = engine or get_delivery_engine()
+        self.engine.register('firestore_sync', lambda payload: self.sync_once())
+
     def sync_to_firebase(self):
-        """Sync local DB to Firebase, overwriting Firebase data"""
+        """Queue a sync run; a run that is already pending or being retried absorbs this one"""
+        self.engine.submit('firestore_sync', {}, dedupe_key='firestore_sync')
+
+    def sync_once(self):
+        """Upload violations changed since the last sync, using the local outbox. Raises on failure."""
+        with metrics.timer("sync"):
+            self._sync_changes()
+
+    def _sync_changes(self):
+        conn = sqlite3.connect(self.local_db_path)
         try:
-            # Get all local violations
-            conn = sqlite3.connect(self.local_db_path)
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT id, timestamp, license_plate, location, 
-                       parking_duration, image_path, car_color 
-                FROM violations
-                ORDER BY timestamp DESC
-            """)
-            violations = cursor.fetchall()
+            store = ViolationStore(conn)
+            synced = 0
+            while True:
+                changes = store.outbox_since(store.get_sync_watermark(SYNC_NAME), SYNC_READ_LIMIT)
+                if not changes:
+                    break
+                synced += self._push_changes(store, changes)
+                # Only advance once every batch has been committed, so a failure resends the same changes
+                store.commit_sync_watermark(SYNC_NAME, changes[-1][0])
+        finally:
             conn.close()
 
-            # Clear existing Firebase collection
-            self._clear_firebase_collection()
-
-            # Upload all violations
-            batch = self.db.batch()
-            for violation in violations:
-                doc_ref = self.violations_ref.document(str(violation[0]))  # Use ID as document ID
-                batch.set(doc_ref, {
-                    'id': violation[0],
-                    'timestamp': violation[1],
-                    'license_plate': violation[2],
-                    'location': violation[3],
-                    'parking_duration': violation[4],
-                    'image_path': violation[5],
-                    'car_color': violation[6],
-                    'last_synced': datetime.now().isoformat()
-                })
-            
-            # Commit the batch
-            batch.commit()
-            print(f"Successfully synced {len(violations)} violations to Firebase")
-
-        except Exception as e:
-            print(f"Error syncing to Firebase: {e}")
-
-    def _clear_firebase_collection(self):
-        """Clear all documents in the violations collection"""
-        batch = self.db.batch()
-        docs = self.violations_ref.limit(500).stream()  # Firestore limits batches to 500
-        deleted = 0
+        if synced:
+            print(f"Successfully synced {synced} violation changes to Firebase")
+
+    def _push_changes(self, store, changes):
+        # Only the latest change per violation matters
+        latest = {}
+        for _, violation_id, op in changes:
+            latest[violation_id] = op
+        rows = store.fetch_by_ids((vid for vid, op in latest.items() if op == 'upsert'), SYNC_COLUMNS)
 
-        for doc in docs:
-            batch.delete(doc.reference)
-            deleted += 1
+        synced_at = datetime.now().isoformat()
+        operations = []
+        for violation_id in latest:
+            row = rows.get(violation_id)  # None if the row has been deleted since
+            operations.append((violation_id, self._to_document(row, synced_at) if row else None))
+
+        # Firestore allows at most 500 writes per batch; independent batches are committed in parallel
+        # on the shared executor, SYNC_WORKERS at a time. This already runs on an executor thread, so
+        # it commits one batch of each round itself rather than only waiting on the others.
+        chunks = [operations[i:i + SYNC_BATCH_SIZE] for i in range(0, len(operations), SYNC_BATCH_SIZE)]
+        for i in range(0, len(chunks), SYNC_WORKERS):
+            first, *rest = chunks[i:i + SYNC_WORKERS]
+            futures = [self.engine.background.run(self._commit_batch, chunk) for chunk in rest]
+            self._commit_batch(first)
+            for future in futures:
+                future.result()  # Re-raises the first failure
+        return len(operations)
+
+    def _commit_batch(self, operations):
+        batch = self.db.batch()
+        for violation_id, document in operations:
+            doc_ref = self.violations_ref.document(str(violation_id))  # Use ID as document ID
+            if document is None:
+                batch.delete(doc_ref)
+            else:
+                batch.set(doc_ref, document)
+        batch.commit()
 
-        if deleted > 0:
-            batch.commit()
-            print(f"Cleared {deleted} documents from Firebase")
+    @staticmethod
+    def _to_document(violation, synced_at):
+        document = {
+            'id': violation[0],
+            'timestamp': violation[1],
+            'license_plate': violation[2],
+            'car_color': violation[3],
+            'location': violation[4],
+            'parking_duration': violation[5],
+            'image_path': violation[6],
+            'clip_path': violation[7],
+            'last_synced': synced_at
+        }
+        if violation[8] is not None:
+            document['site'] = violation[8]  # Tells the sites apart in an aggregator's collection
+        return document
 
     def start_periodic_sync(self, interval_seconds=300):  # 5 minutes default
-        """Start periodic sync in the background"""
-        while True:
-            self.sync_to_firebase()
-            time.sleep(interval_seconds)
+        """Queue a sync now and every interval_seconds on the background loop"""
+        get_background_loop().every(interval_seconds, self.sync_to_firebase, name="firestore_sync", run_first=True)
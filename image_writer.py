@@ -0,0 +1,107 @@
+import cv2
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, wait
+from datetime import datetime
+from background import get_background_loop
+from evidence_store import EvidenceStore
+from metrics import metrics
+from config import IMAGE_FORMAT, JPEG_QUALITY, WEBP_QUALITY, IMAGE_WRITE_QUEUE_SIZE
+
+
+class ImageWriter:
+    """Encodes and writes evidence images on the background loop's executor"""
+
+    def __init__(self, store=None, image_format=IMAGE_FORMAT, queue_size=IMAGE_WRITE_QUEUE_SIZE, background=None):
+        self.store = store or EvidenceStore()
+        self.image_format = image_format.lower()
+        if self.image_format == "webp":
+            self.encode_params = [cv2.IMWRITE_WEBP_QUALITY, WEBP_QUALITY]
+        else:
+            self.image_format = "jpg"
+            self.encode_params = [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY]
+
+        self.background = background or get_background_loop()
+        self.queue_size = queue_size
+        self.jobs = set()  # Futures of writes not finished yet
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.write_latencies = deque(maxlen=500)  # Seconds spent encoding and writing
+        self.queue_waits = deque(maxlen=500)  # Seconds spent waiting in the queue
+        self.written = 0
+        self.failed = 0
+        self.inline_writes = 0
+
+    def submit(self, image, name):
+        """
+        Queue an image for writing and return a Future resolving to its final path.
+        The caller must not modify the image after submitting it.
+        """
+        future = Future()
+        job = (image, name, time.time(), future)
+        with self._lock:
+            inline = len(self.jobs) >= self.queue_size
+            if inline:
+                self.inline_writes += 1
+            else:
+                self.jobs.add(future)
+        if inline:
+            # The disk can't keep up; write on the caller's thread rather than drop evidence
+            self._write(job)
+        else:
+            self.background.run(self._write, job)
+        return future
+
+    def pending_count(self):
+        with self._lock:
+            return len(self.jobs)
+
+    def _write(self, job):
+        image, name, queued_at, future = job
+        started = time.time()
+        try:
+            ok, encoded = cv2.imencode(f".{self.image_format}", image, self.encode_params)
+            if not ok:
+                raise IOError(f"Failed to encode {name}")
+            path = self.store.put(image, encoded.tobytes(), self.image_format, datetime.fromtimestamp(queued_at))
+            future.set_result(path)
+            with self._lock:
+                self.written += 1
+        except Exception as e:
+            print(f"Error writing image {name}: {e}")
+            future.set_exception(e)
+            with self._lock:
+                self.failed += 1
+        finally:
+            with self._lock:
+                self.queue_waits.append(started - queued_at)
+                self.write_latencies.append(time.time() - started)
+            metrics.observe("image_write", time.time() - started)
+            with self._lock:
+                self.jobs.discard(future)
+
+    def metrics(self):
+        """Snapshot of queue depth, counters and write latency (milliseconds)"""
+        with self._lock:
+            latencies = sorted(self.write_latencies)
+            waits = list(self.queue_waits)
+            stats = {
+                "queue_depth": len(self.jobs),
+                "written": self.written,
+                "failed": self.failed,
+                "inline_writes": self.inline_writes,
+            }
+        if latencies:
+            stats["write_ms_avg"] = 1000 * sum(latencies) / len(latencies)
+            stats["write_ms_p95"] = 1000 * latencies[int(0.95 * (len(latencies) - 1))]
+            stats["write_ms_max"] = 1000 * latencies[-1]
+            stats["queue_wait_ms_avg"] = 1000 * sum(waits) / len(waits)
+        return stats
+
+    def stop(self):
+        """Wait for every queued image to be written"""
+        with self._lock:
+            jobs = list(self.jobs)
+        wait(jobs)
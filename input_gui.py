@@ -1,17 +1,22 @@
 import tkinter as tk
-from tkinter import ttk, filedialog, messagebox
-import cv2
+from tkinter import ttk, filedialog, messagebox, simpledialog
 import os
+from stream_reader import StreamReader, open_stream_capture
+from ffmpeg_capture import open_video_capture
+from config import STREAM_CONNECT_TIMEOUT, VIDEO_DECODER
 
 class InputConfigGUI:
-    def __init__(self):
+    def __init__(self, decoder=VIDEO_DECODER, ffmpeg_options=None):
+        """ffmpeg_options: width, fps, crop and keyframes_only for the ffmpeg decoder"""
         self.root = tk.Tk()
         self.root.title("Input Configuration")
-        self.root.geometry("400x200")
+        self.root.geometry("400x260")
+        self.ffmpeg_options = ffmpeg_options or {}
         
         # Variables
         self.input_type = tk.StringVar(value="video")
         self.input_path = tk.StringVar()
+        self.decoder = tk.StringVar(value=decoder)
         self.setup_complete = False
         self.cap = None
         
@@ -27,7 +32,7 @@ class InputConfigGUI:
                        variable=self.input_type).pack(side="left", padx=5)
         
         # Path Entry Frame
-        path_frame = ttk.LabelFrame(self.root, text="Enter Path")
+        self.path_frame = path_frame = ttk.LabelFrame(self.root, text="Enter Path")
         path_frame.pack(padx=10, pady=5, fill="x")
         
         self.path_entry = ttk.Entry(path_frame, textvariable=self.input_path)
@@ -61,6 +66,14 @@ class InputConfigGUI:
         # Hide quality frame initially (only show for streaming)
         self.quality_frame.pack_forget()
         
+        # Decoder selection; OpenCV is used whenever ffmpeg isn't available
+        decoder_frame = ttk.LabelFrame(self.root, text="Decoder")
+        decoder_frame.pack(padx=10, pady=5, fill="x")
+        ttk.Radiobutton(decoder_frame, text="OpenCV", value="opencv",
+                       variable=self.decoder).pack(side="left", padx=5)
+        ttk.Radiobutton(decoder_frame, text="FFmpeg (scale/decimate in decoder)", value="ffmpeg",
+                       variable=self.decoder).pack(side="left", padx=5)
+
         # Update UI when input type changes
         self.input_type.trace('w', self.update_ui)
         
@@ -99,7 +112,7 @@ class InputConfigGUI:
                 if not os.path.exists(input_path):
                     messagebox.showerror("Error", "Video file does not exist")
                     return
-                self.cap = cv2.VideoCapture(input_path)
+                self.cap = open_video_capture(input_path, self.decoder.get(), **self.ffmpeg_options)
             else:  # RTMP or RTSP
                 # Configure stream based on quality
                 quality_params = {
@@ -110,34 +123,15 @@ class InputConfigGUI:
                 
                 params = quality_params[self.quality.get()]
                 
-                # Set OpenCV FFMPEG parameters
-                os.environ['OPENCV_FFMPEG_READ_ATTEMPTS'] = '10000'
-                os.environ['OPENCV_FFMPEG_CAPTURE_OPTIONS'] = 'rtmp_buffer_size;1024'
-                
-                self.cap = cv2.VideoCapture(input_path, cv2.CAP_FFMPEG)
-                
-                # Configure capture properties
-                self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 5)
-                self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, params['width'])
-                self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, params['height'])
-                self.cap.set(cv2.CAP_PROP_FPS, params['fps'])
-                
-                # Verify connection with retry logic
-                retry_count = 3
-                while retry_count > 0:
-                    if self.cap.isOpened():
-                        # Read a test frame
-                        ret, _ = self.cap.read()
-                        if ret:
-                            break
+                # The reader keeps reconnecting on its own; wait here only for the first frame
+                # Explicit ffmpeg width and frame rate win over the quality preset; keyframe-only is for files
+                params = dict(params, decoder=self.decoder.get(), crop=self.ffmpeg_options.get('crop'))
+                params['width'] = self.ffmpeg_options.get('width') or params['width']
+                params['fps'] = self.ffmpeg_options.get('fps') or params['fps']
+                self.cap = StreamReader(lambda: open_stream_capture(input_path, **params)).start()
+                if not self.cap.wait_connected(STREAM_CONNECT_TIMEOUT):
                     self.cap.release()
-                    retry_count -= 1
-                    if retry_count > 0:
-                        messagebox.showinfo("Retry", f"Attempting to reconnect... ({retry_count} attempts left)")
-                        self.cap = cv2.VideoCapture(input_path, cv2.CAP_FFMPEG)
-                
-                if retry_count == 0:
-                    messagebox.showerror("Error", "Failed to establish stable connection after multiple attempts")
+                    messagebox.showerror("Error", f"No frames from the stream after {STREAM_CONNECT_TIMEOUT} seconds")
                     return
 
             if not self.cap.isOpened():
@@ -171,4 +165,16 @@ def confirm_region_selection():
         "Region Selection",
         "An existing region configuration was found. Would you like to use it?",
         icon='question'
-    )
\ No newline at end of file
+    )
+
+
+def ask_zone_details(index):
+    """Ask for a new zone's name and dwell limit; returns (name, seconds or None), or None to discard it"""
+    name = simpledialog.askstring("Zone Name", f"Name for zone {index + 1}:",
+                                  initialvalue=f"Zone {index + 1}")
+    if name is None:
+        return None
+    dwell = simpledialog.askfloat("Dwell Limit",
+                                  f"Seconds a car may stay in '{name}' (leave blank for the default):",
+                                  minvalue=0)
+    return name.strip() or f"Zone {index + 1}", dwell
@@ -0,0 +1,73 @@
+from config import TARGET_FPS, LOAD_SHED_MAX_STRIDE, LOAD_SHED_HIGH, LOAD_SHED_LOW, LOAD_SHED_HOLD_FRAMES
+
+
+class LoadShedder:
+    """
+    Chooses how much work to shed when frames arrive faster than they can be processed.
+
+    Each level sheds more than the one before: first the frame stride grows up to
+    max_stride, then plate detection is skipped for moving tracks. Dwell timing is
+    counted in source frames and OCR runs on its own queue, so stationary candidates
+    keep their timing and OCR at every level.
+    """
+
+    def __init__(self, target_fps=TARGET_FPS, max_stride=LOAD_SHED_MAX_STRIDE, high=LOAD_SHED_HIGH,
+                 low=LOAD_SHED_LOW, hold_frames=LOAD_SHED_HOLD_FRAMES):
+        self.frame_interval = 1 / target_fps
+        self.high = high
+        self.low = low
+        self.hold_frames = hold_frames
+        # (frame stride, skip plate detection for moving tracks) per level
+        self.levels = [(stride, False) for stride in range(1, max_stride + 1)] + [(max_stride, True)]
+        self.level = 0
+        self.frame_seconds = 0.0  # Moving average of processing time per frame
+        self.load = 0.0
+        self.hot_frames = 0
+        self.cool_frames = 0
+
+    @property
+    def stride(self):
+        return self.levels[self.level][0]
+
+    @property
+    def skip_moving_plates(self):
+        return self.levels[self.level][1]
+
+    def _load_at(self, level, queue_fill):
+        budget = self.levels[level][0] * self.frame_interval
+        return max(self.frame_seconds / budget, queue_fill)
+
+    def update(self, frame_seconds, queue_fill):
+        """
+        Feed the time spent on the last processed frame and how full the frame queue
+        is (0..1); returns the level to use from now on.
+        """
+        self.frame_seconds = 0.9 * self.frame_seconds + 0.1 * frame_seconds if self.frame_seconds else frame_seconds
+        self.load = self._load_at(self.level, queue_fill)
+
+        self.hot_frames = self.hot_frames + 1 if self.load > self.high else 0
+        # Only step down if the previous level would not be overloaded again straight away
+        if self.level > 0 and self._load_at(self.level - 1, queue_fill) < self.low:
+            self.cool_frames += 1
+        else:
+            self.cool_frames = 0
+
+        if self.hot_frames >= self.hold_frames and self.level < len(self.levels) - 1:
+            self._set_level(self.level + 1)
+        elif self.cool_frames >= self.hold_frames:
+            self._set_level(self.level - 1)
+        return self.level
+
+    def _set_level(self, level):
+        self.level = level
+        self.hot_frames = 0
+        self.cool_frames = 0
+        print(f"Load {self.load:.2f}: degradation level {level} (frame stride {self.stride}, "
+              f"plate detection for moving cars {'off' if self.skip_moving_plates else 'on'})")
+
+    def describe(self):
+        """Short status for the video overlay"""
+        text = f"Load L{self.level}: stride {self.stride}"
+        if self.skip_moving_plates:
+            text += ", moving plates off"
+        return text
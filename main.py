@@ -1,8 +1,5 @@
-from ultralytics import YOLO
-from ultralytics.utils import LOGGER
-LOGGER.info = lambda x: None  # Suppress info messages
-LOGGER.warning = lambda x: None  # Suppress warnings too if needed
-
+import argparse
+import os
 import cv2
 import numpy as np
 import threading
@@ -11,39 +8,36 @@ import time
 from collections import defaultdict
 import tkinter as tk
 from region_selector import select_region
-from parking_monitor import handle_stationary_car, finalize_stationary_car, ViolationLogGUI, start_ocr_thread
-from input_gui import InputConfigGUI, confirm_region_selection
+from parking_monitor import handle_stationary_car, adopt_recent_violation, finalize_stationary_car, ViolationLogGUI, \
+    start_ocr_thread, image_writer, init_firebase, clip_recorder, recent_violations
+from input_gui import InputConfigGUI, confirm_region_selection, ask_zone_details
 from config import *
 import tkinter.messagebox as messagebox
 from collections import deque, defaultdict
 from state_tracker import StateTracker
-
-# Load YOLOv8 models
-car_model = YOLO('models/yolov8n.pt')
-plate_model = YOLO('models/license_plate_detection.pt')
-
-# Get input configuration
-input_gui = InputConfigGUI()
-setup_complete, input_path, cap = input_gui.run()
-
-if not setup_complete:
-    print("Setup cancelled. Exiting.")
-    exit()
-
-# Get video dimensions
-video_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-video_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-
-# Select region of interest before starting threads
-region = select_region(input_path, video_width, video_height, confirm_callback=confirm_region_selection)
-if region is None:
-    print("Region selection failed. Exiting.")
-    cap.release()
-    exit()
-
-# Create a mask for the selected region
-mask = np.zeros((video_height, video_width), dtype=np.uint8)
-cv2.fillPoly(mask, [region], 255)
+from load_shedding import LoadShedder
+from zones import ZoneMap
+from trackers import CarTracker
+from parked_verifier import ParkedVerifier
+from checkpoint import save_checkpoint, load_checkpoint, CheckpointViolation, CheckpointParked
+from metrics import metrics
+from tracing import tracer, install_signal_handlers
+from delivery import get_delivery_engine
+from background import get_background_loop
+from stream_reader import StreamReader
+
+WINDOW_NAME = 'Car and License Plate Detection'
+
+# Set by setup_pipeline()
+car_tracker = None
+plate_model = None
+cap = None
+zone_map = None
+mask = None
+video_width = None
+video_height = None
+masked_buffer = None  # Detector input, reused every frame
+overlay_buffer = None  # Annotated copy of the frame for display, reused every frame
 
 # Shared queue and control flags
 frame_queue = queue.Queue(maxsize=QUEUE_SIZE)
@@ -59,35 +53,252 @@ stationary_frame_counts = defaultdict(int)  # Track how long each car has been s
 # Initialize the state tracker (should be outside the loop)
 state_tracker = StateTracker()
 
+# Decides which work to shed when the processor can't keep up
+load_shedder = LoadShedder()
+
+# Lets frames where only verified parked cars are in view skip car detection
+parked_verifier = ParkedVerifier()
+plate_boxes = {}  # Track id -> last plate box (crop coordinates), reused on verified frames
+
+# Parked cars from the last checkpoint, waiting for a track at their spot to pick up their dwell time
+resumed_parked = []
+resumed_at = None
+last_frame_count = 0
+checkpoint_lock = threading.Lock()
+checkpoint_final = False  # Set by the exit checkpoint, after which parked cars are finalized
+
 # Add at the top with other initializations
 movement_counters = defaultdict(int)
 MOVEMENT_CONSISTENCY_THRESHOLD = 10  # Adjust this value based on your needs
 
+
+def load_models(models_dir='models'):
+    """Load the YOLOv8 car and license plate models"""
+    from ultralytics import YOLO
+    from ultralytics.utils import LOGGER
+    LOGGER.info = lambda x: None  # Suppress info messages
+    LOGGER.warning = lambda x: None  # Suppress warnings too if needed
+
+    return (YOLO(os.path.join(models_dir, 'yolov8n.pt')),
+            YOLO(os.path.join(models_dir, 'license_plate_detection.pt')))
+
+
+def setup_pipeline(capture, zones, width, height, car_detector, plate_detector, fps=None):
+    """
+    Wire a capture, zones and detectors into the pipeline. Detectors only need the
+    Ultralytics call interface, so the benchmarks can pass stubs. fps converts zone
+    dwell limits to frames (default TARGET_FPS).
+    """
+    global cap, zone_map, mask, video_width, video_height, car_tracker, plate_model, masked_buffer, overlay_buffer
+    cap = capture
+    video_width = width
+    video_height = height
+    car_tracker = CarTracker(car_detector)
+    plate_model = plate_detector
+
+    # Rasterize the zones once; the label mask gives each track's zone in O(1)
+    zone_map = ZoneMap(zones, video_width, video_height, fps or TARGET_FPS, ILLEGAL_PARKING_FRAMES)
+    mask = zone_map.mask
+
+    masked_buffer = np.empty((video_height, video_width, 3), dtype=np.uint8)
+    overlay_buffer = np.empty((video_height, video_width, 3), dtype=np.uint8)
+
+
 def read_frames():
     global program_running
     frame_count = 0
+    # A live stream only ever hands over its newest frame; a file is read in order
+    live = isinstance(cap, StreamReader)
     while program_running:
-        ret, frame = cap.read()
+        with metrics.timer("decode"):
+            ret, frame = cap.read()
         if not ret:
             program_running = False
             break
+        if live:
+            # Frames the reader skipped still count, so dwell timing is unaffected; the
+            # reader already drops whatever the pipeline can't keep up with, so no stride
+            frame_count, frame_time = cap.frame_number, cap.captured_at
+        else:
+            frame_count += 1
+            frame_time = time.time()
+        # Frame numbers keep counting through skipped frames, so dwell timing is unaffected
+        while not live and frame_count % load_shedder.stride and program_running:
+            metrics.increment("frames_shed")
+            if not cap.grab():  # Advance without decoding the skipped frame
+                program_running = False
+                break
+            frame_count += 1
+            time.sleep(1 / TARGET_FPS)
+        if not program_running:
+            break
 
-        frame_count += 1
+        while frame_queue.full() or (live and not frame_queue.empty()):
+            try:
+                frame_queue.get_nowait()
+            except queue.Empty:
+                break
+            metrics.increment("frames_dropped")
+        frame_queue.put((frame, frame_count, frame_time))
+
+        if not live:
+            time.sleep(1 / TARGET_FPS)
+
+
+def process_frame(frame, frame_count, frame_time):
+    """
+    Run detection, tracking and violation handling on one frame and return it annotated.
+
+    frame stays clean: detectors and evidence crops read views of it, and all drawing
+    goes to a separate overlay buffer. The returned overlay is reused by the next call.
+    Anything handed to another thread must be copied first.
+    """
+    global movement_counters, plate_boxes, last_frame_count
+    frame_start = time.perf_counter()
+    last_frame_count = frame_count
+
+    # Resize frame to match the mask size
+    with metrics.timer("resize_mask"):
+        if frame.shape[1] != video_width or frame.shape[0] != video_height:
+            frame = cv2.resize(frame, (video_width, video_height))
+        cv2.bitwise_and(frame, frame, dst=masked_buffer, mask=mask)
+        np.copyto(overlay_buffer, frame)
+    overlay = overlay_buffer
+    clip_recorder.add_frame(frame, frame_time)
+
+    with metrics.timer("car_track"):
+        verified = PARKED_VERIFY_ENABLED and parked_verifier.can_skip_detection(
+            masked_buffer, frame_count, car_tracker.track_ids())
+        if verified:
+            car_results = car_tracker.hold()
+            metrics.increment("car_detect_skipped")
+        else:
+            car_results = car_tracker.update(masked_buffer, frame_count)
+            if car_tracker.last_frame == frame_count:
+                # Only a real detection makes a new reference; predicted boxes never looked at the frame
+                parked_verifier.detected(masked_buffer, frame_count, car_tracker.track_ids())
+
+    for car_box in car_results.boxes:
+        if car_box.cls == 2:  # Assuming class 2 is for cars
+            x1, y1, x2, y2 = map(int, car_box.xyxy[0])
+
+            zone = zone_map.zone_at(int((x1 + x2) / 2), int((y1 + y2) / 2))
+            if zone is None:
+                continue
+
+            # Expand the crop area by 50 pixels in each direction
+            crop_x1 = max(0, x1 - 50)
+            crop_y1 = max(0, y1 - 50)
+            crop_x2 = min(frame.shape[1], x2 + 50)
+            crop_y2 = min(frame.shape[0], y2 + 50)
+
+            # View into the clean frame, without bounding boxes
+            car_img = frame[crop_y1:crop_y2, crop_x1:crop_x2]
+
+            # Draw car bounding box on the display overlay
+            cv2.rectangle(overlay, (x1, y1), (x2, y2), (0, 255, 0), 2)
+
+            track_id = int(car_box.id) if car_box.id is not None else -1
+
+            if verified and track_id in plate_boxes:
+                # Parked and unchanged since the last detection, so is its plate
+                plate_box = plate_boxes[track_id]
+            elif load_shedder.skip_moving_plates and state_tracker.get_state(track_id) == "Moving":
+                # Under heavy load, plate detection is kept only for cars that aren't moving
+                metrics.increment("plate_detect_shed")
+                plate_box = None
+            else:
+                # Detect license plate on the clean crop
+                with metrics.timer("plate_detect"):
+                    plate_results = plate_model(car_img)[0]
+                plate_box = tuple(map(int, plate_results.boxes[0].xyxy[0])) if len(plate_results.boxes) > 0 else None
+                if track_id != -1:
+                    plate_boxes[track_id] = plate_box
 
-        if frame_queue.full():
-            frame_queue.get()
-        frame_queue.put((frame, frame_count, time.time()))
+            if plate_box is not None:
+                px1, py1, px2, py2 = plate_box
 
-        time.sleep(1 / TARGET_FPS)
+                # Draw plate box on the display overlay
+                cv2.rectangle(overlay, 
+                            (crop_x1 + px1, crop_y1 + py1), 
+                            (crop_x1 + px2, crop_y1 + py2), 
+                            (255, 0, 0), 2)
+
+            if track_id != -1:
+                car_center = ((x1 + x2) // 2, (y1 + y2) // 2)
+                
+                # Calculate movement
+                movement_detected = False
+                if track_id in track_history and len(track_history[track_id]) > 1:
+                    recent_positions = [pos for _, pos in track_history[track_id][-2:]]
+                    movement = np.linalg.norm(np.array(recent_positions[1]) - np.array(recent_positions[0]))
+                    movement_detected = movement > MOVEMENT_THRESHOLD
+
+                # Update state using state tracker
+                with metrics.timer("state_update"):
+                    current_state = state_tracker.update_state(
+                        track_id,
+                        car_center,
+                        frame_time,  # Use frame_time instead of time.time()
+                        movement_detected
+                    )
+
+                # Use the state for violation detection
+                if current_state == "Stationary":
+                    # Reset movement counter when car becomes stationary
+                    movement_counters[track_id] = 0
+                    if not verified:
+                        parked_verifier.enroll(track_id, (x1, y1, x2, y2), masked_buffer)
+                    
+                    if track_id not in stationary_frame_counts:
+                        stationary_frame_counts[track_id] = frame_count
+                        # A re-acquired car continues its violation without waiting out the dwell again
+                        if not adopt_recent_violation(track_id, stationary_cars, zone.name, car_center):
+                            stationary_frame_counts[track_id] -= resumed_dwell_frames(zone.name, car_center)
+                    if track_id in stationary_cars or \
+                            (frame_count - stationary_frame_counts[track_id]) >= zone_map.dwell_frames(zone):
+                        handle_stationary_car(car_img, track_id, stationary_cars, ocr_queue, zone.name, car_center)
+                else:
+                    parked_verifier.forget(track_id)
+
+                    # Increment movement counter when not stationary
+                    movement_counters[track_id] += 1
+                    
+                    if movement_counters[track_id] >= MOVEMENT_CONSISTENCY_THRESHOLD:
+                        # Only finalize if movement has been consistent
+                        if track_id in stationary_frame_counts:
+                            del stationary_frame_counts[track_id]
+                        if track_id in stationary_cars:
+                            finalize_stationary_car(track_id, stationary_cars)
+                            movement_counters[track_id] = 0  # Reset counter after finalizing
+
+                # Display status
+                cv2.putText(overlay, current_state, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9,
+                            (0, 0, 255) if current_state == "Stationary" else (255, 0, 0), 2)
+
+    if len(car_results.boxes) > 0:
+        # Clean up old tracks
+        current_tracks = {int(box.id) for box in car_results.boxes if box.id is not None}
+        state_tracker.clean_old_tracks(current_tracks)
+
+        # Clean up old movement counters
+        movement_counters = defaultdict(int, {k: v for k, v in movement_counters.items() if k in current_tracks})
+        plate_boxes = {k: v for k, v in plate_boxes.items() if k in current_tracks}
+
+    zone_map.draw(overlay)
+
+    metrics.observe("frame_total", time.perf_counter() - frame_start, frame=frame_count)
+    metrics.increment("frames_processed")
+    return overlay
 
 
 def process_and_display():
-    global program_running, track_history, movement_counters
+    global program_running
     start_time = time.time()
     frame_count = 0
 
     # Create named window
-    cv2.namedWindow('Car and License Plate Detection')
+    cv2.namedWindow(WINDOW_NAME)
 
     while program_running:
         if frame_queue.empty():
@@ -98,117 +309,31 @@ def process_and_display():
             frame, frame_count, frame_time = frame_queue.get()
         except:
             continue
+        metrics.observe("frame_queue_wait", time.time() - frame_time)
 
         # Check if window was closed
-        if cv2.getWindowProperty('Car and License Plate Detection', cv2.WND_PROP_VISIBLE) < 1:
+        if cv2.getWindowProperty(WINDOW_NAME, cv2.WND_PROP_VISIBLE) < 1:
             if messagebox.askyesno("Confirm Exit", "Are you sure you want to exit the program?"):
                 program_running = False
                 break
             else:
                 # Recreate window if user cancels
-                cv2.namedWindow('Car and License Plate Detection')
+                cv2.namedWindow(WINDOW_NAME)
 
-        # Resize frame to match the mask size
-        frame = cv2.resize(frame, (video_width, video_height))
-        masked_frame = cv2.bitwise_and(frame, frame, mask=mask)
-
-        car_results = car_model.track(masked_frame, persist=True)[0]
-
-        for car_box in car_results.boxes:
-            if car_box.cls == 2:  # Assuming class 2 is for cars
-                x1, y1, x2, y2 = map(int, car_box.xyxy[0])
-
-                if mask[int((y1 + y2) / 2), int((x1 + x2) / 2)] == 0:
-                    continue
-
-                # Expand the crop area by 50 pixels in each direction
-                crop_x1 = max(0, x1 - 50)
-                crop_y1 = max(0, y1 - 50)
-                crop_x2 = min(frame.shape[1], x2 + 50)
-                crop_y2 = min(frame.shape[0], y2 + 50)
-
-                # Get the original image crop without bounding boxes
-                car_img = frame.copy()[crop_y1:crop_y2, crop_x1:crop_x2]
-                
-                # Draw car bounding box on the main display frame
-                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-
-                # Get the display crop with bounding boxes
-                display_car_img = frame[crop_y1:crop_y2, crop_x1:crop_x2]
-                display_car_img = cv2.resize(display_car_img, (DISPLAY_WIDTH, DISPLAY_HEIGHT))
-
-                # Detect license plate on the clean crop
-                plate_results = plate_model(car_img)[0]
-
-                if len(plate_results.boxes) > 0:
-                    plate_box = plate_results.boxes[0]
-                    px1, py1, px2, py2 = map(int, plate_box.xyxy[0])
-                    
-                    # Draw plate box on main frame
-                    cv2.rectangle(frame, 
-                                (crop_x1 + px1, crop_y1 + py1), 
-                                (crop_x1 + px2, crop_y1 + py2), 
-                                (255, 0, 0), 2)
-
-                track_id = int(car_box.id) if car_box.id is not None else -1
-                if track_id != -1:
-                    car_center = ((x1 + x2) // 2, (y1 + y2) // 2)
-                    
-                    # Calculate movement
-                    movement_detected = False
-                    if track_id in track_history and len(track_history[track_id]) > 1:
-                        recent_positions = [pos for _, pos in track_history[track_id][-2:]]
-                        movement = np.linalg.norm(np.array(recent_positions[1]) - np.array(recent_positions[0]))
-                        movement_detected = movement > MOVEMENT_THRESHOLD
-
-                    # Update state using state tracker
-                    current_state = state_tracker.update_state(
-                        track_id,
-                        car_center,
-                        frame_time,  # Use frame_time instead of time.time()
-                        movement_detected
-                    )
-
-                    # Use the state for violation detection
-                    if current_state == "Stationary":
-                        # Reset movement counter when car becomes stationary
-                        movement_counters[track_id] = 0
-                        
-                        if track_id not in stationary_frame_counts:
-                            stationary_frame_counts[track_id] = frame_count
-                        if (frame_count - stationary_frame_counts[track_id]) >= ILLEGAL_PARKING_FRAMES:
-                            handle_stationary_car(car_img, track_id, stationary_cars, ocr_queue)
-                    else:
-                        # Increment movement counter when not stationary
-                        movement_counters[track_id] += 1
-                        
-                        if movement_counters[track_id] >= MOVEMENT_CONSISTENCY_THRESHOLD:
-                            # Only finalize if movement has been consistent
-                            if track_id in stationary_frame_counts:
-                                del stationary_frame_counts[track_id]
-                            if track_id in stationary_cars:
-                                finalize_stationary_car(track_id, stationary_cars)
-                                movement_counters[track_id] = 0  # Reset counter after finalizing
-                        
-                    # Clean up old tracks
-                    current_tracks = {int(box.id) for box in car_results.boxes if box.id is not None}
-                    state_tracker.clean_old_tracks(current_tracks)
-                    
-                    # Clean up old movement counters
-                    movement_counters = {k: v for k, v in movement_counters.items() if k in current_tracks}
-
-                    # Display status
-                    cv2.putText(frame, current_state, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9,
-                                (0, 0, 255) if current_state == "Stationary" else (255, 0, 0), 2)
-
-        cv2.polylines(frame, [region], True, (0, 255, 255), 2)
+        process_start = time.perf_counter()
+        frame = process_frame(frame, frame_count, frame_time)
+        load_shedder.update(time.perf_counter() - process_start, frame_queue.qsize() / QUEUE_SIZE)
+        # From the moment the frame was grabbed (read, for files) to detection results
+        metrics.observe("glass_to_detection", time.time() - frame_time)
 
         elapsed_time = time.time() - start_time
         fps = frame_count / elapsed_time
         cv2.putText(frame, f"FPS: {fps:.2f}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
         cv2.putText(frame, f"Frame: {frame_count}", (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+        cv2.putText(frame, load_shedder.describe(), (10, 90), cv2.FONT_HERSHEY_SIMPLEX, 0.7,
+                    (0, 255, 0) if load_shedder.level == 0 else (0, 165, 255), 2)
 
-        cv2.imshow('Car and License Plate Detection', frame)
+        cv2.imshow(WINDOW_NAME, frame)
 
         key = cv2.waitKey(1) & 0xFF
         if key == ord('q'):
@@ -216,26 +341,153 @@ def process_and_display():
                 program_running = False
                 break
 
-    # Finalize all stationary cars when the program ends
-    for track_id in list(stationary_cars.keys()):
-        finalize_stationary_car(track_id, stationary_cars)
+    write_checkpoint(final=True)  # Before finalizing, which forgets the parked cars
+    finalize_all()
 
     # Cleanup
     cv2.destroyAllWindows()
 
 
+def finalize_all():
+    """Finalize all stationary cars when the program ends"""
+    for track_id in list(stationary_cars.keys()):
+        finalize_stationary_car(track_id, stationary_cars)
+
+
+def write_checkpoint(final=False):
+    """Save recent violations and parked cars still within their dwell limit"""
+    global checkpoint_final
+    with checkpoint_lock:
+        if checkpoint_final:
+            return  # A periodic write must not replace the exit checkpoint
+        violations = [CheckpointViolation(*entry) for entry in recent_violations.snapshot()]
+        parked = []
+        for track_id, since in list(stationary_frame_counts.items()):
+            history = state_tracker.track_history.get(track_id)
+            if track_id in stationary_cars or not history:
+                continue
+            center = history[-1][1]
+            zone = zone_map.zone_at(*center)
+            if zone is not None:
+                parked.append(CheckpointParked(zone.name, center, last_frame_count - since))
+        with metrics.timer("checkpoint_write"):
+            save_checkpoint(CHECKPOINT_FILE, violations, parked)
+        checkpoint_final = final
+
+
+def resume_from_checkpoint():
+    """
+    Pick up where the last run stopped. Tracker ids don't survive a restart, so saved
+    cars are matched to new tracks by zone and position: violations through the
+    recent-violation index, parked cars by handing their dwell time to the first
+    track that becomes stationary at the same spot.
+    """
+    global resumed_parked, resumed_at
+    checkpoint = load_checkpoint(CHECKPOINT_FILE)
+    if checkpoint is None:
+        return
+    age = time.time() - checkpoint.saved_at
+    if age > CHECKPOINT_MAX_AGE:
+        print(f"Ignoring checkpoint saved {age:.0f} seconds ago")
+        return
+
+    for n, saved in enumerate(checkpoint.violations):
+        if saved.violation_id is None and not os.path.exists(saved.image_path):
+            continue
+        key = f"resumed-{n}"
+        recent_violations.restore(key, saved.location, saved.center, saved.start_time, saved.image_path,
+                                  saved.violation_id, saved.plate)
+        if saved.violation_id is None:
+            # OCR hadn't finished; run it again on the saved image. The clip ring died with the last run.
+            ocr_queue.put((key, saved.image_path, time.time(), saved.location, saved.start_time, None))
+    resumed_parked = checkpoint.parked
+    resumed_at = time.time()
+    print(f"Resumed {len(checkpoint.violations)} violations and {len(checkpoint.parked)} parked cars "
+          f"from a checkpoint saved {age:.0f} seconds ago")
+
+
+def resumed_dwell_frames(location, center):
+    """Frames a resumed parked car at this spot had already been stationary, or 0"""
+    global resumed_parked
+    if resumed_parked and time.time() - resumed_at > DUPLICATE_VIOLATION_TTL:
+        resumed_parked = []
+    best, best_distance = None, DUPLICATE_VIOLATION_RADIUS
+    for parked in resumed_parked:
+        distance = np.hypot(parked.center[0] - center[0], parked.center[1] - center[1])
+        if parked.location == location and distance <= best_distance:
+            best, best_distance = parked, distance
+    if best is None:
+        return 0
+    resumed_parked.remove(best)
+    return best.stationary_frames
+
+
 def run_gui():
     root = tk.Tk()
     gui = ViolationLogGUI(root)
     root.mainloop()
 
 
-if __name__ == "__main__":
+def main(decoder=VIDEO_DECODER, ffmpeg_options=None):
+    init_firebase()
+
+    # Load YOLOv8 models
+    car_detector, plate_detector = load_models()
+
+    # Get input configuration
+    input_gui = InputConfigGUI(decoder, ffmpeg_options)
+    setup_complete, input_path, capture = input_gui.run()
+
+    if not setup_complete:
+        print("Setup cancelled. Exiting.")
+        return
+
+    # Get video dimensions
+    width = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+    # Zones are drawn on a frame from the capture itself when it crops or rescales (ffmpeg) or is live
+    first_frame = None
+    if not isinstance(capture, cv2.VideoCapture):
+        ret, first_frame = capture.read()
+        first_frame = first_frame.copy() if ret else None
+
+    # Select the no-parking zones before starting threads
+    zones = select_region(input_path, width, height, confirm_callback=confirm_region_selection,
+                          zone_callback=ask_zone_details, frame=first_frame)
+    if zones is None:
+        print("Region selection failed. Exiting.")
+        capture.release()
+        return
+
+    # Dwell limits are counted in source frames; live streams often report no frame rate
+    fps = capture.get(cv2.CAP_PROP_FPS)
+    setup_pipeline(capture, zones, width, height, car_detector, plate_detector, fps if 0 < fps < 1000 else None)
+    resume_from_checkpoint()
+
+    # Expose per-stage timings and queue depths
+    metrics.register_gauge("frame_queue_depth", frame_queue.qsize)
+    metrics.register_gauge("load_shed_level", lambda: load_shedder.level)
+    metrics.register_gauge("frame_stride", lambda: load_shedder.stride)
+    if isinstance(capture, StreamReader):
+        metrics.register_gauge("stream_connected", lambda: int(capture.connected))
+    metrics.register_gauge("ocr_queue_depth", ocr_queue.qsize)
+    metrics.register_gauge("stationary_cars", lambda: len(stationary_frame_counts))  # Also the edge heartbeat
+    metrics.register_gauge("violating_cars", lambda: len(stationary_cars))
+    metrics.register_gauge("image_write_queue_depth", image_writer.pending_count)
+    metrics.register_gauge("delivery_queue_depth", get_delivery_engine().pending_count)
+    metrics.start_http_server(METRICS_PORT)
+    background = get_background_loop()
+    metrics.start_stats_file(METRICS_STATS_FILE, METRICS_STATS_INTERVAL, background)
+    background.every(CHECKPOINT_INTERVAL, write_checkpoint, name="checkpoint")
+    install_signal_handlers()  # SIGUSR1: sample-profile, SIGUSR2: dump trace
+
     # Start threads
-    read_thread = threading.Thread(target=read_frames)
-    process_thread = threading.Thread(target=process_and_display)
-    gui_thread = threading.Thread(target=run_gui, daemon=True)
-    ocr_thread = threading.Thread(target=start_ocr_thread, args=(ocr_queue, stationary_cars), daemon=True)
+    read_thread = threading.Thread(target=read_frames, name="FrameReader")
+    process_thread = threading.Thread(target=process_and_display, name="FrameProcessor")
+    gui_thread = threading.Thread(target=run_gui, daemon=True, name="ViolationGUI")
+    ocr_thread = threading.Thread(target=start_ocr_thread, args=(ocr_queue, stationary_cars), daemon=True,
+                                  name="OCR")
 
     read_thread.start()
     process_thread.start()
@@ -243,13 +495,41 @@ if __name__ == "__main__":
     ocr_thread.start()
 
     # Wait for threads to finish
-    read_thread.join()
     process_thread.join()
+    if isinstance(capture, StreamReader):
+        capture.release()  # Unblocks a read waiting out a stream outage
+    read_thread.join()
 
     # Cleanup
     ocr_queue.put(None)  # Signal OCR thread to exit
+    image_writer.stop()  # Flush evidence images still waiting to be written
+    get_delivery_engine().stop()  # Let deliveries in flight finish; the rest stay queued for the next run
+    background.shutdown()  # Stop periodic jobs, wait for database writes and clips, write the final stats
+    if tracer.enabled:
+        tracer.dump()
 
     cap.release()
     cv2.destroyAllWindows()
 
     print("Video processing completed")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Detect illegally parked cars in a video file or stream")
+    parser.add_argument("--decoder", choices=("opencv", "ffmpeg"), default=VIDEO_DECODER,
+                        help="Preselected decoder in the input dialog")
+    parser.add_argument("--decode-width", type=int, default=FFMPEG_DECODE_WIDTH,
+                        help="ffmpeg: scale frames to this width while decoding")
+    parser.add_argument("--decode-fps", type=float, default=FFMPEG_DECODE_FPS,
+                        help="ffmpeg: drop frames while decoding to this rate")
+    parser.add_argument("--crop", type=lambda text: tuple(int(v) for v in text.split(",")), default=FFMPEG_CROP,
+                        metavar="X,Y,W,H", help="ffmpeg: crop to this source rectangle before scaling")
+    parser.add_argument("--keyframes-only", action="store_true", default=FFMPEG_KEYFRAMES_ONLY,
+                        help="ffmpeg: decode only keyframes of a video file, for fast offline scans")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(args.decoder, {'width': args.decode_width, 'fps': args.decode_fps, 'crop': args.crop,
+                        'keyframes_only': args.keyframes_only})
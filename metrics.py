@@ -0,0 +1,161 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from config import METRICS_WINDOW
+from tracing import tracer
+
+
+class Histogram:
+    """Rolling window of recent samples plus lifetime count and sum"""
+
+    def __init__(self, window=METRICS_WINDOW):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        self.samples.append(value)
+        self.count += 1
+        self.total += value
+
+    def percentiles(self, quantiles=(0.5, 0.95, 0.99)):
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {q: 0.0 for q in quantiles}
+        return {q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] for q in quantiles}
+
+
+class Metrics:
+    """Process-wide stage timings, counters and gauges"""
+
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def timer(self, stage):
+        """Time the enclosed block and record it under stage"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def observe(self, stage, seconds, **trace_args):
+        """Record a duration that has just ended; also traced as a span when tracing is on"""
+        tracer.record(stage, time.perf_counter() - seconds, seconds, trace_args)
+        with self.lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram()
+            histogram.observe(seconds)
+
+    def increment(self, name, amount=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def register_gauge(self, name, read):
+        """read() is called whenever metrics are exported, e.g. a queue's qsize"""
+        with self.lock:
+            self.gauges[name] = read
+
+    def snapshot(self):
+        """Current values as a JSON-serialisable dict (latencies in milliseconds)"""
+        with self.lock:
+            stages = {}
+            for stage, histogram in self.histograms.items():
+                p = histogram.percentiles()
+                stages[stage] = {
+                    "count": histogram.count,
+                    "p50_ms": 1000 * p[0.5],
+                    "p95_ms": 1000 * p[0.95],
+                    "p99_ms": 1000 * p[0.99],
+                }
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+        return {
+            "time": time.time(),
+            "stages": stages,
+            "counters": counters,
+            "gauges": {name: self._read_gauge(read) for name, read in gauges.items()},
+        }
+
+    @staticmethod
+    def _read_gauge(read):
+        try:
+            return read()
+        except Exception:
+            return None
+
+    def prometheus_text(self):
+        """Render metrics in the Prometheus text exposition format"""
+        lines = ["# TYPE pipeline_stage_seconds summary"]
+        with self.lock:
+            for stage, histogram in sorted(self.histograms.items()):
+                for q, value in histogram.percentiles().items():
+                    lines.append(f'pipeline_stage_seconds{{stage="{stage}",quantile="{q}"}} {value:.6f}')
+                lines.append(f'pipeline_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+                lines.append(f'pipeline_stage_seconds_sum{{stage="{stage}"}} {histogram.total:.6f}')
+            counters = sorted(self.counters.items())
+            gauges = sorted(self.gauges.items())
+
+        lines.append("# TYPE pipeline_events_total counter")
+        for name, value in counters:
+            lines.append(f'pipeline_events_total{{name="{name}"}} {value}')
+        lines.append("# TYPE pipeline_gauge gauge")
+        for name, read in gauges:
+            value = self._read_gauge(read)
+            if value is not None:
+                lines.append(f'pipeline_gauge{{name="{name}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def start_http_server(self, port, host="127.0.0.1"):
+        """Serve /metrics (Prometheus text) and /stats (JSON) on a daemon thread"""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body = registry.prometheus_text().encode()
+                    content_type = "text/plain; version=0.0.4"
+                elif self.path == "/stats":
+                    body = json.dumps(registry.snapshot(), indent=2).encode()
+                    content_type = "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Keep scrapes out of the console
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f"Metrics available at http://{host}:{port}/metrics")
+        return server
+
+    def write_stats_file(self, path):
+        """Write a JSON snapshot atomically"""
+        temp_path = path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(self.snapshot(), f, indent=2)
+        os.replace(temp_path, path)
+
+    def start_stats_file(self, path, interval_seconds, background):
+        """Write the JSON snapshot every interval_seconds on the background loop, and once more on shutdown"""
+        background.every(interval_seconds, lambda: self.write_stats_file(path), name="stats_file")
+        background.on_shutdown(lambda: self.write_stats_file(path))
+
+
+# Shared registry used by every module
+metrics = Metrics()
@@ -1,27 +1,31 @@
 import json
 import os
+import sqlite3
+import threading
 import time
 from datetime import datetime
-from firebase_admin import messaging
+from notification_dispatcher import NotificationDispatcher
+from config import NOTIFICATION_BUFFER_PATH
 
 class NotificationBuffer:
     _instance = None  # Singleton instance
+    _instance_lock = threading.Lock()
     
     def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super(NotificationBuffer, cls).__new__(cls)
-            cls._instance._initialized = False
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = super(NotificationBuffer, cls).__new__(cls)
+                cls._instance._initialized = False
         return cls._instance
     
     def __init__(self):
-        if self._initialized:
-            return
-            
-        self.buffer_file = "notification_buffer.json"
-        self.default_buffer = {
-            "pending_notifications": [],
-            "last_notification_time": time.time(),
-            "notification_settings": {
+        with self._instance_lock:
+            if self._initialized:
+                return
+
+            self.legacy_buffer_file = "notification_buffer.json"
+            self.buffer_db_path = NOTIFICATION_BUFFER_PATH
+            self.notification_settings = {
                 "thresholds": [
                     {
                         "count": 1,
@@ -41,106 +45,110 @@ class NotificationBuffer:
                     }
                 ]
             }
-        }
-        self.load_buffer()
-        self._initialized = True
+
+            # Add, flush and threshold checks are called from the OCR thread and the GUI loop
+            self.lock = threading.RLock()
+            self.load_buffer()
+
+            # Batches are handed to the dispatcher, which fans them out through the delivery engine
+            self.dispatcher = NotificationDispatcher()
+
+            self._initialized = True
         print("NotificationBuffer initialized")
 
     def load_buffer(self):
-        """Load or create buffer file"""
-        if os.path.exists(self.buffer_file):
-            with open(self.buffer_file, 'r') as f:
-                self.buffer = json.load(f)
-        else:
-            self.buffer = self.default_buffer
-            self.save_buffer()
-
-    def save_buffer(self):
-        """Save current buffer to file"""
-        with open(self.buffer_file, 'w') as f:
-            json.dump(self.buffer, f, indent=2)
+        """Open or create the buffer database"""
+        self.conn = sqlite3.connect(self.buffer_db_path, check_same_thread=False)
+        # WAL keeps each append a small sequential write that survives a crash
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS pending_notifications
+                             (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                              timestamp TEXT,
+                              license_plate TEXT,
+                              color TEXT)''')
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS buffer_state
+                             (key TEXT PRIMARY KEY,
+                              value REAL)''')
+        self.conn.execute("INSERT OR IGNORE INTO buffer_state (key, value) VALUES ('last_notification_time', ?)",
+                          (time.time(),))
+        self.conn.commit()
+        self._import_legacy_buffer()
+
+        self.pending_count = self.conn.execute("SELECT COUNT(*) FROM pending_notifications").fetchone()[0]
+        self.last_notification_time = self.conn.execute(
+            "SELECT value FROM buffer_state WHERE key = 'last_notification_time'").fetchone()[0]
+
+    def _import_legacy_buffer(self):
+        """Move pending notifications from the old JSON file into the database once"""
+        if not os.path.exists(self.legacy_buffer_file):
+            return
+        with open(self.legacy_buffer_file, 'r') as f:
+            legacy = json.load(f)
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO pending_notifications (timestamp, license_plate, color) VALUES (?, ?, ?)",
+                [(n["timestamp"], n["license_plate"], n["color"]) for n in legacy.get("pending_notifications", [])])
+            if legacy.get("last_notification_time") is not None:
+                self.conn.execute("UPDATE buffer_state SET value = ? WHERE key = 'last_notification_time'",
+                                  (legacy["last_notification_time"],))
+        os.replace(self.legacy_buffer_file, self.legacy_buffer_file + ".migrated")
+        print("Imported pending notifications from notification_buffer.json")
 
     def add_notification(self, license_plate, color):
         """Add new notification to buffer"""
-        notification = {
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "license_plate": license_plate,
-            "color": color,
-            "status": "pending"
-        }
-        self.buffer["pending_notifications"].append(notification)
-        self.save_buffer()
-        self.check_and_send()
+        with self.lock:
+            with self.conn:  # One small transaction per notification
+                self.conn.execute(
+                    "INSERT INTO pending_notifications (timestamp, license_plate, color) VALUES (?, ?, ?)",
+                    (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), license_plate, color))
+            self.pending_count += 1
+            self.check_and_send()
 
     def check_and_send(self):
         """Check if conditions are met to send notifications"""
-        pending = self.buffer["pending_notifications"]
-        if not pending:
-            return
+        with self.lock:
+            if not self.pending_count:
+                return
 
-        current_time = time.time()
-        last_time = self.buffer["last_notification_time"]
-        
-        if last_time is None:
-            self.buffer["last_notification_time"] = current_time
-            self.save_buffer()
-            return  # Don't send yet, just start the timer
-        
-        pending_count = len(pending)
-        elapsed_time = current_time - last_time
-        
-        # Check thresholds from highest count to lowest
-        thresholds = sorted(
-            self.buffer["notification_settings"]["thresholds"],
-            key=lambda x: x["count"],
-            reverse=True
-        )
-        
-        for threshold in thresholds:
-            if pending_count >= threshold["count"]:
-                if elapsed_time >= threshold["time"]:
-                    self.send_notifications()
-                    return  # Only return after sending
-                break  # Exit loop after finding matching count threshold
+            current_time = time.time()
+            pending_count = self.pending_count
+            elapsed_time = current_time - self.last_notification_time
+            
+            # Check thresholds from highest count to lowest
+            thresholds = sorted(
+                self.notification_settings["thresholds"],
+                key=lambda x: x["count"],
+                reverse=True
+            )
+            
+            for threshold in thresholds:
+                if pending_count >= threshold["count"]:
+                    if elapsed_time >= threshold["time"]:
+                        self.send_notifications()
+                        return  # Only return after sending
+                    break  # Exit loop after finding matching count threshold
 
     def send_notifications(self):
         """Send all pending notifications"""
-        if not self.buffer["pending_notifications"]:
-            return
+        with self.lock:
+            notifications = self.conn.execute(
+                "SELECT id, license_plate, color FROM pending_notifications ORDER BY id").fetchall()
+            if not notifications:
+                return
 
-        # Prepare message
-        notifications = self.buffer["pending_notifications"]
-        violation_count = len(notifications)
-        
-        # Update message format to include count
-        message_text = f"New Illegal Parking ({violation_count} violations):\n"
-        for notif in notifications:
-            message_text += f"- {notif['license_plate']} ({notif['color']})\n"
-
-        # Send FCM message
-        message = messaging.Message(
-            notification=messaging.Notification(
-                title=f"Illegal Parking Update ({violation_count})",  # Updated title
-                body=message_text
-            ),
-            topic="Illegal-Parking"
-        )
-
-        try:
-            response = messaging.send(message)
-            print(f"Successfully sent notification batch: {response}")
-            
-            # Clear sent notifications
-            self.buffer["pending_notifications"] = []
-            self.buffer["last_notification_time"] = time.time()
-            self.save_buffer()
-        except Exception as e:
-            print(f"Error sending notification: {e}")
+            # Queue the batch; once it is in the durable delivery queue it is safe to clear the buffer
+            self.dispatcher.dispatch([(license_plate, color) for _, license_plate, color in notifications])
+
+            # Clear queued notifications
+            self.last_notification_time = time.time()
+            with self.conn:
+                self.conn.execute("DELETE FROM pending_notifications WHERE id <= ?", (notifications[-1][0],))
+                self.conn.execute("UPDATE buffer_state SET value = ? WHERE key = 'last_notification_time'",
+                                  (self.last_notification_time,))
+            self.pending_count = 0
 
     def force_send(self):
         """Manually trigger sending of all pending notifications"""
         self.send_notifications()
 
-    def update_notifications(self):
-        # Check every X seconds (e.g., 30 seconds)
-        self.master.after(30000, self.update_notifications)
@@ -0,0 +1,110 @@
+import sqlite3
+from firebase_admin import messaging
+from delivery import get_delivery_engine, PartialDeliveryError
+from config import FCM_MULTICAST_LIMIT, NOTIFICATION_MAX_BODY_CHARS
+
+TOPIC = "Illegal-Parking"
+
+
+def build_message(notifications, max_body_chars=NOTIFICATION_MAX_BODY_CHARS):
+    """
+    Build (title, body) for a batch of (license_plate, color) pairs. The body lists
+    plates until it would exceed max_body_chars, then summarises the rest.
+    """
+    violation_count = len(notifications)
+    title = f"Illegal Parking Update ({violation_count})"
+    body = f"New Illegal Parking ({violation_count} violations):\n"
+    for index, (license_plate, color) in enumerate(notifications):
+        line = f"- {license_plate} ({color})\n"
+        remaining = violation_count - index
+        summary = f"...and {remaining} more\n"
+        # Always leave room for the summary line in case later plates don't fit
+        if len(body) + len(line) + (len(summary) if remaining > 1 else 0) > max_body_chars:
+            body += summary
+            break
+        body += line
+    return title, body
+
+
+class NotificationDispatcher:
+    """Fans notifications out to every registered device token through the delivery engine"""
+
+    def __init__(self, local_db_path='parking_violations.db', transport=messaging, engine=None):
+        self.local_db_path = local_db_path
+        # transport is the firebase_admin.messaging module, or a local fake with the same API
+        self.transport = transport
+        self.engine = engine or get_delivery_engine()
+        self.engine.register('fcm_notification', self.deliver)
+        self.engine.register('fcm_topic', self.deliver)  # Jobs queued before per-device fan-out
+
+    def dispatch(self, notifications):
+        """Queue a batch of (license_plate, color) pairs; returns immediately"""
+        title, body = build_message(notifications)
+        self.engine.submit('fcm_notification', {"title": title, "body": body})
+
+    def _load_tokens(self):
+        conn = sqlite3.connect(self.local_db_path)
+        try:
+            return [row[0] for row in conn.execute("SELECT token FROM fcm_tokens ORDER BY id")]
+        except sqlite3.OperationalError:  # Table not created yet
+            return []
+        finally:
+            conn.close()
+
+    def _prune_tokens(self, tokens):
+        conn = sqlite3.connect(self.local_db_path)
+        try:
+            conn.executemany("DELETE FROM fcm_tokens WHERE token = ?", [(token,) for token in tokens])
+            conn.commit()
+        finally:
+            conn.close()
+        print(f"Removed {len(tokens)} invalid FCM tokens")
+
+    def _is_invalid_token(self, exception):
+        return isinstance(exception, (self.transport.UnregisteredError, self.transport.SenderIdMismatchError))
+
+    def deliver(self, payload):
+        """Delivery engine handler: send one notification to its tokens"""
+        notification = self.transport.Notification(title=payload["title"], body=payload["body"])
+
+        # A retry carries only the tokens that failed last time
+        tokens = payload.get("tokens")
+        if tokens is None and "topic" not in payload:
+            tokens = self._load_tokens()
+
+        if not tokens:
+            # Nobody has registered a device token; fall back to the topic subscribers
+            response = self.transport.send(self.transport.Message(
+                notification=notification, topic=payload.get("topic", TOPIC)))
+            print(f"Successfully sent notification batch: {response}")
+            return
+
+        invalid = []
+        retry = []
+        sent = 0
+        for i in range(0, len(tokens), FCM_MULTICAST_LIMIT):
+            chunk = tokens[i:i + FCM_MULTICAST_LIMIT]
+            try:
+                batch = self.transport.send_each_for_multicast(
+                    self.transport.MulticastMessage(tokens=chunk, notification=notification))
+            except Exception as e:
+                # Earlier chunks went through; raising here would resend them with the rest
+                print(f"Error sending notification to {len(chunk)} devices: {e}")
+                retry.extend(chunk)
+                continue
+            sent += batch.success_count
+            for token, response in zip(chunk, batch.responses):
+                if response.success:
+                    continue
+                if self._is_invalid_token(response.exception):
+                    invalid.append(token)
+                else:
+                    retry.append(token)
+
+        if invalid:
+            self._prune_tokens(invalid)
+        print(f"Sent notification to {sent} devices ({len(invalid)} invalid, {len(retry)} to retry)")
+        if retry:
+            # The same job is retried with backoff, for only the failed devices so the others don't get duplicates
+            raise PartialDeliveryError(f"{len(retry)} devices failed",
+                                       {"title": payload["title"], "body": payload["body"], "tokens": retry})
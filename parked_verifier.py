@@ -0,0 +1,77 @@
+import cv2
+import numpy as np
+from config import (PARKED_PATCH_SIZE, PARKED_PATCH_THRESHOLD, SCENE_THUMBNAIL_SIZE, SCENE_CHANGE_THRESHOLD,
+                    PARKED_FORCE_DETECT_FRAMES)
+
+
+def _small_gray(image, size):
+    """Downscaled grayscale copy as float32; downscaling first avoids a full-size gray frame"""
+    small = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+    if small.ndim == 3:
+        small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    return small.astype(np.float32)
+
+
+class ParkedVerifier:
+    """
+    Cheap check that nothing in the scene has moved since the last full detection.
+
+    Each stationary track keeps a small reference patch of its box; a frame passes
+    when every tracked car is an enrolled parked car whose patch still matches
+    (mean-normalized difference, so slow lighting changes don't count) and a
+    downscaled copy of the whole frame shows no new change. Full detection is still
+    forced every force_detect_frames frames.
+    """
+
+    def __init__(self, patch_size=PARKED_PATCH_SIZE, patch_threshold=PARKED_PATCH_THRESHOLD,
+                 thumbnail_size=SCENE_THUMBNAIL_SIZE, scene_threshold=SCENE_CHANGE_THRESHOLD,
+                 force_detect_frames=PARKED_FORCE_DETECT_FRAMES):
+        self.patch_size = (patch_size, patch_size)
+        self.patch_threshold = patch_threshold
+        self.thumbnail_size = thumbnail_size
+        self.scene_threshold = scene_threshold
+        self.force_detect_frames = force_detect_frames
+        self.references = {}  # Track id -> (box, patch)
+        self.scene = None
+        self.last_detect_frame = None
+
+    def _patch(self, frame, box):
+        x1, y1, x2, y2 = box
+        region = frame[max(0, y1):y2, max(0, x1):x2]
+        if region.size == 0:
+            return None
+        patch = _small_gray(region, self.patch_size)
+        return patch - patch.mean()
+
+    def enroll(self, track_id, box, frame):
+        """Store (or refresh) the reference patch of a stationary track"""
+        patch = self._patch(frame, box)
+        if patch is not None:
+            self.references[track_id] = (box, patch)
+
+    def forget(self, track_id):
+        self.references.pop(track_id, None)
+
+    def detected(self, frame, frame_count, track_ids):
+        """Call after each full detection: new scene reference, and drop tracks no longer seen"""
+        self.scene = _small_gray(frame, self.thumbnail_size)
+        self.last_detect_frame = frame_count
+        for track_id in list(self.references):
+            if track_id not in track_ids:
+                del self.references[track_id]
+
+    def can_skip_detection(self, frame, frame_count, track_ids):
+        """True if every track is a verified parked car and nothing else has changed"""
+        if self.scene is None or frame_count - self.last_detect_frame >= self.force_detect_frames:
+            return False
+        if any(track_id not in self.references for track_id in track_ids):
+            return False
+
+        for track_id in track_ids:
+            box, reference = self.references[track_id]
+            patch = self._patch(frame, box)
+            if patch is None or np.abs(patch - reference).mean() / 255 > self.patch_threshold:
+                return False
+
+        changed = np.abs(_small_gray(frame, self.thumbnail_size) - self.scene) > 25
+        return changed.mean() <= self.scene_threshold
@@ -3,8 +3,7 @@ import numpy as np
 import threading
 import time
 import sqlite3
-from datetime import datetime
-from paddleocr import PaddleOCR
+from datetime import datetime, timedelta
 import re
 import os
 import queue
@@ -16,34 +15,46 @@ from collections import Counter
 import requests
 import firebase_admin
 from firebase_admin import credentials, messaging
-import csv  # Add this import at the top
-import openpyxl  # Add this import at the top
 from color_detector import ColorDetector  # Add this import
 from notification_buffer import NotificationBuffer  # Add this import
-from firebase_sync import FirebaseSync
+from firebase_sync import FirebaseSync, init_firebase
+from edge_link import EdgeLink
+from metrics import metrics
+from tracing import tracer, profiler
+from violation_store import ViolationStore, open_store
+from image_writer import ImageWriter
+from exporter import export_violations, ExportCancelled, EXPORT_FORMATS, columnar_available
+from evidence_store import EvidenceStore, thumbnail_path
+from zones import DEFAULT_ZONE_NAME
+from clip_recorder import ClipRecorder
+from violation_index import RecentViolationIndex
+from background import get_background_loop
+import subprocess
+import sys
+from concurrent.futures import Future
+from config import LOG_WINDOW_SIZE, LOG_REFRESH_INTERVAL, RETENTION_INTERVAL, NOTIFICATION_CHECK_INTERVAL, AGGREGATOR_HOST
 
 # At the top of the file, add:
 DATABASE_PATH = 'parking_violations.db'
 
-# Initialize PaddleOCR
-ocr = PaddleOCR(use_angle_cls=True, lang='en')
+# PaddleOCR is loaded on first use; the benchmarks assign a stand-in here instead
+ocr = None
+
+
+def get_ocr():
+    global ocr
+    if ocr is None:
+        from paddleocr import PaddleOCR
+        ocr = PaddleOCR(use_angle_cls=True, lang='en')
+    return ocr
 
-# Initialize Firebase Admin SDK once
-cred = credentials.Certificate("firebase-adminsdk.json")
-firebase_admin.initialize_app(cred)
 
 # Database setup
 conn = sqlite3.connect(DATABASE_PATH, check_same_thread=False)
 cursor = conn.cursor()
-cursor.execute('''CREATE TABLE IF NOT EXISTS violations
-                  (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                   timestamp TEXT,
-                   license_plate TEXT,
-                   location TEXT,
-                   parking_duration INTEGER,
-                   image_path TEXT,
-                   car_color TEXT)''')
-conn.commit()
+violation_store = ViolationStore(conn)
+violation_store.create_table()
+violation_store.migrate()
 
 # Add near the other CREATE TABLE statements
 cursor.execute('''CREATE TABLE IF NOT EXISTS fcm_tokens
@@ -52,6 +63,25 @@ cursor.execute('''CREATE TABLE IF NOT EXISTS fcm_tokens
                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
 conn.commit()
 
+# Evidence images are encoded and written off the detection thread
+evidence_store = EvidenceStore(local_db_path=DATABASE_PATH)
+image_writer = ImageWriter(evidence_store)
+
+# The last few minutes of video, kept compressed in memory for pre-event clips
+clip_recorder = ClipRecorder()
+
+# Recent violations by position and plate, so a re-acquired car continues its violation
+recent_violations = RecentViolationIndex()
+
+# Log view headings that can be sorted server-side, and their ViolationStore sort keys
+SORTABLE_HEADINGS = {
+    'ID': 'id',
+    'Timestamp': 'timestamp',
+    'License Plate': 'license_plate',
+    'Color': 'car_color',
+    'Duration': 'parking_duration',
+}
+
 # Philippine license plate patterns
 PLATE_PATTERNS = [
     r'^[A-Z]{3}\s?\d{3,4}$',  # Standard format
@@ -79,7 +109,7 @@ def perform_ocr(image_path):
     img = cv2.imread(image_path)
     img = cv2.resize(img, None, fx=2, fy=2, interpolation=cv2.INTER_CUBIC)
 
-    result = ocr.ocr(img, cls=True)
+    result = get_ocr().ocr(img, cls=True)
     if result and result[0]:
         print(f"OCR Result structure: {result}")
 
@@ -105,26 +135,29 @@ def perform_ocr(image_path):
     return "", 0
 
 
-def log_violation(plate_text, start_time, image_path, car_color):
-    violation_id = int(time.time() * 1000)
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+def log_violation(plate_text, start_time, image_path, car_color, location=DEFAULT_ZONE_NAME, clip=None):
+    created_at = time.time()
+    violation_id = int(created_at * 1000)
 
     if not plate_text:
         plate_text = "Unknown"
     if not car_color:
         car_color = "Unknown"
 
-    full_image_path = os.path.abspath(image_path)
+    full_image_path = os.path.abspath(image_path) if image_path else None
 
     # Calculate parking duration
-    duration = int(time.time() - start_time)
+    duration = int(created_at - start_time)
 
     # Log to local database
-    cursor.execute('''INSERT INTO violations 
-                      (id, timestamp, license_plate, location, parking_duration, image_path, car_color)
-                      VALUES (?, ?, ?, ?, ?, ?, ?)''',
-                   (violation_id, timestamp, plate_text, "Manila", duration, full_image_path, car_color))
-    conn.commit()
+    with metrics.timer("db_write"):
+        violation_store.insert(violation_id, created_at, plate_text, location, duration, full_image_path, car_color)
+    metrics.increment("violations_logged")
+
+    # The clip was taken when the car was first found stationary; link it once it is written
+    if clip is not None:
+        clip.add_done_callback(lambda future: future.result() and
+                               get_background_loop().run(link_clip, violation_id, future.result()))
 
     # Replace the entire FCM notification block with:
     buffer = NotificationBuffer()
@@ -133,40 +166,112 @@ def log_violation(plate_text, start_time, image_path, car_color):
     return violation_id
 
 
+def link_clip(violation_id, clip_path):
+    store = open_store(DATABASE_PATH)  # Called on the background executor
+    try:
+        store.set_clip_path(violation_id, os.path.abspath(clip_path))  # Absolute, like image_path
+    finally:
+        store.conn.close()
+
+
+def open_with_default_app(path):
+    if sys.platform == "win32":
+        os.startfile(path)
+    else:
+        subprocess.Popen(["open" if sys.platform == "darwin" else "xdg-open", path])
+
+
 def update_parking_duration(violation_id, duration):
-    cursor.execute('''UPDATE violations SET parking_duration = ? WHERE id = ?''',
-                   (duration, violation_id))
-    conn.commit()
+    # Runs on the background executor, possibly several at once, so it gets its own connection
+    store = open_store(DATABASE_PATH)
+    try:
+        with metrics.timer("db_write"):
+            store.set_parking_duration(violation_id, duration)
+    finally:
+        store.conn.close()
 
 
-def handle_stationary_car(car_image, track_id, stationary_cars, ocr_queue):
-    if track_id not in stationary_cars:
+def adopt_recent_violation(track_id, stationary_cars, location=DEFAULT_ZONE_NAME, center=None):
+    """Continue a recent violation at the same spot instead of starting a new one; True if adopted"""
+    if track_id in stationary_cars:
+        return False
+    recent = recent_violations.near(location, center)
+    if recent is None:
+        return False
+    recent_violations.adopt(recent, track_id)
+    stationary_cars[track_id] = (recent.violation_id, recent.start_time, recent.image_path, 0)
+    metrics.increment("violations_merged")
+    print(f"Car with track_id {track_id} continues the violation started at "
+          f"{datetime.fromtimestamp(recent.start_time).strftime('%Y-%m-%d %H:%M:%S')} in {location}")
+    return True
+
+
+def handle_stationary_car(car_image, track_id, stationary_cars, ocr_queue, location=DEFAULT_ZONE_NAME,
+                          center=None):
+    if track_id in stationary_cars:
+        recent_violations.touch(track_id)
+    else:
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        image_path = f"violations/car_{timestamp}_{track_id}.jpg"
-        os.makedirs("violations", exist_ok=True)
-        
-        # Save the original image without bounding boxes
-        cv2.imwrite(image_path, car_image)
+
+        # Save the original image without bounding boxes; the path arrives through a future.
+        # car_image is a view into the caller's frame, so the writer thread gets its own copy.
+        name = f"car_{timestamp}_{track_id}"
+        image_path = image_writer.submit(car_image.copy(), name)
+        # The pre-event clip is the ring as it is now; by the time OCR has logged the
+        # violation the ring has moved on past the moment the car stopped
+        clip = clip_recorder.request_clip(image_path, name)
         
         start_time = time.time()
         stationary_cars[track_id] = (None, start_time, image_path, 0)
-        ocr_queue.put((track_id, image_path))
-        print(f"Car with track_id {track_id} detected as potentially illegally parked at {datetime.fromtimestamp(start_time).strftime('%Y-%m-%d %H:%M:%S')}")
+        recent_violations.add(track_id, location, center, start_time, image_path)
+        ocr_queue.put((track_id, image_path, time.time(), location, start_time, clip))
+        print(f"Car with track_id {track_id} detected as potentially illegally parked in {location} at {datetime.fromtimestamp(start_time).strftime('%Y-%m-%d %H:%M:%S')}")
 
 
 def finalize_stationary_car(track_id, stationary_cars):
     if track_id in stationary_cars:
+        recent_violations.release(track_id)
         violation_id, start_time, image_path, movement_counter = stationary_cars.pop(track_id)
         if violation_id and movement_counter < 15:
             end_time = time.time()
             duration = int(end_time - start_time)
-            update_parking_duration(violation_id, duration)
+            # Called on the detection thread; the database write happens in the background
+            get_background_loop().run(update_parking_duration, violation_id, duration)
         # Remove this line:
         # if os.path.exists(image_path):
         #     os.remove(image_path)
         print(f"Stationary car data for track_id {track_id} has been finalized.")
 
 
+def conclude_violation(track_id, plate_text, start_time, image_path, car_color, location, clip, stationary_cars):
+    """Log the violation once OCR is done, or continue an already logged one with the same plate"""
+    # The car may have been re-acquired under another track id meanwhile
+    recent = recent_violations.get(track_id)
+    owner = recent.track_id if recent else track_id
+    duplicate = recent_violations.with_plate(location, plate_text) if plate_text != "Unknown" else None
+    if duplicate is not None and recent is not None and duplicate is not recent:
+        # Same plate as a violation already logged in this zone: continue that one
+        recent_violations.discard(recent)
+        recent_violations.adopt(duplicate, owner)
+        if not violation_store.image_in_use(image_path):
+            evidence_store.delete(image_path)
+        if clip is not None:
+            clip.add_done_callback(lambda future: future.result() and
+                                   evidence_store.delete(future.result()))
+        violation_id, start_time, image_path = \
+            duplicate.violation_id, duplicate.start_time, duplicate.image_path
+        metrics.increment("violations_merged")
+        print(f"Car with track_id {track_id} ({plate_text}) continues violation {violation_id}")
+    else:
+        violation_id = log_violation(plate_text, start_time, image_path, car_color, location, clip)
+        if recent is not None:
+            recent_violations.logged(recent, violation_id, plate_text, image_path)
+        print(f"Illegal parking logged for car with track_id {track_id}. License plate: {plate_text}")
+        print(f"Violation logged with ID: {violation_id}")
+    if owner in stationary_cars:
+        stationary_cars[owner] = (violation_id, start_time, image_path, 0)
+
+
 def start_ocr_thread(ocr_queue, stationary_cars):
     ocr_attempts = {}
     max_attempts = 20
@@ -178,18 +283,32 @@ def start_ocr_thread(ocr_queue, stationary_cars):
             if car_data is None:
                 break
 
-            track_id, image_path = car_data
+            track_id, image_path, queued_at, location, start_time, clip = car_data
+            metrics.observe("ocr_queue_wait", time.time() - queued_at)
+            if isinstance(image_path, Future):
+                # Wait for the background writer to put the image on disk
+                try:
+                    image_path = image_path.result()
+                except Exception as e:
+                    # Without an image there is nothing to read the plate from, but the car is still
+                    # parked: log it as is, so no entry is left waiting for a violation id
+                    print(f"No evidence image for track_id {track_id} ({e}); logging without OCR")
+                    conclude_violation(track_id, "Unknown", start_time, None, None, location, clip, stationary_cars)
+                    continue
             print(f"Processing OCR for track_id {track_id}, image: {image_path}")
 
             if track_id not in ocr_attempts:
                 ocr_attempts[track_id] = {'attempts': 0, 'results': []}
 
             if ocr_attempts[track_id]['attempts'] < max_attempts:
-                plate_text, confidence = perform_ocr(image_path)
+                job_start = time.perf_counter()
+                with metrics.timer("ocr"):
+                    plate_text, confidence = perform_ocr(image_path)
                 
                 # Change this line from detect_color to get_dominant_color
-                car_image = cv2.imread(image_path)
-                car_color = color_detector.get_dominant_color(car_image)
+                with metrics.timer("color_detect"):
+                    car_image = cv2.imread(image_path)
+                    car_color = color_detector.get_dominant_color(car_image)
                 
                 ocr_attempts[track_id]['attempts'] += 1
                 ocr_attempts[track_id]['results'].append((plate_text, confidence))
@@ -207,18 +326,14 @@ def start_ocr_thread(ocr_queue, stationary_cars):
                         else:
                             plate_text = "Unknown"
 
-                    violation_id = log_violation(plate_text, stationary_cars[track_id][1], 
-                                              image_path, car_color)
-                    stationary_cars[track_id] = (violation_id, stationary_cars[track_id][1], 
-                                               image_path, 0)
-
-                    print(f"Illegal parking logged for car with track_id {track_id}. License plate: {plate_text}")
-                    print(f"Violation logged with ID: {violation_id}")
+                    conclude_violation(track_id, plate_text, start_time, image_path, car_color, location, clip,
+                                       stationary_cars)
 
                     del ocr_attempts[track_id]
                     print(f"OCR data for car with track_id {track_id} has been deleted.")
                 else:
-                    ocr_queue.put((track_id, image_path))
+                    ocr_queue.put((track_id, image_path, time.time(), location, start_time, clip))
+                tracer.record("ocr_job", job_start, time.perf_counter() - job_start, {"track_id": track_id})
 
         except queue.Empty:
             continue
@@ -234,8 +349,27 @@ class ViolationLogGUI:
         master.title("Illegal Parking  Logs")
         master.geometry("900x600")  # Increased width for new column
 
-        self.tree = ttk.Treeview(master, 
-            columns=('ID', 'Timestamp', 'License Plate', 'Color', 'Location', 'Duration', 'Image'),
+        # Filter boxes; filtering and sorting run in SQLite rather than in the tree
+        filter_frame = tk.Frame(master)
+        filter_frame.pack(fill=tk.X, pady=5)
+
+        self.plate_filter = tk.StringVar()
+        self.color_filter = tk.StringVar()
+        self.date_filter = tk.StringVar()
+        tk.Label(filter_frame, text="Plate:").pack(side=tk.LEFT, padx=5)
+        tk.Entry(filter_frame, textvariable=self.plate_filter, width=12).pack(side=tk.LEFT)
+        tk.Label(filter_frame, text="Color:").pack(side=tk.LEFT, padx=5)
+        tk.Entry(filter_frame, textvariable=self.color_filter, width=12).pack(side=tk.LEFT)
+        tk.Label(filter_frame, text="Date (YYYY-MM-DD):").pack(side=tk.LEFT, padx=5)
+        tk.Entry(filter_frame, textvariable=self.date_filter, width=12).pack(side=tk.LEFT)
+        tk.Button(filter_frame, text="Apply", command=self.apply_filters).pack(side=tk.LEFT, padx=5)
+        tk.Button(filter_frame, text="Clear", command=self.clear_filters).pack(side=tk.LEFT)
+
+        table_frame = tk.Frame(master)
+        table_frame.pack(fill=tk.BOTH, expand=1)
+
+        self.tree = ttk.Treeview(table_frame, 
+            columns=('ID', 'Timestamp', 'License Plate', 'Color', 'Location', 'Duration', 'Image', 'Clip'),
             show='headings', height=20)
         
         # Add headers
@@ -246,6 +380,11 @@ class ViolationLogGUI:
         self.tree.heading('Location', text='Location')
         self.tree.heading('Duration', text='Duration (s)')
         self.tree.heading('Image', text='Image')
+        self.tree.heading('Clip', text='Clip')
+
+        # Clicking a sortable header re-queries in that order
+        for column in SORTABLE_HEADINGS:
+            self.tree.heading(column, command=lambda c=column: self.sort_by(c))
 
         # Set column widths
         self.tree.column('ID', width=100)
@@ -255,8 +394,22 @@ class ViolationLogGUI:
         self.tree.column('Location', width=100)
         self.tree.column('Duration', width=100)
         self.tree.column('Image', width=200)
+        self.tree.column('Clip', width=200)
+
+        # The scrollbar covers every matching row while the tree only holds a window of them
+        self.scrollbar = ttk.Scrollbar(table_frame, orient=tk.VERTICAL, command=self.on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.configure(yscrollcommand=self.on_tree_scroll)
+        self.tree.bind("<MouseWheel>", self.on_mouse_wheel)
+        self.tree.bind("<Button-4>", self.on_mouse_wheel)
+        self.tree.bind("<Button-5>", self.on_mouse_wheel)
 
-        self.tree.pack(fill=tk.BOTH, expand=1)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=1)
+
+        # Thumbnail preview of the selected violation
+        self.preview_label = tk.Label(master)
+        self.preview_label.pack()
+        self.tree.bind("<<TreeviewSelect>>", self.on_select)
 
         # Add buttons frame
         button_frame = tk.Frame(master)
@@ -275,43 +428,235 @@ class ViolationLogGUI:
         self.export_button = tk.Button(button_frame, text="Export", command=self.export_logs)
         self.export_button.pack(side=tk.LEFT, padx=5)
 
+        # Profiling tools
+        self.profile_button = tk.Button(button_frame, text="Profile 30s", command=self.start_profiler)
+        self.profile_button.pack(side=tk.LEFT, padx=5)
+
+        self.trace_button = tk.Button(button_frame, text="Dump Trace", command=self.dump_trace)
+        self.trace_button.pack(side=tk.LEFT, padx=5)
+
         self.tree.bind("<Double-1>", self.on_double_click)
 
         self.image_refs = {}  # Store references to images
+
+        # Virtualized view state; indexes are absolute positions in the filtered, sorted result
+        self.view_store = open_store(DATABASE_PATH)  # Connection used for paging on the Tk thread
+        self.filters = {}
+        self.sort_key = 'timestamp'
+        self.sort_descending = True
+        self.total_rows = 0
+        self.window_offset = 0  # First row held in the tree
+        self.view_offset = 0  # First visible row
+        self.max_id = self.view_store.max_id()  # Changed rows above this are inserts
+        self.reload()
+
+        # Changed rows are fetched on a worker thread and applied here on the Tk main loop
+        self.refresh_queue = queue.Queue()
+        refresh_thread = threading.Thread(target=self.refresh_worker, daemon=True)
+        refresh_thread.start()
         self.update_logs()
-        self.update_notifications()
 
-        # Start Firebase sync in background
-        self.firebase_sync = FirebaseSync()
-        sync_thread = threading.Thread(
-            target=self.firebase_sync.start_periodic_sync,
-            daemon=True
-        )
-        sync_thread.start()
+        # Periodic background work runs on the shared background loop
+        get_background_loop().every(NOTIFICATION_CHECK_INTERVAL, NotificationBuffer().check_and_send,
+                                    name="notification_check")
+        if AGGREGATOR_HOST:
+            # Edge mode: the aggregator owns the central database and the Firestore sync
+            self.edge_link = EdgeLink(DATABASE_PATH, status=lambda: metrics.snapshot()["gauges"])
+            self.edge_link.start_periodic_sync()
+        else:
+            init_firebase()
+            self.firebase_sync = FirebaseSync()
+            self.firebase_sync.start_periodic_sync()
+        evidence_store.start_periodic_retention(RETENTION_INTERVAL)
+
+    def refresh_worker(self):
+        """Poll for rows inserted or changed since the last watermark"""
+        store = open_store(DATABASE_PATH)  # Separate connection for this thread
+        watermark = store.watermark()
+
+        while True:
+            time.sleep(LOG_REFRESH_INTERVAL)
+            try:
+                rows, watermark = store.changes_since(watermark, limit=LOG_WINDOW_SIZE)
+                if rows:
+                    self.refresh_queue.put(rows)
+            except Exception as e:
+                print(f"Error refreshing violation logs: {e}")
 
     def update_logs(self):
-        for i in self.tree.get_children():
-            self.tree.delete(i)
-
-        cursor.execute(
-            "SELECT id, timestamp, license_plate, car_color, location, parking_duration, image_path FROM violations ORDER BY timestamp DESC")
-        for row in cursor.fetchall():
-            self.tree.insert('', 'end', values=row)
+        """Apply fetched rows to the window; cost scales with the number of changed rows"""
+        try:
+            while True:
+                rows = self.refresh_queue.get_nowait()
+                new_rows = False
+                for row in rows:
+                    item = str(row[0])
+                    if self.tree.exists(item):
+                        self.tree.item(item, values=row)
+                    elif row[0] > self.max_id:
+                        # Updates to rows outside the window don't change what is shown or the count
+                        new_rows = True
+                    self.max_id = max(self.max_id, row[0])
+
+                if new_rows:
+                    if self.view_offset == 0:
+                        self.reload()  # Viewing the top, so show the new rows
+                    else:
+                        self.total_rows = self.view_store.count(**self.filters)
+                        self.update_scrollbar()
+        except queue.Empty:
+            pass
+
+        self.master.after(200, self.update_logs)
+
+    def visible_rows(self):
+        return int(self.tree.cget('height'))
+
+    def reload(self, view_offset=None):
+        """Recount matching rows and reload the window around view_offset"""
+        self.total_rows = self.view_store.count(**self.filters)
+        self.load_window(self.view_offset if view_offset is None else view_offset)
+
+    def load_window(self, view_offset):
+        """Replace the tree contents with a window of rows centred on view_offset"""
+        visible = self.visible_rows()
+        view_offset = max(0, min(view_offset, self.total_rows - visible))
+        window_offset = max(0, view_offset - (LOG_WINDOW_SIZE - visible) // 2)
+        rows = self.view_store.fetch_window(window_offset, LOG_WINDOW_SIZE, self.sort_key,
+                                            self.sort_descending, **self.filters)
+        if len(rows) < LOG_WINDOW_SIZE:
+            # Rows were deleted since counting; the window now reaches the end
+            self.total_rows = window_offset + len(rows)
+
+        self.tree.delete(*self.tree.get_children())
+        for row in rows:
+            self.tree.insert('', 'end', iid=str(row[0]), values=row)
+        self.window_offset = window_offset
+        self.show_position(view_offset)
+
+    def show_position(self, view_offset):
+        """Scroll so view_offset is the first visible row, paging in a new window when needed"""
+        visible = self.visible_rows()
+        view_offset = max(0, min(view_offset, self.total_rows - visible))
+        window_rows = len(self.tree.get_children())
+        window_end = self.window_offset + window_rows
+        if view_offset < self.window_offset or (view_offset + visible > window_end and window_end < self.total_rows):
+            self.load_window(view_offset)
+            return
+
+        self.view_offset = view_offset
+        self.tree.yview_moveto((view_offset - self.window_offset) / max(1, window_rows))
+        self.update_scrollbar()
+
+    def update_scrollbar(self):
+        if self.total_rows == 0:
+            self.scrollbar.set(0, 1)
+            return
+        first = self.view_offset / self.total_rows
+        last = min(1.0, (self.view_offset + self.visible_rows()) / self.total_rows)
+        self.scrollbar.set(first, last)
+
+    def on_scrollbar(self, action, amount, unit=None):
+        if action == 'moveto':
+            self.show_position(int(float(amount) * self.total_rows))
+        elif action == 'scroll':
+            step = self.visible_rows() if unit == 'pages' else 1
+            self.show_position(self.view_offset + int(amount) * step)
+
+    def on_mouse_wheel(self, event):
+        if event.num == 4:
+            delta = -3
+        elif event.num == 5:
+            delta = 3
+        else:
+            delta = -3 * int(event.delta / 120)
+        self.show_position(self.view_offset + delta)
+        return "break"
+
+    def on_tree_scroll(self, first, last):
+        """Follow keyboard scrolling inside the window and page when it reaches an edge"""
+        window_rows = len(self.tree.get_children())
+        view_offset = self.window_offset + round(float(first) * window_rows)
+        if view_offset == self.view_offset:
+            return
+        self.view_offset = view_offset
+        visible = self.visible_rows()
+        near_start = view_offset - self.window_offset < visible and self.window_offset > 0
+        near_end = (self.window_offset + window_rows - view_offset < 2 * visible
+                    and self.window_offset + window_rows < self.total_rows)
+        if near_start or near_end:
+            self.load_window(view_offset)
+        else:
+            self.update_scrollbar()
 
-        self.master.after(5000, self.update_logs)
+    def sort_by(self, column):
+        key = SORTABLE_HEADINGS[column]
+        if key == self.sort_key:
+            self.sort_descending = not self.sort_descending
+        else:
+            self.sort_key = key
+            self.sort_descending = True
+        self.reload(0)
+
+    def apply_filters(self):
+        filters = {}
+        if self.plate_filter.get().strip():
+            filters['plate_prefix'] = self.plate_filter.get().strip()
+        if self.color_filter.get().strip():
+            filters['color'] = self.color_filter.get().strip()
+        if self.date_filter.get().strip():
+            try:
+                day = datetime.strptime(self.date_filter.get().strip(), "%Y-%m-%d")
+            except ValueError:
+                messagebox.showerror("Error", "Date must be in YYYY-MM-DD format")
+                return
+            filters['start'] = day
+            filters['end'] = day + timedelta(days=1)
+        self.filters = filters
+        self.reload(0)
+
+    def clear_filters(self):
+        self.plate_filter.set("")
+        self.color_filter.set("")
+        self.date_filter.set("")
+        self.filters = {}
+        self.reload(0)
 
     def on_double_click(self, event):
-        """Handle double click on tree item"""
+        """Handle double click on tree item; the Clip column opens the clip"""
         selected = self.tree.selection()
         if selected:  # Check if there's a selection
             item = selected[0]
-            image_path = self.tree.item(item, "values")[6]  # Change from 5 to 6
+            values = self.tree.item(item, "values")
+            if self.tree.identify_column(event.x) == '#8' and values[7]:
+                if os.path.exists(values[7]):
+                    open_with_default_app(values[7])
+                else:
+                    messagebox.showerror("Error", f"Clip not found: {values[7]}")
+                return
+            image_path = values[6]  # Change from 5 to 6
             self.show_full_image(image_path)
 
+    def on_select(self, event):
+        """Show the stored thumbnail of the selected violation"""
+        selected = self.tree.selection()
+        if not selected:
+            return
+        image_path = self.tree.item(selected[0], "values")[6]
+        thumb = thumbnail_path(image_path) if image_path else None
+        if thumb and os.path.exists(thumb):
+            photo = ImageTk.PhotoImage(Image.open(thumb))
+            self.preview_label.config(image=photo)
+            self.preview_label.image = photo  # Keep a reference
+        else:
+            self.preview_label.config(image='')
+            self.preview_label.image = None
+
     def show_full_image(self, image_path):
-        if os.path.exists(image_path):
+        if image_path and os.path.exists(image_path):
             try:
                 img = Image.open(image_path)
+                img.draft('RGB', (1280, 720))  # Let the JPEG decoder downscale instead of decoding full size
                 img.thumbnail((1280, 720))  # Resize image if it's too large
                 photo = ImageTk.PhotoImage(img)
 
@@ -332,27 +677,32 @@ class ViolationLogGUI:
                 for item in selected_items:
                     violation_id = self.tree.item(item, "values")[0]
                     self.remove_violation(violation_id)
-                    self.tree.delete(item)
                     if item in self.image_refs:
                         del self.image_refs[item]
+                self.reload()
 
     def remove_violation(self, violation_id):
-        # First get the image path before deleting from database
-        cursor.execute("SELECT image_path FROM violations WHERE id = ?", (violation_id,))
+        # First get the image and clip paths before deleting from database
+        cursor.execute("SELECT image_path, clip_path FROM violations WHERE id = ?", (violation_id,))
         result = cursor.fetchone()
-        if result:
-            image_path = result[0]
-            # Delete the image file if it exists
-            try:
-                if os.path.exists(image_path):
-                    os.remove(image_path)
-                    print(f"Image file deleted: {image_path}")
-            except Exception as e:
-                print(f"Error deleting image file: {str(e)}")
 
         # Delete from database
         cursor.execute("DELETE FROM violations WHERE id = ?", (violation_id,))
         conn.commit()
+
+        if result and result[0]:
+            image_path = result[0]
+            # Images are content-addressed, so only delete the file once no other violation uses it
+            cursor.execute("SELECT COUNT(*) FROM violations WHERE image_path = ?", (image_path,))
+            if cursor.fetchone()[0] == 0:
+                try:
+                    evidence_store.delete(image_path)
+                    print(f"Image file deleted: {image_path}")
+                except Exception as e:
+                    print(f"Error deleting image file: {str(e)}")
+        if result and result[1]:
+            # Each clip belongs to a single violation
+            evidence_store.delete(result[1])
         print(f"Violation with ID {violation_id} has been removed from the database.")
 
     def send_test_notification(self):
@@ -375,56 +725,38 @@ class ViolationLogGUI:
         """Open export dialog to choose file format."""
         ExportDialog(self.master, self.perform_export)
 
-    def perform_export(self, file_type):
-        """Perform the export based on the selected file type."""
-        if file_type == "csv":
-            file_path = filedialog.asksaveasfilename(defaultextension=".csv", 
-                filetypes=[("CSV files", "*.csv")])
-            if file_path:
-                with open(file_path, mode='w', newline='') as file:
-                    writer = csv.writer(file)
-                    writer.writerow(['ID', 'Timestamp', 'License Plate', 'Color', 
-                                   'Location', 'Duration', 'Image'])
-
-                    cursor.execute("""SELECT id, timestamp, license_plate, car_color, 
-                                    location, parking_duration, image_path 
-                                    FROM violations ORDER BY timestamp DESC""")
-                    for row in cursor.fetchall():
-                        writer.writerow(row)
-
-                messagebox.showinfo("Export Successful", f"The violation logs have been exported to {file_path}.")
-        
-        elif file_type == "excel":
-            file_path = filedialog.asksaveasfilename(defaultextension=".xlsx", filetypes=[("Excel files", "*.xlsx")])
-            if file_path:
-                workbook = openpyxl.Workbook()
-                sheet = workbook.active
-                sheet.title = "Violation Logs"
-
-                # Write header
-                sheet.append(['ID', 'Timestamp', 'License Plate', 'Color', 'Location', 'Duration', 'Image'])
-
-                cursor.execute("SELECT id, timestamp, license_plate, car_color, location, parking_duration, image_path FROM violations ORDER BY timestamp DESC")
-                for row in cursor.fetchall():
-                    sheet.append(row)  # Write each row of data
-
-                workbook.save(file_path)
-                messagebox.showinfo("Export Successful", f"The violation logs have been exported to {file_path}.")
+    def perform_export(self, file_type, start=None, end=None):
+        """Ask for a destination, then export in the background with a progress window."""
+        extension, description = EXPORT_FORMATS[file_type]
+        file_path = filedialog.asksaveasfilename(defaultextension=extension,
+            filetypes=[(description, f"*{extension}")])
+        if file_path:
+            ExportProgress(self.master, file_path, file_type, start, end)
 
     # Add new method for force sending notifications
     def force_send_notifications(self):
         try:
             buffer = NotificationBuffer()
             buffer.force_send()
-            messagebox.showinfo("Success", "Pending notifications sent!")
+            messagebox.showinfo("Success", "Pending notifications queued for delivery!")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to send notifications: {str(e)}")
 
-    def update_notifications(self):
-        buffer = NotificationBuffer()
-        buffer.check_and_send()
-        # Check every X seconds (e.g., 30 seconds)
-        self.master.after(30000, self.update_notifications)
+    def start_profiler(self):
+        if profiler.start(30):
+            messagebox.showinfo("Profiler", "Sampling all threads for 30 seconds.")
+        else:
+            messagebox.showinfo("Profiler", "The profiler is already running.")
+
+    def dump_trace(self):
+        if not tracer.enabled:
+            messagebox.showinfo("Tracing", "Tracing is off. Set TRACING_ENABLED = True in config.py.")
+            return
+        try:
+            path = tracer.dump()
+            messagebox.showinfo("Tracing", f"Trace written to {path}. Open it in Perfetto or chrome://tracing.")
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to write trace: {str(e)}")
 
 
 class ExportDialog:
@@ -433,7 +765,17 @@ class ExportDialog:
         self.callback = callback
         self.top = tk.Toplevel(master)
         self.top.title("Choose Export Format")
-        self.top.geometry("300x150")
+        self.top.geometry("300x330")
+
+        # Optional time range; leave empty to export everything
+        range_frame = tk.Frame(self.top)
+        range_frame.pack(pady=10)
+        self.start_date = tk.StringVar()
+        self.end_date = tk.StringVar()
+        tk.Label(range_frame, text="From (YYYY-MM-DD):").grid(row=0, column=0, sticky=tk.W)
+        tk.Entry(range_frame, textvariable=self.start_date, width=12).grid(row=0, column=1)
+        tk.Label(range_frame, text="To (YYYY-MM-DD):").grid(row=1, column=0, sticky=tk.W)
+        tk.Entry(range_frame, textvariable=self.end_date, width=12).grid(row=1, column=1)
 
         label = tk.Label(self.top, text="Choose type of file:")
         label.pack(pady=10)
@@ -444,29 +786,95 @@ class ExportDialog:
         excel_button = tk.Button(self.top, text="Excel", command=lambda: self.export("excel"))
         excel_button.pack(pady=5)
 
+        # Columnar formats need pyarrow
+        columnar_state = tk.NORMAL if columnar_available() else tk.DISABLED
+        parquet_button = tk.Button(self.top, text="Parquet", state=columnar_state,
+                                   command=lambda: self.export("parquet"))
+        parquet_button.pack(pady=5)
+
+        arrow_button = tk.Button(self.top, text="Arrow", state=columnar_state,
+                                 command=lambda: self.export("arrow"))
+        arrow_button.pack(pady=5)
+
         cancel_button = tk.Button(self.top, text="Cancel", command=self.top.destroy)
         cancel_button.pack(pady=5)
 
     def export(self, file_type):
-        self.callback(file_type)
+        try:
+            start = self.parse_date(self.start_date.get())
+            end = self.parse_date(self.end_date.get())
+        except ValueError:
+            messagebox.showerror("Error", "Dates must be in YYYY-MM-DD format", parent=self.top)
+            return
+        if end is not None:
+            end += timedelta(days=1)  # Include the whole end day
         self.top.destroy()
+        self.callback(file_type, start, end)
 
+    @staticmethod
+    def parse_date(text):
+        text = text.strip()
+        return datetime.strptime(text, "%Y-%m-%d") if text else None
 
-# Start the GUI in a separate thread
-# gui_thread = threading.Thread(target=run_gui, daemon=True)
-# gui_thread.start()
 
-# In your main processing loop, you would call:
-# handle_stationary_car(car_image, track_id, stationary_cars)
-# When a car leaves or the program ends:
-# finalize_stationary_car(track_id, stationary_cars)
+class ExportProgress:
+    """Runs an export on a worker thread and shows its progress with a cancel button"""
 
-# Don't forget to close the database connection when your program ends
-# conn.close()
+    def __init__(self, master, file_path, file_type, start, end):
+        self.master = master
+        self.file_path = file_path
+        self.cancel_event = threading.Event()
+        self.updates = queue.Queue()
 
-# Start the OCR thread
-stationary_cars = {}
-ocr_queue = queue.Queue()
-ocr_thread = threading.Thread(target=start_ocr_thread, args=(ocr_queue, stationary_cars), daemon=True)
-ocr_thread.start()
+        self.top = tk.Toplevel(master)
+        self.top.title("Exporting")
+        self.top.geometry("350x120")
+        self.top.protocol("WM_DELETE_WINDOW", self.cancel)
+
+        self.status = tk.Label(self.top, text="Starting export...")
+        self.status.pack(pady=10)
+        self.progress = ttk.Progressbar(self.top, length=300, mode='determinate')
+        self.progress.pack(pady=5)
+        tk.Button(self.top, text="Cancel", command=self.cancel).pack(pady=5)
+
+        worker = threading.Thread(target=self.run, args=(file_type, start, end), daemon=True)
+        worker.start()
+        self.poll()
+
+    def run(self, file_type, start, end):
+        try:
+            rows = export_violations(DATABASE_PATH, self.file_path, file_type, start, end,
+                                     progress_callback=lambda done, total: self.updates.put(("progress", done, total)),
+                                     cancel_event=self.cancel_event)
+            self.updates.put(("done", rows))
+        except ExportCancelled:
+            self.updates.put(("cancelled",))
+        except Exception as e:
+            self.updates.put(("error", str(e)))
+
+    def poll(self):
+        """Apply worker updates on the Tk thread"""
+        try:
+            while True:
+                update = self.updates.get_nowait()
+                if update[0] == "progress":
+                    _, done, total = update
+                    self.progress['maximum'] = max(total, 1)
+                    self.progress['value'] = done
+                    self.status.config(text=f"Exported {done} of {total} violations")
+                    continue
+
+                self.top.destroy()
+                if update[0] == "done":
+                    messagebox.showinfo("Export Successful",
+                                        f"{update[1]} violation logs have been exported to {self.file_path}.")
+                elif update[0] == "error":
+                    messagebox.showerror("Export Failed", f"Failed to export logs: {update[1]}")
+                return
+        except queue.Empty:
+            pass
+        self.top.after(100, self.poll)
 
+    def cancel(self):
+        self.cancel_event.set()
+        self.status.config(text="Cancelling...")
@@ -1,86 +1,101 @@
 import cv2
 import numpy as np
-import json
 import os
+from zones import Zone, load_zones, save_zones, draw_zones
 
 
-def select_region(image_path, width, height, json_path='region.json', confirm_callback=None):
+def _ask_zone_details(index):
+    name = input(f"Name for zone {index + 1} (blank for 'Zone {index + 1}'): ").strip() or f"Zone {index + 1}"
+    dwell = input("Dwell limit in seconds (blank for the default): ").strip()
+    return name, float(dwell) if dwell else None
+
+
+def select_region(image_path, width, height, json_path='region.json', confirm_callback=None, zone_callback=None,
+                  frame=None):
+    """
+    Let the user draw one or more named zones on the first frame and return them as a
+    list of Zone objects (None if nothing was selected). frame, if given, is drawn on
+    instead of reading the first frame of image_path.
+
+    Left click adds a point, N closes the current polygon (3+ points) and asks for its
+    name and dwell limit, Backspace removes the last point, Enter finishes and Esc cancels.
+    """
     # Check if region file exists
     if os.path.exists(json_path):
         use_existing = confirm_callback() if confirm_callback else input(
             "Existing region found. Use it? (y/n): ").lower() == 'y'
         if use_existing:
-            with open(json_path, 'r') as f:
-                return np.array(json.load(f), dtype=np.int32)
+            return load_zones(json_path)
+
+    zone_callback = zone_callback or _ask_zone_details
 
     # Read the first frame of the video
-    cap = cv2.VideoCapture(image_path)
-    ret, frame = cap.read()
-    if not ret:
-        print("Failed to read the video file.")
-        return None
-    cap.release()
+    if frame is None:
+        cap = cv2.VideoCapture(image_path)
+        ret, frame = cap.read()
+        cap.release()
+        if not ret:
+            print("Failed to read the video file.")
+            return None
 
     # Resize frame to match the video dimensions
     frame = cv2.resize(frame, (width, height))
 
     # Create a window and set mouse callback
     cv2.namedWindow("Select Region")
+    zones = []
     points = []
-    current_point = 0
 
     def mouse_callback(event, x, y, flags, param):
-        nonlocal points, current_point
         if event == cv2.EVENT_LBUTTONDOWN:
-            if len(points) < 4:
-                points.append((x, y))
-            else:
-                points[current_point] = (x, y)
-                current_point = (current_point + 1) % 4
-
-            # Redraw the frame and points
-            frame_copy = frame.copy()
-            for i, pt in enumerate(points):
-                color = (0, 0, 255) if i == current_point else (0, 255, 0)
-                cv2.circle(frame_copy, pt, 5, color, -1)
-            if len(points) > 1:
-                pts = np.array(points + [points[0]], np.int32)
-                cv2.polylines(frame_copy, [pts], True, (0, 255, 0), 2)
-            cv2.imshow("Select Region", frame_copy)
+            points.append((x, y))
+
+    def close_polygon():
+        nonlocal points
+        if len(points) < 3:
+            print("A zone needs at least 3 points.")
+            return
+        details = zone_callback(len(zones))
+        if details is not None:
+            name, dwell_seconds = details
+            zones.append(Zone(name, points, dwell_seconds))
+        points = []
 
     cv2.setMouseCallback("Select Region", mouse_callback)
 
     # Main loop for region selection
     while True:
         frame_copy = frame.copy()
-        for i, pt in enumerate(points):
-            color = (0, 0, 255) if i == current_point else (0, 255, 0)
-            cv2.circle(frame_copy, pt, 5, color, -1)
+        draw_zones(frame_copy, zones)
+        for pt in points:
+            cv2.circle(frame_copy, pt, 5, (0, 0, 255), -1)
         if len(points) > 1:
-            pts = np.array(points + [points[0]], np.int32)
-            cv2.polylines(frame_copy, [pts], True, (0, 255, 0), 2)
+            pts = np.array(points, np.int32)
+            cv2.polylines(frame_copy, [pts], len(points) > 2, (0, 255, 0), 2)
         cv2.imshow("Select Region", frame_copy)
 
         key = cv2.waitKey(1) & 0xFF
-        if key == 13:  # Enter key
+        if key in (ord('n'), ord('N')):
+            close_polygon()
+        elif key == 8 and points:  # Backspace
+            points.pop()
+        elif key == 13:  # Enter key
+            if len(points) >= 3:
+                close_polygon()
             break
         elif key == 27:  # Esc key
-            points = []
+            zones = []
             break
 
     cv2.destroyAllWindows()
 
-    if len(points) < 4:
-        print("Not enough points selected. Please select exactly 4 points.")
+    if not zones:
+        print("No zones selected. Please draw at least one polygon with 3 or more points.")
         return None
 
-    # Save the region to JSON file
-    with open(json_path, 'w') as f:
-        json.dump(points, f)
-
-    # Convert points to numpy array
-    region = np.array(points, dtype=np.int32)
-    return region
+    # Save the zones to JSON file
+    save_zones(json_path, zones)
+    return zones
 
 
 if __name__ == "__main__":
@@ -0,0 +1,172 @@
+import os
+import threading
+import time
+import cv2
+from metrics import metrics
+from ffmpeg_capture import FFmpegCapture, ffmpeg_available
+from config import STREAM_RECONNECT_BASE_DELAY, STREAM_RECONNECT_MAX_DELAY, STREAM_READ_TIMEOUT
+
+# Properties cached from the capture, so they can be read while the stream is reconnecting
+CACHED_PROPERTIES = (cv2.CAP_PROP_FRAME_WIDTH, cv2.CAP_PROP_FRAME_HEIGHT, cv2.CAP_PROP_FPS)
+
+
+def open_stream_capture(source, width=None, height=None, fps=None, decoder="opencv", crop=None):
+    """
+    Open an RTSP/RTMP stream with the smallest buffer and a read timeout. With the
+    "ffmpeg" decoder the stream is scaled to width and decimated to fps while
+    decoding; OpenCV is the fallback when that can't be opened.
+    """
+    if decoder == "ffmpeg":
+        if ffmpeg_available():
+            cap = FFmpegCapture(source, width, fps, crop)
+            if cap.isOpened():
+                return cap
+        print("Opening the stream with OpenCV instead of ffmpeg")
+
+    timeout_us = int(STREAM_READ_TIMEOUT * 1_000_000)
+    if source.lower().startswith("rtsp"):
+        options = ["rtsp_transport;tcp", f"timeout;{timeout_us}"]
+    else:
+        options = ["rtmp_buffer_size;1024", f"rw_timeout;{timeout_us}"]
+    os.environ['OPENCV_FFMPEG_CAPTURE_OPTIONS'] = '|'.join(options)
+
+    cap = cv2.VideoCapture(source, cv2.CAP_FFMPEG)
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    if width and height:
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    if fps:
+        cap.set(cv2.CAP_PROP_FPS, fps)
+    return cap
+
+
+class StreamReader:
+    """
+    Reads a live stream on its own thread and hands out only the newest frame.
+
+    The thread grabs continuously so frames never pile up in the driver's buffer,
+    and only decodes (retrieve) the frame after a read() asked for one. When the
+    stream fails, the capture is reopened with exponential backoff while read()
+    waits, so the pipeline and its tracker state carry on once frames arrive again.
+    Has the parts of the cv2.VideoCapture interface the pipeline uses.
+
+    open_capture is a callable returning a new capture, so tests can pass a fake.
+    """
+
+    def __init__(self, open_capture, base_delay=STREAM_RECONNECT_BASE_DELAY, max_delay=STREAM_RECONNECT_MAX_DELAY):
+        self.open_capture = open_capture
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.condition = threading.Condition()
+        self.frame = None
+        self.frame_id = 0  # Frames decoded so far
+        self.grab_id = 0  # Frames grabbed so far
+        self.frame_number = 0  # grab_id of the newest decoded frame, i.e. its source frame number
+        self.want_frame = False
+        self.captured_at = None  # time.time() when the newest frame was grabbed
+        self.properties = {}
+        self.connected = False
+        self.reconnects = 0
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True, name="StreamReader")
+        self.thread.start()
+        return self
+
+    def wait_connected(self, timeout):
+        """True once the first frame has been grabbed, False if that takes longer than timeout"""
+        with self.condition:
+            return self.condition.wait_for(lambda: self.grab_id > 0 or not self.running, timeout) and self.running
+
+    def isOpened(self):
+        return self.running
+
+    def get(self, prop):
+        return self.properties.get(prop, 0.0)
+
+    def read(self):
+        """The next frame grabbed after this call; waits out reconnects. (False, None) once released."""
+        with self.condition:
+            target = self.frame_id + 1
+            self.want_frame = True
+            while self.running and self.frame_id < target:
+                self.condition.wait(0.5)
+            if not self.running:
+                return False, None
+            return True, self.frame
+
+    def grab(self):
+        """Wait for the next frame without decoding it"""
+        with self.condition:
+            target = self.grab_id + 1
+            while self.running and self.grab_id < target:
+                self.condition.wait(0.5)
+            return self.running
+
+    def release(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(STREAM_READ_TIMEOUT + 1)
+
+    def _run(self):
+        delay = self.base_delay
+        while self.running:
+            cap = self._open()
+            if cap is None:
+                self._sleep(delay)
+                delay = min(delay * 2, self.max_delay)
+                continue
+            delay = self.base_delay
+            self._read_until_failure(cap)
+            cap.release()
+            if self.running:
+                self.reconnects += 1
+                metrics.increment("stream_reconnects")
+                print("Stream lost; reconnecting")
+
+    def _open(self):
+        try:
+            cap = self.open_capture()
+        except Exception as e:
+            print(f"Error opening stream: {e}")
+            return None
+        if not cap.isOpened():
+            cap.release()
+            return None
+        with self.condition:
+            self.properties = {prop: cap.get(prop) for prop in CACHED_PROPERTIES}
+            self.connected = True
+        return cap
+
+    def _read_until_failure(self, cap):
+        while self.running:
+            if not cap.grab():
+                break
+            grabbed_at = time.time()
+            with self.condition:
+                self.grab_id += 1
+                decode = self.want_frame
+                self.condition.notify_all()
+            if not decode:
+                continue
+            ok, frame = cap.retrieve()
+            if not ok:
+                break
+            with self.condition:
+                self.frame = frame
+                self.frame_id += 1
+                self.frame_number = self.grab_id
+                self.captured_at = grabbed_at
+                self.want_frame = False
+                self.condition.notify_all()
+        with self.condition:
+            self.connected = False
+
+    def _sleep(self, seconds):
+        with self.condition:
+            self.condition.wait_for(lambda: not self.running, seconds)
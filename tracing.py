@@ -0,0 +1,121 @@
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from config import TRACING_ENABLED, TRACE_BUFFER_EVENTS, TRACE_FILE, PROFILE_SAMPLE_INTERVAL
+
+
+class Tracer:
+    """
+    Opt-in span recorder. Spans go into a fixed-size ring buffer and are dumped as
+    Chrome Trace Event JSON, which chrome://tracing and Perfetto can open.
+    """
+
+    def __init__(self, enabled=TRACING_ENABLED, capacity=TRACE_BUFFER_EVENTS):
+        self.enabled = enabled
+        self.events = deque(maxlen=capacity)
+        self.thread_names = {}
+        self.origin = time.perf_counter()
+        self.pid = os.getpid()
+
+    def record(self, name, start, duration, args=None):
+        """Record a finished span; start is a time.perf_counter() value, duration in seconds"""
+        if not self.enabled:
+            return
+        tid = threading.get_ident()
+        if tid not in self.thread_names:
+            self.thread_names[tid] = threading.current_thread().name
+        event = {
+            "name": name,
+            "ph": "X",
+            "ts": (start - self.origin) * 1e6,
+            "dur": duration * 1e6,
+            "pid": self.pid,
+            "tid": tid,
+        }
+        if args:
+            event["args"] = args
+        self.events.append(event)  # deque.append is atomic, so no lock is needed
+
+    @contextmanager
+    def span(self, name, **args):
+        """Trace the enclosed block"""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter() - start, args)
+
+    def dump(self, path=TRACE_FILE):
+        """Write the buffered spans as Chrome Trace Event JSON"""
+        events = list(self.events)
+        metadata = [{"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid, "args": {"name": name}}
+                    for tid, name in list(self.thread_names.items())]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, f)
+        print(f"Wrote {len(events)} trace events to {path}")
+        return path
+
+
+class SamplingProfiler:
+    """Samples every thread's stack for a fixed time and writes collapsed stacks (flame graph input)"""
+
+    def __init__(self, interval=PROFILE_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.running = False
+        self.lock = threading.Lock()
+
+    def start(self, seconds):
+        """Profile for the given number of seconds in the background; ignored if already running"""
+        with self.lock:
+            if self.running:
+                return False
+            self.running = True
+        threading.Thread(target=self._run, args=(seconds,), daemon=True, name="SamplingProfiler").start()
+        return True
+
+    def _run(self, seconds):
+        stacks = Counter()
+        own_id = threading.get_ident()
+        deadline = time.time() + seconds
+        try:
+            while time.time() < deadline:
+                names = {t.ident: t.name for t in threading.enumerate()}
+                for tid, frame in sys._current_frames().items():
+                    if tid == own_id:
+                        continue
+                    stack = []
+                    while frame is not None:
+                        code = frame.f_code
+                        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                        frame = frame.f_back
+                    stacks[";".join([names.get(tid, str(tid))] + stack[::-1])] += 1
+                time.sleep(self.interval)
+
+            path = f"profile_{time.strftime('%Y%m%d_%H%M%S')}.txt"
+            with open(path, "w") as f:
+                for stack, count in stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+            print(f"Wrote {sum(stacks.values())} profile samples to {path}")
+        finally:
+            with self.lock:
+                self.running = False
+
+
+tracer = Tracer()
+profiler = SamplingProfiler()
+
+
+def install_signal_handlers(profile_seconds=30):
+    """SIGUSR1 profiles for profile_seconds, SIGUSR2 dumps the trace (POSIX only; call from the main thread)"""
+    if not hasattr(signal, "SIGUSR1"):
+        return
+    signal.signal(signal.SIGUSR1, lambda signum, frame: profiler.start(profile_seconds))
+    signal.signal(signal.SIGUSR2, lambda signum, frame: tracer.dump())
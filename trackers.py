@@ -0,0 +1,228 @@
+import os
+import numpy as np
+from config import TRACKER, DETECT_INTERVAL, TRACKER_IOU_THRESHOLD, TRACKER_MAX_AGE, TRACKER_MAX_CENTROID_DISTANCE
+
+CAR_CLASS = 2  # COCO "car"
+
+# Ultralytics tracker configurations; BoT-SORT's camera-motion compensation is off for fixed cameras
+ULTRALYTICS_TRACKERS = {
+    'bytetrack': 'bytetrack.yaml',
+    'botsort': os.path.join(os.path.dirname(os.path.abspath(__file__)), 'botsort_static.yaml'),
+}
+TRACKER_CHOICES = ['iou'] + list(ULTRALYTICS_TRACKERS)
+
+
+def _numpy(values):
+    """Ultralytics returns torch tensors, the benchmark stubs NumPy arrays"""
+    return values.cpu().numpy() if hasattr(values, "cpu") else np.asarray(values)
+
+
+class TrackedBox:
+    def __init__(self, xyxy, cls, track_id):
+        self.xyxy = xyxy.reshape(1, 4)
+        self.cls = cls
+        self.id = track_id
+
+
+class TrackedBoxes:
+    """
+    Tracked boxes with the parts of the Ultralytics Boxes API the pipeline uses:
+    whole-set .xyxy/.cls/.id arrays, len(), and indexing or iteration giving single
+    boxes with .xyxy[0], .cls and .id (None when the box has no track).
+    """
+
+    def __init__(self, xyxy, cls, ids=None):
+        self.xyxy = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4)
+        self.cls = np.asarray(cls).reshape(-1)
+        self.id = None if ids is None else np.asarray(ids, dtype=np.int64).reshape(-1)
+
+    def __len__(self):
+        return len(self.xyxy)
+
+    def __getitem__(self, index):
+        track_id = None if self.id is None or self.id[index] < 0 else int(self.id[index])
+        return TrackedBox(self.xyxy[index], int(self.cls[index]), track_id)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+class TrackResult:
+    def __init__(self, boxes):
+        self.boxes = boxes
+
+
+def iou_matrix(a, b):
+    """Pairwise IoU between (N, 4) and (M, 4) xyxy arrays"""
+    ix1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    iy1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    ix2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    iy2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(ix2 - ix1, 0, None) * np.clip(iy2 - iy1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
+
+
+def _centers(boxes):
+    return np.stack([(boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2], axis=1)
+
+
+def _greedy_match(scores, valid):
+    """Pairs (row, col) taken in order of descending score, each row and column at most once"""
+    rows, cols = np.nonzero(valid)
+    order = np.argsort(-scores[rows, cols], kind='stable')
+    used_rows, used_cols, pairs = set(), set(), []
+    for k in order:
+        r, c = rows[k], cols[k]
+        if r not in used_rows and c not in used_cols:
+            used_rows.add(r)
+            used_cols.add(c)
+            pairs.append((r, c))
+    return pairs
+
+
+class IoUTracker:
+    """
+    Minimal tracker for fixed cameras: detections are matched by IoU to where each
+    track is expected to be (constant velocity), then leftovers by centroid distance.
+    Lost tracks are kept for max_age detection rounds.
+    """
+
+    def __init__(self, iou_threshold=TRACKER_IOU_THRESHOLD, max_age=TRACKER_MAX_AGE,
+                 max_centroid_distance=TRACKER_MAX_CENTROID_DISTANCE):
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.max_centroid_distance = max_centroid_distance
+        self.boxes = np.empty((0, 4), dtype=np.float32)
+        self.ids = np.empty(0, dtype=np.int64)
+        self.ages = np.empty(0, dtype=np.int64)
+        self.velocities = np.empty((0, 2), dtype=np.float32)  # Pixels per frame
+        self.next_id = 1
+
+    def update(self, detections, elapsed=1):
+        """Assign a track id to each (N, 4) xyxy detection; elapsed is frames since the last update"""
+        detections = np.asarray(detections, dtype=np.float32).reshape(-1, 4)
+        ids = np.full(len(detections), -1, dtype=np.int64)
+        matches = np.full(len(detections), -1, dtype=np.int64)  # Detection -> track row
+        matched_tracks = np.zeros(len(self.boxes), dtype=bool)
+        predicted = self.boxes + np.tile(self.velocities * elapsed, 2)
+
+        if len(detections) and len(self.boxes):
+            iou = iou_matrix(detections, predicted)
+            for d, t in _greedy_match(iou, iou >= self.iou_threshold):
+                matches[d] = t
+                matched_tracks[t] = True
+
+            # Centroid distance catches small boxes that jumped further than their own size
+            free_d, free_t = matches < 0, ~matched_tracks
+            if free_d.any() and free_t.any():
+                distance = np.linalg.norm(_centers(detections)[:, None] - _centers(predicted)[None], axis=2)
+                valid = (distance <= self.max_centroid_distance) & free_d[:, None] & free_t[None, :]
+                for d, t in _greedy_match(-distance, valid):
+                    matches[d] = t
+                    matched_tracks[t] = True
+
+        found = matches >= 0
+        ids[found] = self.ids[matches[found]]
+        velocities = np.zeros((len(detections), 2), dtype=np.float32)
+        velocities[found] = (_centers(detections[found]) - _centers(self.boxes[matches[found]])) / elapsed
+        new = ~found
+        ids[new] = np.arange(self.next_id, self.next_id + new.sum())
+        self.next_id += int(new.sum())
+
+        # Keep unmatched tracks (coasting) until they are too old; matched ones take the new box
+        keep = ~matched_tracks & (self.ages + 1 <= self.max_age)
+        self.boxes = np.concatenate([predicted[keep], detections])
+        self.ids = np.concatenate([self.ids[keep], ids])
+        self.ages = np.concatenate([self.ages[keep] + 1, np.zeros(len(detections), dtype=np.int64)])
+        self.velocities = np.concatenate([self.velocities[keep], velocities])
+        return ids
+
+
+class CarTracker:
+    """
+    Runs the car detector every detect_interval frames with the selected tracker and
+    predicts boxes in between from each track's velocity between its last two
+    detections. Results look like Ultralytics results: result.boxes.
+    """
+
+    def __init__(self, model, tracker=TRACKER, detect_interval=DETECT_INTERVAL, classes=(CAR_CLASS,)):
+        if tracker not in TRACKER_CHOICES:
+            raise ValueError(f"Unknown tracker {tracker!r}; choose one of {', '.join(TRACKER_CHOICES)}")
+        self.model = model
+        self.tracker = tracker
+        self.detect_interval = max(1, detect_interval)
+        self.classes = list(classes)
+        self.iou_tracker = IoUTracker() if tracker == 'iou' else None
+        self.last = None  # (xyxy, cls, ids) from the last detection
+        self.last_frame = None  # Frame number of the last detection
+        self.frame_size = None  # (width, height) predicted boxes are clipped to
+        self.velocity = {}  # Track id -> (dx, dy) per source frame
+        self.predicted_frames = 0  # Calls answered by prediction since the last detection
+
+    def update(self, frame, frame_count):
+        """
+        Tracked car boxes for this frame. Detection runs on every detect_interval-th call;
+        frame_count is the source frame number, used to extrapolate skipped frames.
+        """
+        if self.last is not None and self.predicted_frames + 1 < self.detect_interval:
+            self.predicted_frames += 1
+            return self._predict(frame_count)
+        self.predicted_frames = 0
+        return self._detect(frame, frame_count)
+
+    def track_ids(self):
+        """Ids in the last detection; -1 stands for any box without a track"""
+        return set() if self.last is None else {int(i) if i >= 0 else -1 for i in self.last[2]}
+
+    def hold(self):
+        """The last detection's boxes again, for frames known to be unchanged"""
+        xyxy, cls, ids = self.last
+        return TrackResult(TrackedBoxes(xyxy, cls, ids))
+
+    def _detect(self, frame, frame_count):
+        self.frame_size = (frame.shape[1], frame.shape[0])
+        if self.iou_tracker is not None:
+            result = self.model(frame, classes=self.classes, verbose=False)[0]
+            xyxy, cls = _numpy(result.boxes.xyxy), _numpy(result.boxes.cls)
+            elapsed = frame_count - self.last_frame if self.last_frame is not None else 1
+            ids = self.iou_tracker.update(xyxy, max(1, elapsed))
+        else:
+            result = self.model.track(frame, persist=True, tracker=ULTRALYTICS_TRACKERS[self.tracker],
+                                      classes=self.classes, verbose=False)[0]
+            xyxy, cls = _numpy(result.boxes.xyxy), _numpy(result.boxes.cls)
+            ids = _numpy(result.boxes.id).astype(np.int64) if result.boxes.id is not None else np.full(len(xyxy), -1)
+
+        if self.detect_interval > 1:
+            self._update_velocity(xyxy, ids, frame_count)
+        self.last = (xyxy, cls, ids)
+        self.last_frame = frame_count
+        return TrackResult(TrackedBoxes(xyxy, cls, ids))
+
+    def _update_velocity(self, xyxy, ids, frame_count):
+        velocity = {}
+        if self.last is not None:
+            previous = {int(i): box for box, i in zip(self.last[0], self.last[2]) if i >= 0}
+            elapsed = frame_count - self.last_frame
+            for box, i in zip(xyxy, ids):
+                old = previous.get(int(i))
+                if old is not None:
+                    velocity[int(i)] = (((box[0] + box[2]) - (old[0] + old[2])) / (2 * elapsed),
+                                        ((box[1] + box[3]) - (old[1] + old[3])) / (2 * elapsed))
+        self.velocity = velocity
+
+    def _predict(self, frame_count):
+        xyxy, cls, ids = self.last
+        elapsed = frame_count - self.last_frame
+        predicted = xyxy.copy()
+        for row, i in enumerate(ids):
+            dx, dy = self.velocity.get(int(i), (0.0, 0.0))
+            predicted[row] += (dx * elapsed, dy * elapsed, dx * elapsed, dy * elapsed)
+        # A car driving out of view must not be extrapolated off the frame
+        width, height = self.frame_size
+        np.clip(predicted[:, 0::2], 0, width - 1, out=predicted[:, 0::2])
+        np.clip(predicted[:, 1::2], 0, height - 1, out=predicted[:, 1::2])
+        return TrackResult(TrackedBoxes(predicted, cls, ids))
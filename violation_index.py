@@ -0,0 +1,167 @@
+import re
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future
+from config import DUPLICATE_VIOLATION_RADIUS, DUPLICATE_VIOLATION_TTL
+
+
+def normalize_plate(text):
+    """Plates compare without spaces, punctuation or case"""
+    return re.sub(r'[^A-Z0-9]', '', text.upper()) if text else ""
+
+
+class RecentViolation:
+    def __init__(self, key, track_id, location, center, start_time, image_path, now):
+        self.key = key
+        self.track_id = track_id  # Track currently continuing this violation
+        self.location = location
+        self.center = center
+        self.start_time = start_time
+        self.image_path = image_path  # A future until the image has been written
+        self.violation_id = None  # Set once OCR has logged the row
+        self.plate = ""
+        self.last_seen = now
+
+
+class RecentViolationIndex:
+    """
+    Violations whose car was seen parked recently, indexed by zone and position
+    (a grid of radius-sized cells) and by zone and normalized plate.
+
+    A tracker that loses a parked car for a moment brings it back under a new track
+    id; looking the new track up here lets it continue the existing violation
+    instead of starting a new image, OCR run and row. Entries expire ttl seconds
+    after their car was last seen, and are dropped as soon as the car drives off.
+    Used from both the detection and OCR threads.
+    """
+
+    def __init__(self, radius=DUPLICATE_VIOLATION_RADIUS, ttl=DUPLICATE_VIOLATION_TTL):
+        self.radius = radius
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = {}  # Key (the first track's id) -> RecentViolation
+        self.by_track = {}  # Current track id -> key
+        self.cells = defaultdict(set)  # (location, cell x, cell y) -> keys
+        self.plates = {}  # (location, plate) -> key
+
+    def _cell(self, location, center):
+        return location, int(center[0] // self.radius), int(center[1] // self.radius)
+
+    def add(self, track_id, location, center, start_time, image_path):
+        now = time.time()
+        with self.lock:
+            self._expire(now)
+            entry = RecentViolation(track_id, track_id, location, center, start_time, image_path, now)
+            self._remove(self.entries.get(track_id))
+            self.entries[track_id] = entry
+            self.by_track[track_id] = track_id
+            if center is not None:
+                self.cells[self._cell(location, center)].add(track_id)
+            return entry
+
+    def restore(self, key, location, center, start_time, image_path, violation_id, plate):
+        """Re-add a violation saved before a restart; it waits under key until a track adopts it"""
+        entry = self.add(key, location, center, start_time, image_path)
+        if violation_id is not None:
+            self.logged(entry, violation_id, plate, image_path)
+        return entry
+
+    def snapshot(self):
+        """Copies of the live entries whose evidence image is on disk"""
+        with self.lock:
+            self._expire(time.time())
+            entries = list(self.entries.values())
+        snapshot = []
+        for entry in entries:
+            image_path = entry.image_path
+            if isinstance(image_path, Future):
+                if not image_path.done() or image_path.exception() is not None:
+                    continue
+                image_path = image_path.result()
+            snapshot.append((entry.violation_id, entry.start_time, entry.location, entry.center,
+                             entry.plate, image_path))
+        return snapshot
+
+    def get(self, key):
+        with self.lock:
+            return self.entries.get(key)
+
+    def touch(self, track_id):
+        """The track's car is still parked"""
+        with self.lock:
+            key = self.by_track.get(track_id)
+            if key in self.entries:
+                self.entries[key].last_seen = time.time()
+
+    def near(self, location, center):
+        """The closest live violation in the zone within radius of center, if any"""
+        if center is None:
+            return None
+        with self.lock:
+            self._expire(time.time())
+            _, cx, cy = self._cell(location, center)
+            best, best_distance = None, self.radius
+            for dx in (-1, 0, 1):
+                for dy in (-1, 0, 1):
+                    for key in self.cells.get((location, cx + dx, cy + dy), ()):
+                        entry = self.entries[key]
+                        distance = ((entry.center[0] - center[0]) ** 2 + (entry.center[1] - center[1]) ** 2) ** 0.5
+                        if distance <= best_distance:
+                            best, best_distance = entry, distance
+            return best
+
+    def with_plate(self, location, plate):
+        """The live logged violation in the zone with this plate, if any"""
+        with self.lock:
+            self._expire(time.time())
+            key = self.plates.get((location, normalize_plate(plate)))
+            return self.entries.get(key)
+
+    def adopt(self, entry, track_id):
+        """Hand the violation over to a new track"""
+        with self.lock:
+            if self.by_track.get(entry.track_id) == entry.key:
+                del self.by_track[entry.track_id]
+            entry.track_id = track_id
+            entry.last_seen = time.time()
+            self.by_track[track_id] = entry.key
+
+    def logged(self, entry, violation_id, plate, image_path):
+        with self.lock:
+            entry.violation_id = violation_id
+            entry.image_path = image_path
+            entry.plate = normalize_plate(plate)
+            if entry.plate and entry.key in self.entries:
+                self.plates[(entry.location, entry.plate)] = entry.key
+
+    def discard(self, entry):
+        with self.lock:
+            self._remove(entry)
+
+    def release(self, track_id):
+        """The track's car drove off; its spot no longer continues the violation"""
+        with self.lock:
+            key = self.by_track.get(track_id)
+            if key is not None:
+                self._remove(self.entries.get(key))
+
+    def _remove(self, entry):
+        if entry is None or self.entries.get(entry.key) is not entry:
+            return
+        del self.entries[entry.key]
+        if self.by_track.get(entry.track_id) == entry.key:
+            del self.by_track[entry.track_id]
+        if entry.center is not None:
+            cell = self._cell(entry.location, entry.center)
+            self.cells[cell].discard(entry.key)
+            if not self.cells[cell]:
+                del self.cells[cell]
+        if self.plates.get((entry.location, entry.plate)) == entry.key:
+            del self.plates[(entry.location, entry.plate)]
+
+    def _expire(self, now):
+        # Age alone decides, so entries still waiting for OCR go too: a car unseen for ttl is
+        # gone whether or not its row has been logged, and OCR logs it without the entry
+        for entry in [e for e in self.entries.values() if now - e.last_seen > self.ttl]:
+            self._remove(entry)
@@ -0,0 +1,325 @@
+import os
+import sqlite3
+from datetime import datetime
+
+# Columns shown in the log view and exports, in display order
+VIOLATION_COLUMNS = "id, timestamp, license_plate, car_color, location, parking_duration, image_path, clip_path"
+DEFAULT_PAGE_SIZE = 500
+# Columns the log view can sort on server-side; each is backed by an index
+SORT_COLUMNS = {
+    'id': 'id',
+    'timestamp': 'ts_epoch',
+    'license_plate': 'license_plate',
+    'car_color': 'car_color',
+    'parking_duration': 'parking_duration',
+}
+NOW_MS_SQL = "CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER)"
+
+
+def to_epoch(value):
+    """Convert a datetime, 'YYYY-MM-DD[ HH:MM:SS]' string or number to epoch seconds"""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d"):
+        try:
+            return int(datetime.strptime(value, fmt).timestamp())
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognised date: {value}")
+
+
+class ViolationStore:
+    """Indexed, paginated access to the violations table"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def create_table(self):
+        """Create the violations table in its original layout; migrate() brings it up to date"""
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS violations
+                             (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                              timestamp TEXT,
+                              license_plate TEXT,
+                              location TEXT,
+                              parking_duration INTEGER,
+                              image_path TEXT,
+                              car_color TEXT)''')
+        self.conn.commit()
+
+    def migrate(self):
+        """Bring an existing violations table up to the current schema"""
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(violations)")}
+
+        # Databases created by early versions have no colour column
+        if 'car_color' not in columns:
+            self.conn.execute("ALTER TABLE violations ADD COLUMN car_color TEXT")
+
+        # Integer epoch timestamp so range queries and sorting can use an index
+        if 'ts_epoch' not in columns:
+            self.conn.execute("ALTER TABLE violations ADD COLUMN ts_epoch INTEGER")
+            self.conn.execute("""UPDATE violations
+                                 SET ts_epoch = CAST(strftime('%s', timestamp, 'utc') AS INTEGER)
+                                 WHERE ts_epoch IS NULL""")
+
+        # Pre-event evidence clip, written after the row; the update triggers must cover it
+        if 'clip_path' not in columns:
+            self.conn.execute("ALTER TABLE violations ADD COLUMN clip_path TEXT")
+            self.conn.execute("DROP TRIGGER IF EXISTS violations_touch_update")
+            self.conn.execute("DROP TRIGGER IF EXISTS violations_outbox_update")
+
+        # Rows an aggregator received from edge sites, keyed by the site and the row's id there
+        if 'site' not in columns:
+            self.conn.execute("ALTER TABLE violations ADD COLUMN site TEXT")
+            self.conn.execute("ALTER TABLE violations ADD COLUMN site_violation_id INTEGER")
+
+        # Last-change time in epoch milliseconds, maintained by triggers, for incremental refresh
+        if 'updated_at' not in columns:
+            self.conn.execute("ALTER TABLE violations ADD COLUMN updated_at INTEGER")
+            self.conn.execute("UPDATE violations SET updated_at = ts_epoch * 1000 WHERE updated_at IS NULL")
+        self.conn.execute(f"""CREATE TRIGGER IF NOT EXISTS violations_touch_insert
+                               AFTER INSERT ON violations WHEN NEW.updated_at IS NULL
+                               BEGIN
+                                   UPDATE violations SET updated_at = {NOW_MS_SQL} WHERE id = NEW.id;
+                               END""")
+        self.conn.execute(f"""CREATE TRIGGER IF NOT EXISTS violations_touch_update
+                               AFTER UPDATE OF timestamp, license_plate, car_color, location,
+                                               parking_duration, image_path, clip_path ON violations
+                               BEGIN
+                                   UPDATE violations SET updated_at = {NOW_MS_SQL} WHERE id = NEW.id;
+                               END""")
+
+        # Outbox of changes for incremental sync, filled by triggers on every write path
+        outbox_exists = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'violation_changes'").fetchone()
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS violation_changes
+                             (seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                              violation_id INTEGER NOT NULL,
+                              op TEXT NOT NULL)""")
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS sync_state
+                             (name TEXT PRIMARY KEY,
+                              watermark INTEGER NOT NULL)""")
+        if not outbox_exists:
+            # Existing rows have never been through the outbox, so queue them once
+            self.conn.execute("INSERT INTO violation_changes (violation_id, op) SELECT id, 'upsert' FROM violations")
+        self.conn.execute("""CREATE TRIGGER IF NOT EXISTS violations_outbox_insert
+                               AFTER INSERT ON violations
+                               BEGIN
+                                   INSERT INTO violation_changes (violation_id, op) VALUES (NEW.id, 'upsert');
+                               END""")
+        self.conn.execute("""CREATE TRIGGER IF NOT EXISTS violations_outbox_update
+                               AFTER UPDATE OF timestamp, license_plate, car_color, location,
+                                               parking_duration, image_path, clip_path ON violations
+                               BEGIN
+                                   INSERT INTO violation_changes (violation_id, op) VALUES (NEW.id, 'upsert');
+                               END""")
+        self.conn.execute("""CREATE TRIGGER IF NOT EXISTS violations_outbox_delete
+                               AFTER DELETE ON violations
+                               BEGIN
+                                   INSERT INTO violation_changes (violation_id, op) VALUES (OLD.id, 'delete');
+                               END""")
+
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_violations_time ON violations (ts_epoch, id)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_violations_updated ON violations (updated_at)")  # Keyed with the rowid
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_violations_plate ON violations (license_plate, ts_epoch)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_violations_color ON violations (car_color, ts_epoch)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_violations_duration ON violations (parking_duration)")
+        # Evidence images are shared between rows, so deletes and retention look rows up by path
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_violations_image ON violations (image_path)")
+        # Local rows have no site (NULLs never conflict); a site's row is stored once however often it is resent
+        self.conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_violations_site ON violations (site, site_violation_id)")
+        self.conn.commit()
+
+    def insert(self, violation_id, created_at, plate_text, location, duration, image_path, car_color):
+        """Insert a violation; created_at is epoch seconds"""
+        timestamp = datetime.fromtimestamp(created_at).strftime("%Y-%m-%d %H:%M:%S")
+        self.conn.execute('''INSERT INTO violations
+                             (id, timestamp, ts_epoch, license_plate, location, parking_duration, image_path, car_color)
+                             VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+                          (violation_id, timestamp, int(created_at), plate_text, location, duration,
+                           image_path, car_color))
+        self.conn.commit()
+
+    def set_parking_duration(self, violation_id, duration):
+        self.conn.execute("UPDATE violations SET parking_duration = ? WHERE id = ?", (duration, violation_id))
+        self.conn.commit()
+
+    def set_clip_path(self, violation_id, clip_path):
+        self.conn.execute("UPDATE violations SET clip_path = ? WHERE id = ?", (clip_path, violation_id))
+        self.conn.commit()
+
+    def image_in_use(self, image_path):
+        """Whether any violation links this image; images are content-addressed, so rows can share one"""
+        return self.conn.execute("SELECT 1 FROM violations WHERE image_path = ? LIMIT 1",
+                                 (os.path.abspath(image_path),)).fetchone() is not None
+
+    def _build_filters(self, start=None, end=None, plate_prefix=None, color=None, min_duration=None):
+        clauses = []
+        params = []
+        if start is not None:
+            clauses.append("ts_epoch >= ?")
+            params.append(to_epoch(start))
+        if end is not None:
+            clauses.append("ts_epoch < ?")
+            params.append(to_epoch(end))
+        if plate_prefix:
+            # A half-open range instead of LIKE so the plate index is used
+            prefix = plate_prefix.upper()
+            clauses.append("license_plate >= ? AND license_plate < ?")
+            params.extend([prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)])
+        if color:
+            clauses.append("car_color = ?")
+            params.append(color)
+        if min_duration is not None:
+            clauses.append("parking_duration >= ?")
+            params.append(min_duration)
+        return clauses, params
+
+    def query(self, limit=DEFAULT_PAGE_SIZE, after=None, **filters):
+        """
+        Return one page of violations, newest first, and the cursor for the next page.
+
+        after is the cursor returned by the previous call (None for the first page).
+        filters: start, end (epoch, datetime or date string), plate_prefix, color, min_duration.
+        The returned cursor is None when there are no more rows.
+        """
+        clauses, params = self._build_filters(**filters)
+        if after is not None:
+            clauses.append("(ts_epoch, id) < (?, ?)")
+            params.extend(after)
+
+        sql = f"SELECT {VIOLATION_COLUMNS}, ts_epoch FROM violations"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY ts_epoch DESC, id DESC LIMIT ?"
+        params.append(limit)
+
+        rows = self.conn.execute(sql, params).fetchall()
+        next_cursor = (rows[-1][-1], rows[-1][0]) if len(rows) == limit else None
+        return [row[:-1] for row in rows], next_cursor
+
+    def iter_rows(self, page_size=DEFAULT_PAGE_SIZE, **filters):
+        """Yield every matching violation, newest first, one page at a time"""
+        cursor = None
+        while True:
+            rows, cursor = self.query(limit=page_size, after=cursor, **filters)
+            yield from rows
+            if cursor is None:
+                break
+
+    def fetch_window(self, offset, limit, sort='timestamp', descending=True, **filters):
+        """
+        Return rows [offset, offset + limit) in the given sort order, for the virtualized log view.
+        Offsets let the scrollbar jump anywhere; SQLite walks the sort index to reach them.
+        """
+        column = SORT_COLUMNS[sort]
+        direction = "DESC" if descending else "ASC"
+        clauses, params = self._build_filters(**filters)
+
+        sql = f"SELECT {VIOLATION_COLUMNS} FROM violations"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += f" ORDER BY {column} {direction}, id {direction} LIMIT ? OFFSET ?"
+        params.extend([limit, offset])
+        return self.conn.execute(sql, params).fetchall()
+
+    def watermark(self):
+        """(updated_at, id) of the latest change in the table, used as the starting point for changes_since()"""
+        row = self.conn.execute("SELECT updated_at, id FROM violations ORDER BY updated_at DESC, id DESC LIMIT 1").fetchone()
+        return tuple(row) if row and row[0] is not None else (0, 0)
+
+    def max_id(self):
+        return self.conn.execute("SELECT MAX(id) FROM violations").fetchone()[0] or 0
+
+    def changes_since(self, watermark, limit=DEFAULT_PAGE_SIZE):
+        """
+        Return violations inserted or updated after watermark, oldest change first, and
+        the new watermark. The watermark is an (updated_at, id) keyset, so rows sharing
+        one updated_at (a bulk UPDATE) are paged through rather than returned again.
+        """
+        rows = self.conn.execute(f"""SELECT {VIOLATION_COLUMNS}, updated_at FROM violations
+                                     WHERE (updated_at, id) > (?, ?) ORDER BY updated_at, id LIMIT ?""",
+                                 (*watermark, limit)).fetchall()
+        if not rows:
+            return [], watermark
+        return [row[:-1] for row in rows], (rows[-1][-1], rows[-1][0])
+
+    def fetch_by_ids(self, ids, columns=VIOLATION_COLUMNS):
+        """Return {id: row} for the given violation ids; columns must start with id"""
+        found = {}
+        ids = list(ids)
+        for i in range(0, len(ids), 500):  # Stay below SQLite's parameter limit
+            chunk = ids[i:i + 500]
+            rows = self.conn.execute(f"SELECT {columns} FROM violations WHERE id IN "
+                                     f"({','.join('?' * len(chunk))})", chunk).fetchall()
+            found.update((row[0], row) for row in rows)
+        return found
+
+    def fetch_after_id(self, after_id, limit=DEFAULT_PAGE_SIZE, columns=VIOLATION_COLUMNS):
+        """Rows with id above after_id in id order, for walking the whole table; columns must start with id"""
+        return self.conn.execute(f"SELECT {columns} FROM violations WHERE id > ? ORDER BY id LIMIT ?",
+                                 (after_id, limit)).fetchall()
+
+    def outbox_since(self, seq, limit=DEFAULT_PAGE_SIZE):
+        """Return (seq, violation_id, op) outbox entries after seq, oldest first"""
+        return self.conn.execute("""SELECT seq, violation_id, op FROM violation_changes
+                                     WHERE seq > ? ORDER BY seq LIMIT ?""", (seq, limit)).fetchall()
+
+    def get_sync_watermark(self, name, default=0):
+        row = self.conn.execute("SELECT watermark FROM sync_state WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else default
+
+    def outbox_head(self):
+        """seq of the newest outbox entry, 0 if there is none"""
+        return self.conn.execute("SELECT COALESCE(MAX(seq), 0) FROM violation_changes").fetchone()[0]
+
+    def remove_sync_consumer(self, name):
+        """Forget a consumer that no longer runs, so its watermark stops holding back outbox cleanup"""
+        self.conn.execute("DELETE FROM sync_state WHERE name = ?", (name,))
+        self.conn.execute("DELETE FROM violation_changes WHERE seq <= (SELECT MIN(watermark) FROM sync_state)")
+        self.conn.commit()
+
+    def commit_sync_watermark(self, name, seq):
+        """Persist a consumer's watermark and drop outbox entries every consumer has seen"""
+        self.conn.execute("""INSERT INTO sync_state (name, watermark) VALUES (?, ?)
+                             ON CONFLICT(name) DO UPDATE SET watermark = excluded.watermark""", (name, seq))
+        self.conn.execute("DELETE FROM violation_changes WHERE seq <= (SELECT MIN(watermark) FROM sync_state)")
+        self.conn.commit()
+
+    def apply_site_changes(self, site, fields, upserts, deletes):
+        """
+        Store one batch of a site's changes in a single transaction. upserts are rows
+        with the given fields (VIOLATION_COLUMNS as sent by the site), deletes are
+        the site's violation ids. ts_epoch is taken as sent: the timestamp text is the
+        site's local time. Applying the same batch twice changes nothing.
+        """
+        columns = ("site_violation_id", "timestamp", "ts_epoch", "license_plate", "car_color", "location",
+                   "parking_duration", "image_path", "clip_path")
+        sql = (f"INSERT INTO violations (site, {', '.join(columns)}) VALUES (?{', ?' * len(columns)}) "
+               f"ON CONFLICT(site, site_violation_id) DO UPDATE SET "
+               f"{', '.join(f'{c} = excluded.{c}' for c in columns[1:])}")
+        try:
+            for values in upserts:
+                row = dict(zip(fields, values))
+                self.conn.execute(sql, (site, row['id'], row['timestamp'], row['ts_epoch'],
+                                        row['license_plate'], row['car_color'], row['location'],
+                                        row['parking_duration'], row['image_path'], row.get('clip_path')))
+            self.conn.executemany("DELETE FROM violations WHERE site = ? AND site_violation_id = ?",
+                                  [(site, violation_id) for violation_id in deletes])
+        except Exception:
+            self.conn.rollback()
+            raise
+        self.conn.commit()
+
+    def count(self, **filters):
+        clauses, params = self._build_filters(**filters)
+        sql = "SELECT COUNT(*) FROM violations"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        return self.conn.execute(sql, params).fetchone()[0]
+
+
+def open_store(db_path):
+    """Open a separate connection to the violations database (for background threads)"""
+    return ViolationStore(sqlite3.connect(db_path, check_same_thread=False))
@@ -0,0 +1,78 @@
+import json
+import cv2
+import numpy as np
+
+DEFAULT_ZONE_NAME = "Manila"  # Location recorded for a region.json saved before zones had names
+
+
+class Zone:
+    """A named no-parking polygon with its own dwell limit"""
+
+    def __init__(self, name, points, dwell_seconds=None):
+        self.name = name
+        self.points = np.array(points, dtype=np.int32)
+        self.dwell_seconds = dwell_seconds  # None means the global ILLEGAL_PARKING_FRAMES
+
+    def to_dict(self):
+        return {"name": self.name, "points": self.points.tolist(), "dwell_seconds": self.dwell_seconds}
+
+
+class ZoneMap:
+    """
+    Zones rasterized once into an integer label mask, so finding the zone under a
+    point is a single array lookup. Where zones overlap, the later one wins.
+    """
+
+    def __init__(self, zones, width, height, fps, default_dwell_frames):
+        if len(zones) > 255:
+            raise ValueError("At most 255 zones are supported")
+        self.zones = list(zones)
+        self.fps = fps
+        self.default_dwell_frames = default_dwell_frames
+
+        self.labels = np.zeros((height, width), dtype=np.uint8)  # 0 = outside every zone
+        for label, zone in enumerate(self.zones, start=1):
+            cv2.fillPoly(self.labels, [zone.points], label)
+        self.mask = np.where(self.labels > 0, 255, 0).astype(np.uint8)
+
+    def zone_at(self, x, y):
+        """The zone containing pixel (x, y), or None (also outside the frame)"""
+        height, width = self.labels.shape
+        if not (0 <= x < width and 0 <= y < height):
+            return None
+        label = self.labels[y, x]
+        return self.zones[label - 1] if label else None
+
+    def dwell_frames(self, zone):
+        """Frames a car may stay stationary in zone before it is a violation"""
+        if zone.dwell_seconds is None:
+            return self.default_dwell_frames
+        return int(zone.dwell_seconds * self.fps)
+
+    def draw(self, frame):
+        draw_zones(frame, self.zones)
+
+
+def draw_zones(frame, zones, color=(0, 255, 255)):
+    """Outline and label each zone on frame"""
+    for zone in zones:
+        cv2.polylines(frame, [zone.points], True, color, 2)
+        x, y = zone.points.min(axis=0)
+        cv2.putText(frame, zone.name, (int(x) + 5, int(y) + 20), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+
+
+def load_zones(json_path):
+    """
+    Read zones from json_path. Both the current format ({"zones": [...]}) and the
+    original single-polygon list of points are accepted.
+    """
+    with open(json_path, 'r') as f:
+        data = json.load(f)
+    if isinstance(data, list):
+        return [Zone(DEFAULT_ZONE_NAME, data)]
+    return [Zone(z["name"], z["points"], z.get("dwell_seconds")) for z in data["zones"]]
+
+
+def save_zones(json_path, zones):
+    with open(json_path, 'w') as f:
+        json.dump({"zones": [zone.to_dict() for zone in zones]}, f, indent=2)